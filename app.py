@@ -1,14 +1,43 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
-from logic import ProductDiscoveryAnalyzer
+from logic import FRAMEWORKS, ProductDiscoveryAnalyzer, semantic_cache
+from jobs import CANCELLED, DONE, FAILED, PENDING, Job, JobCancelled, job_queue
+from prefetch import PrefetchPolicy
 from report_generator import ReportGenerator
+from report_cache import ReportCache
+import metrics
 import json
-from typing import Dict, Optional
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+# Start of this script run, for the rerun cost instrumentation
+rerun_started = time.perf_counter()
 
 # Load environment variables
 load_dotenv()
 
+# Per-call LLM request timeout in seconds
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Seconds between reruns while a background analysis is in progress
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+
+# Request all four frameworks in one structured call instead of streaming four
+COMBINED_ANALYSIS = os.getenv("COMBINED_ANALYSIS", "").lower() in ("1", "true", "yes")
+
+# Analyze the bare idea while users answer the follow-up questions (see prefetch.py)
+PREFETCH = PrefetchPolicy.from_env()
+
+# Show per-rerun timings in the sidebar
+SHOW_RERUN_STATS = os.getenv("SHOW_RERUN_STATS", "").lower() in ("1", "true", "yes")
+
+# Show LLM call, pricing and report metrics in the sidebar
+SHOW_METRICS = os.getenv("SHOW_METRICS", "").lower() in ("1", "true", "yes")
+
 # Page config
 st.set_page_config(
     page_title="Product Discovery Assistant",
@@ -17,13 +46,234 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Expensive objects are built once per process and shared by every session and rerun
+@st.cache_resource
+def get_analyzer() -> ProductDiscoveryAnalyzer:
+    return ProductDiscoveryAnalyzer()
+
+@st.cache_resource
+def get_report_generator() -> ReportGenerator:
+    # Generated reports are shared too: each format of an analysis is built once per process
+    cache = ReportCache.from_env()
+    metrics.registry.register_collector("report_cache", lambda: [
+        ("report_cache_events_total", "Report cache hits, builds and evictions", "counter",
+         [({"event": event}, value) for event, value in cache.stats().items()
+          if event in ("memory_hits", "disk_hits", "builds", "evictions")])
+    ])
+    return ReportGenerator(cache)
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Prometheus endpoint on METRICS_PORT, started once per process."""
+    return metrics.serve_from_env()
+
+@st.cache_resource
+def get_rerun_timings() -> Deque[Dict[str, float]]:
+    """Process-wide record of recent script runs (milliseconds)."""
+    return deque(maxlen=500)
+
+@st.cache_data
+def read_css() -> str:
+    with open("styles.css") as f:
+        return f.read()
+
 # Load custom CSS
 def load_css():
-    with open("styles.css") as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    st.markdown(f"<style>{read_css()}</style>", unsafe_allow_html=True)
 
 load_css()
 
+FRAMEWORK_SECTIONS = {
+    "jtbd": "🎯 Jobs to Be Done Analysis",
+    "value_proposition": "💎 Value Proposition Canvas",
+    "opportunity_solution": "🌳 Opportunity Solution Tree",
+    "four_fit": "🎯 4-Fit Model Assessment"
+}
+
+def run_analysis_job(job: Job, product_idea: str, user_inputs: Dict, case_study_company: Optional[str],
+                     compare_all: bool, prefetch_job_id: Optional[str] = None,
+                     refine_prefetch: bool = False) -> Dict:
+    """
+    Background job: stream every analysis, publishing partial text in job.progress for the UI.
+    prefetch_job_id: a speculative analysis of the bare idea to take the framework results from;
+        the comparisons still use the answers
+    refine_prefetch: update the prefetched framework results with the answers (refine_analyses)
+    """
+    # Start the company comparisons first so they run (and show up) alongside the frameworks
+    case_study_drain = None
+    if compare_all:
+        case_study_drain = CaseStudyDrain(job, analyzer.analyze_case_studies(
+            product_idea, analyzer.get_case_study_companies(), user_inputs, timeout=LLM_TIMEOUT
+        ))
+
+    texts = job.progress.setdefault("texts", {})
+    results = None
+    prefetched = job_queue.get(prefetch_job_id) if prefetch_job_id else None
+    # With a prefetch the comparison runs while it is awaited and refined, and is used whichever way the
+    # frameworks are obtained; closed on the way out, so a cancelled job does not leave it running
+    comparison = (analyzer.analyze_case_studies(product_idea, [case_study_company], user_inputs,
+                                                timeout=LLM_TIMEOUT)
+                  if prefetched is not None and case_study_company else None)
+    single_company = None if comparison is not None else case_study_company
+    try:
+        if prefetched is not None:
+            results = wait_for_prefetch(job, prefetched)
+            if results is not None and refine_prefetch:
+                job.check_cancelled()
+                results = analyzer.refine_analyses(product_idea, user_inputs, results, timeout=LLM_TIMEOUT)
+                texts.update((key, result["analysis"]) for key, result in results.items())
+        if results is None and COMBINED_ANALYSIS:
+            results = analyzer.analyze_all_frameworks(
+                product_idea, user_inputs, timeout=LLM_TIMEOUT, case_study_company=single_company, combined=True
+            )
+        elif results is None:
+            results = {}
+            for event in analyzer.stream_all_frameworks(
+                product_idea, user_inputs, timeout=LLM_TIMEOUT, case_study_company=single_company
+            ):
+                job.check_cancelled()
+                if event.result is not None:
+                    results[event.key] = event.result
+                else:
+                    texts[event.key] = texts.get(event.key, "") + event.delta
+        if comparison is not None:
+            results["case_study"] = next(comparison)
+            texts["case_study"] = results["case_study"]["analysis"]
+    finally:
+        if comparison is not None:
+            comparison.close()
+
+    case_study_result = results.pop("case_study", None)
+    case_study_results = [case_study_result] if case_study_result else []
+    if case_study_drain is not None:
+        finished = case_study_drain.wait()
+        order = {company: i for i, company in enumerate(analyzer.get_case_study_companies())}
+        case_study_results = sorted(finished, key=lambda case_study: order.get(case_study['company'], len(order)))
+    return {"analysis_results": results, "case_study_results": case_study_results}
+
+class CaseStudyDrain:
+    """
+    Moves each finished company comparison into job.progress["case_studies"] on a thread of
+    its own, so comparisons show up while the job is still streaming the frameworks.
+    """
+
+    def __init__(self, job: Job, case_study_batch: Iterator[Dict]):
+        self.job = job
+        self.batch = case_study_batch
+        self.finished = job.progress.setdefault("case_studies", [])
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(target=self._drain, name=f"case-studies-{job.id}", daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        try:
+            for case_study in self.batch:
+                self.job.check_cancelled()
+                self.finished.append(case_study)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            # Cancels the comparisons still running when the job was cancelled
+            self.batch.close()
+
+    def wait(self) -> list:
+        """Every comparison once all have finished; raises JobCancelled if the job is cancelled first."""
+        while self.thread.is_alive():
+            self.job.check_cancelled()
+            self.thread.join(JOB_POLL_INTERVAL / 5)
+        self.job.check_cancelled()
+        if self.error is not None:
+            raise self.error
+        return self.finished
+
+def wait_for_prefetch(job: Job, prefetched: Job) -> Optional[Dict]:
+    """
+    Framework results of a prefetch job, mirroring its partial text into job.progress while it runs.
+    None if it has not started (waiting could hold every worker), failed, or has an analysis error.
+    """
+    texts = job.progress.setdefault("texts", {})
+    if prefetched.status == PENDING:
+        return None
+    while not prefetched.done:
+        job.check_cancelled()
+        texts.update(prefetched.progress.get("texts", {}))
+        time.sleep(JOB_POLL_INTERVAL / 5)
+        # A job run by another worker process is a snapshot; fetch it again
+        prefetched = job_queue.get(prefetched.id)
+        if prefetched is None:
+            return None
+    if prefetched.status != DONE or not prefetch_usable(prefetched):
+        return None
+    return dict(prefetched.result["analysis_results"])
+
+def prefetch_usable(prefetched: Optional[Job]) -> bool:
+    """Whether a prefetch job can still provide results: not failed, cancelled or with an analysis error."""
+    if prefetched is None or prefetched.status in (FAILED, CANCELLED):
+        return False
+    if prefetched.status != DONE:
+        return True
+    return not any(result["analysis"].startswith("Error in analysis")
+                   for result in prefetched.result["analysis_results"].values())
+
+def prefetch_calls() -> int:
+    """LLM calls a prefetch job makes."""
+    return 1 if COMBINED_ANALYSIS else len(FRAMEWORKS)
+
+def discard_prefetch(job: Optional[Job], outcome: str):
+    """
+    Record a prefetch that will not be served. This session stops waiting for it: one still queued is
+    cancelled before it makes any calls unless another session with the same idea waits for it too,
+    and a running one is left to finish.
+    """
+    if job is not None and not job.done:
+        job_queue.cancel(job.id, subscriber=st.session_state.job_subscriber, pending_only=True)
+    wasted = job is not None and job.status != CANCELLED and prefetch_usable(job)
+    PREFETCH.record_outcome(outcome, prefetch_calls() if wasted else 0)
+
+def abandon_prefetch():
+    """Discard this session's unused prefetch (if any) when a new idea replaces it."""
+    if st.session_state.prefetch is not None:
+        discard_prefetch(job_queue.get(st.session_state.prefetch["job"]), "abandoned")
+        st.session_state.prefetch = None
+
+def take_prefetch(product_idea: str, user_inputs: Dict) -> Tuple[Optional[str], bool]:
+    """
+    Consume this session's prefetch at submit time. Returns (its job id, whether its analyses must be
+    refined with the answers) when it is under way and can be used for these answers; otherwise
+    discards it and returns (None, False).
+    """
+    prefetched, st.session_state.prefetch = st.session_state.prefetch, None
+    if prefetched is None:
+        return None, False
+    job = job_queue.get(prefetched["job"])
+    # A prefetch still waiting for a worker saves nothing over running the real analysis
+    if prefetch_usable(job) and job.status != PENDING and prefetched["idea"] == product_idea:
+        outcome = PREFETCH.decide(product_idea, user_inputs)
+        if outcome != "miss":
+            PREFETCH.record_outcome(outcome)
+            return job.id, outcome == "refined"
+    discard_prefetch(job, "miss")
+    return None, False
+
+def render_job_progress(job: Job, case_study_company: Optional[str], compare_all: bool):
+    """Show whatever a running analysis job has produced so far."""
+    texts = job.progress.get("texts", {})
+    sections = dict(FRAMEWORK_SECTIONS)
+    if case_study_company:
+        sections["case_study"] = f"📚 Comparison with {case_study_company}"
+    for key, title in sections.items():
+        with st.expander(title, expanded=True):
+            st.markdown(texts.get(key, "") or "⏳ Waiting for the first words...")
+    if compare_all:
+        finished = list(job.progress.get("case_studies", []))
+        companies = analyzer.get_case_study_companies()
+        st.progress(len(finished) / len(companies), text=f"📚 Compared with {len(finished)} of {len(companies)} companies")
+        for case_study in finished:
+            with st.expander(f"📚 Comparison with {case_study['company']}", expanded=False):
+                st.markdown(case_study['analysis'])
+
 # Initialize session state
 if 'user_inputs' not in st.session_state:
     st.session_state.user_inputs = {}
@@ -37,10 +287,23 @@ if 'case_study_enabled' not in st.session_state:
     st.session_state.case_study_enabled = False
 if 'case_study_complete' not in st.session_state:
     st.session_state.case_study_complete = False
+if 'analysis_job' not in st.session_state:
+    st.session_state.analysis_job = None
+if 'job_subscriber' not in st.session_state:
+    # Identifies this session to the job queue, so cancelling a shared job only withdraws this session
+    st.session_state.job_subscriber = uuid.uuid4().hex
+if 'prefetch' not in st.session_state:
+    # Speculative analysis of the bare idea: {"job": job id, "idea": product idea} or None
+    st.session_state.prefetch = None
+if 'report_formats' not in st.session_state:
+    # Report formats the user asked for; their download buttons stay up across reruns
+    st.session_state.report_formats = set()
 
 # Initialize analyzer and report generator
-analyzer = ProductDiscoveryAnalyzer()
-report_generator = ReportGenerator()
+start_metrics_endpoint()
+analyzer = get_analyzer()
+report_generator = get_report_generator()
+setup_ms = (time.perf_counter() - rerun_started) * 1000
 
 # Custom header with sticky positioning
 st.markdown("""
@@ -76,8 +339,12 @@ with st.container():
             "Enable Case Study Comparison",
             help="Compare your idea with successful companies to learn from their strategies"
         )
+        compare_all = case_study_enabled and st.checkbox(
+            "Compare with all companies",
+            help="Benchmark your idea against every company at once"
+        )
     with col2:
-        if case_study_enabled:
+        if case_study_enabled and not compare_all:
             selected_company = st.selectbox(
                 "Select a company to compare with:",
                 options=analyzer.get_case_study_companies(),
@@ -92,6 +359,16 @@ with st.container():
         if not product_idea:
             st.error("Please enter a product idea or customer problem to analyze.")
         else:
+            if PREFETCH.enabled:
+                # Analyze the bare idea alongside question generation and while the answers are typed
+                abandon_prefetch()
+                st.session_state.prefetch = {
+                    "job": job_queue.submit(run_analysis_job, product_idea, {}, None, False,
+                                            key=job_queue.make_key(product_idea, {}, None, False),
+                                            subscriber=st.session_state.job_subscriber),
+                    "idea": product_idea
+                }
+                PREFETCH.record_started()
             try:
                 with st.spinner("🤔 Generating follow-up questions..."):
                     st.session_state.follow_up_questions = analyzer.get_follow_up_questions(product_idea)
@@ -122,30 +399,64 @@ if st.session_state.follow_up_questions:
 
     if generate_button:
         if product_idea:
-            try:
-                with st.spinner("🔍 Analyzing your product idea..."):
-                    analysis_results = analyzer.analyze_all_frameworks(
-                        product_idea,
-                        st.session_state.user_inputs
-                    )
-                    st.session_state.analysis_complete = True
-                    st.session_state.analysis_results = analysis_results
-                    
-                    # Generate case study if enabled
-                    if case_study_enabled:
-                        with st.spinner(f"📚 Analyzing comparison with {selected_company}..."):
-                            case_study_results = analyzer.analyze_case_study(
-                                product_idea,
-                                selected_company,
-                                st.session_state.user_inputs
-                            )
-                            st.session_state.case_study_results = case_study_results
-                            st.session_state.case_study_complete = True
-                    
-                    st.session_state.error = None
-            except Exception as e:
-                st.session_state.error = f"Error during analysis: {str(e)}"
-                st.error(st.session_state.error)
+            # Runs in the background so it survives reruns; identical requests share one job
+            case_study_company = selected_company if case_study_enabled and not compare_all else None
+            compare_all_companies = case_study_enabled and compare_all
+            user_inputs = dict(st.session_state.user_inputs)
+            prefetch_job_id, refine_prefetch = take_prefetch(product_idea, user_inputs)
+            if prefetch_job_id and not refine_prefetch and not case_study_company and not compare_all_companies:
+                # Nothing beyond the frameworks was asked for: show the prefetch job itself
+                st.session_state.analysis_job = prefetch_job_id
+            else:
+                st.session_state.analysis_job = job_queue.submit(
+                    run_analysis_job,
+                    product_idea,
+                    user_inputs,
+                    case_study_company,
+                    compare_all_companies,
+                    prefetch_job_id,
+                    refine_prefetch,
+                    key=job_queue.make_key(product_idea, user_inputs, case_study_company, compare_all_companies),
+                    subscriber=st.session_state.job_subscriber
+                )
+            st.session_state.analysis_job_options = (case_study_company, compare_all_companies)
+            st.session_state.analysis_complete = False
+            st.session_state.case_study_complete = False
+            st.session_state.error = None
+
+# Poll the background analysis job
+poll_job = False
+if st.session_state.analysis_job:
+    job = job_queue.get(st.session_state.analysis_job)
+    if job is None:
+        st.session_state.analysis_job = None
+        st.session_state.error = "The analysis expired before it could be shown. Please run it again."
+        st.error(st.session_state.error)
+    elif job.status == DONE:
+        st.session_state.analysis_job = None
+        st.session_state.analysis_results = job.result["analysis_results"]
+        st.session_state.report_formats = set()
+        st.session_state.case_study_results = job.result["case_study_results"]
+        st.session_state.case_study_complete = bool(job.result["case_study_results"])
+        st.session_state.analysis_complete = True
+        st.session_state.error = None
+    elif job.status == FAILED:
+        st.session_state.analysis_job = None
+        st.session_state.error = f"Error during analysis: {job.error}"
+        st.error(st.session_state.error)
+    elif job.status == CANCELLED:
+        st.session_state.analysis_job = None
+        st.info("Analysis cancelled.")
+    else:
+        st.markdown("### 🔍 Analyzing your product idea...")
+        if st.button("Cancel Analysis"):
+            # Other sessions that submitted the same analysis keep it running
+            job_queue.cancel(job.id, subscriber=st.session_state.job_subscriber)
+            st.session_state.analysis_job = None
+            st.info("Analysis cancelled.")
+        else:
+            render_job_progress(job, *st.session_state.analysis_job_options)
+            poll_job = True
 
 # Display analysis results
 if st.session_state.analysis_complete:
@@ -193,13 +504,14 @@ if st.session_state.analysis_complete:
     # Case Study Comparison
     if st.session_state.case_study_complete:
         st.markdown("### 🧪 Case Study Comparison")
-        with st.expander(f"📚 Comparison with {st.session_state.case_study_results['company']}", expanded=True):
-            st.markdown("""
-                <div class="framework-header">
-                    <h3>Learning from successful companies</h3>
-                </div>
-            """, unsafe_allow_html=True)
-            st.markdown(st.session_state.case_study_results['analysis'])
+        for case_study in st.session_state.case_study_results:
+            with st.expander(f"📚 Comparison with {case_study['company']}", expanded=True):
+                st.markdown("""
+                    <div class="framework-header">
+                        <h3>Learning from successful companies</h3>
+                    </div>
+                """, unsafe_allow_html=True)
+                st.markdown(case_study['analysis'])
 
     # Download report section
     st.markdown("### 📥 Download Strategy Report")
@@ -207,6 +519,8 @@ if st.session_state.analysis_complete:
     
     with col1:
         if st.button("📄 Download as Text", use_container_width=True):
+            st.session_state.report_formats.add('txt')
+        if 'txt' in st.session_state.report_formats:
             try:
                 file_data, mime_type, file_extension = report_generator.generate_report(
                     product_idea,
@@ -226,6 +540,8 @@ if st.session_state.analysis_complete:
     
     with col2:
         if st.button("📑 Download as PDF", use_container_width=True):
+            st.session_state.report_formats.add('pdf')
+        if 'pdf' in st.session_state.report_formats:
             try:
                 file_data, mime_type, file_extension = report_generator.generate_report(
                     product_idea,
@@ -249,4 +565,74 @@ st.markdown("""
         <p>Built with ❤️ using Streamlit and GPT-4 | 
         <a href="https://github.com/yourusername/product-discovery-assistant" target="_blank">View on GitHub</a></p>
     </div>
-""", unsafe_allow_html=True) 
\ No newline at end of file
+""", unsafe_allow_html=True) 
+
+# Rerun cost instrumentation
+rerun_timings = get_rerun_timings()
+rerun_timings.append({"setup_ms": setup_ms, "total_ms": (time.perf_counter() - rerun_started) * 1000})
+if SHOW_RERUN_STATS:
+    with st.sidebar:
+        st.markdown("### ⏱️ Rerun Cost")
+        recent = sorted(timing["total_ms"] for timing in rerun_timings)
+        st.metric("This rerun", f"{rerun_timings[-1]['total_ms']:.1f} ms",
+                  help=f"Setup (CSS, analyzer, report generator): {setup_ms:.2f} ms")
+        st.caption(
+            f"Last {len(recent)} reruns in this process: "
+            f"p50 {recent[len(recent) // 2]:.1f} ms · p95 {recent[int(len(recent) * 0.95)]:.1f} ms"
+        )
+
+def _ms(seconds: Optional[float]) -> str:
+    return "–" if seconds is None else f"{seconds * 1000:.0f}"
+
+def _markdown_table(header, rows) -> str:
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    lines += ["| " + " | ".join(str(cell) for cell in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+if SHOW_METRICS:
+    with st.sidebar:
+        st.markdown("### 📈 Metrics")
+        calls = {}
+        for (label, outcome), count in metrics.LLM_REQUESTS.samples().items():
+            calls.setdefault(label, {})[outcome] = int(count)
+        tokens = metrics.LLM_TOKENS.samples()
+        st.caption("LLM calls by label (latency in ms, cache hits excluded; cached includes near-duplicates)")
+        st.markdown(_markdown_table(
+            ("label", "ok", "errors", "cached", "p50", "p95", "tokens"),
+            [(label, counts.get("ok", 0), counts.get("error", 0) + counts.get("timeout", 0),
+              counts.get("cache_hit", 0) + counts.get("semantic_hit", 0),
+              _ms(metrics.LLM_SECONDS.quantile(0.5, label)),
+              _ms(metrics.LLM_SECONDS.quantile(0.95, label)),
+              int(tokens.get((label, "prompt"), 0) + tokens.get((label, "completion"), 0)))
+             for label, counts in sorted(calls.items())]
+        ))
+        errors = metrics.OPERATION_ERRORS.samples()
+        st.caption("Operations (latency in ms)")
+        st.markdown(_markdown_table(
+            ("operation", "count", "errors", "p50", "p95"),
+            [(operation, count, int(errors.get((operation,), 0)),
+              _ms(metrics.OPERATION_SECONDS.quantile(0.5, operation)),
+              _ms(metrics.OPERATION_SECONDS.quantile(0.95, operation)))
+             for (operation,), (_, _, count) in sorted(metrics.OPERATION_SECONDS.snapshot().items())]
+        ))
+        if PREFETCH.enabled:
+            prefetches = PREFETCH.stats()
+            st.caption(
+                f"Prefetch: {prefetches['hit']} served, {prefetches['refined']} refined, {prefetches['miss']} rerun, "
+                f"{prefetches['abandoned']} abandoned · hit rate {prefetches['hit_rate']:.0%} · "
+                f"{prefetches['wasted_calls']} wasted calls"
+            )
+        if semantic_cache.enabled:
+            semantic = semantic_cache.stats()
+            st.caption(
+                f"Semantic cache: {semantic['hits']} of {semantic['lookups']} lookups served · "
+                f"hit rate {semantic['hit_rate']:.0%} · {semantic['near_threshold_hits']} near the threshold · "
+                f"{semantic['word_mismatches']} rejected by the word check · "
+                f"{semantic['entries']} entries, "
+                f"{(semantic['index_bytes'] + semantic['payload_bytes']) / 1024:.0f} KB"
+            )
+
+# Keep refreshing until the background analysis finishes
+if poll_job:
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
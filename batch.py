@@ -0,0 +1,226 @@
+"""
+Headless batch runner: analyze many product ideas from a JSONL or CSV export.
+
+    python batch.py ideas.jsonl --output results.jsonl --concurrency 8
+    python batch.py ideas.csv --output results.jsonl --reports-dir reports --report-format pdf txt
+
+Input is read as a stream, one idea per JSONL line ({"id", "idea", "answers"})
+or CSV row (id and idea columns; every other non-empty column is a follow-up
+answer). Results are appended to the output JSONL as each idea finishes, so the
+output doubles as the checkpoint: rerunning the same command skips ideas that
+already have an "ok" record and retries the rest. When an idea appears more
+than once in the output, its last record wins.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Set
+
+from dotenv import load_dotenv
+
+# Batch runs have no Streamlit script to load .env, and logic reads its settings at import
+load_dotenv()
+
+import metrics  # noqa: E402
+from logic import ProductDiscoveryAnalyzer, client  # noqa: E402
+from report_generator import ReportGenerator  # noqa: E402
+
+OK = "ok"
+FAILED = "failed"
+
+# Column names accepted for the idea id and text
+_ID_FIELDS = ("id", "idea_id")
+_IDEA_FIELDS = ("idea", "product_idea", "title")
+
+
+def _idea_record(row: Dict, number: int) -> Dict:
+    """Normalize one input row to {"id", "idea", "answers"}; answers use the app's q0, q1, ... keys."""
+    idea_id = next((str(row[field]) for field in _ID_FIELDS if row.get(field) not in (None, "")), f"line-{number}")
+    idea = next((row[field] for field in _IDEA_FIELDS if row.get(field)), "")
+    answers = row.get("answers")
+    if answers is None:
+        # CSV (or flat JSON): every other non-empty column is a follow-up answer
+        answers = {key: value for key, value in row.items()
+                   if key not in _ID_FIELDS + _IDEA_FIELDS and value not in (None, "")}
+    elif isinstance(answers, list):
+        answers = {f"q{i}": answer for i, answer in enumerate(answers)}
+    return {"id": idea_id, "idea": str(idea).strip(), "answers": answers}
+
+
+def read_ideas(path: str) -> Iterator[Dict]:
+    """Stream ideas from a .jsonl or .csv file ("-" reads JSONL from stdin)."""
+    if path != "-" and path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for number, row in enumerate(csv.DictReader(f), start=1):
+                yield _idea_record(row, number)
+        return
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for number, line in enumerate(f, start=1):
+            if line.strip():
+                yield _idea_record(json.loads(line), number)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def load_checkpoint(output_path: str) -> Set[str]:
+    """
+    Ids that already finished successfully in an earlier run. A record cut off by a crash
+    is truncated away so new records start on a fresh line.
+    """
+    done: Dict[str, bool] = {}
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            f.truncate(complete)
+    for line in data[:complete].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        done[record["id"]] = record.get("status") == OK
+    return {idea_id for idea_id, ok in done.items() if ok}
+
+
+def _report_path(reports_dir: str, idea_id: str, extension: str) -> str:
+    safe_id = "".join(c if c.isalnum() or c in "-_." else "_" for c in idea_id)
+    return os.path.join(reports_dir, f"{safe_id}.{extension}")
+
+
+def _write_report(report_generator: ReportGenerator, reports_dir: str, record: Dict, fmt: str) -> str:
+    data, _, extension = report_generator.generate_report(record["idea"], record["analysis_results"], fmt,
+                                                          chunked=True)
+    path = _report_path(reports_dir, record["id"], extension)
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            for chunk in data:
+                f.write(chunk)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return path
+
+
+async def run_batch(analyzer: ProductDiscoveryAnalyzer, ideas: Iterator[Dict], output_path: str,
+                    concurrency: int = 8, timeout: Optional[float] = None, combined: bool = False,
+                    case_study_company: Optional[str] = None, reports_dir: Optional[str] = None,
+                    report_formats=("pdf",), progress_every: float = 10.0) -> Dict:
+    """
+    Analyze every idea not already in the output checkpoint and append one JSONL record per idea.
+    concurrency: ideas analyzed at the same time (each makes up to five LLM calls)
+    Must run on the LLM client loop (client.run(run_batch(...))).
+    Returns run totals, including ideas_per_minute.
+    """
+    done = load_checkpoint(output_path)
+    totals = {"processed": 0, "ok": 0, "failed": 0, "skipped": 0}
+    report_generator = ReportGenerator() if reports_dir else None
+    if reports_dir:
+        os.makedirs(reports_dir, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    # Reportlab is CPU-bound; keep it off the event loop that drives the LLM calls
+    report_pool = ThreadPoolExecutor(max_workers=max(1, min(4, concurrency)), thread_name_prefix="batch-report")
+    slots = asyncio.Semaphore(max(1, concurrency))
+    started = time.perf_counter()
+    last_progress = started
+
+    async def analyze(record: Dict, output):
+        nonlocal last_progress
+        try:
+            start = time.perf_counter()
+            results = await analyzer.analyze_all_frameworks_async(
+                record["idea"], record["answers"], timeout=timeout,
+                case_study_company=case_study_company, combined=combined
+            )
+            errors = sorted(key for key, value in results.items()
+                            if (value["analysis"] or "").startswith("Error in analysis"))
+            out = {"id": record["id"], "status": FAILED if errors else OK, "idea": record["idea"],
+                   "answers": record["answers"], "analysis_results": results, "errors": errors,
+                   "seconds": round(time.perf_counter() - start, 3)}
+            if report_generator is not None and not errors:
+                try:
+                    out["reports"] = [
+                        await loop.run_in_executor(report_pool, _write_report, report_generator, reports_dir, out, fmt)
+                        for fmt in report_formats
+                    ]
+                except Exception as e:
+                    errors.append(f"report: {e}")
+                    out["status"] = FAILED
+            output.write(json.dumps(out, ensure_ascii=False) + "\n")
+            output.flush()
+            totals["processed"] += 1
+            totals["ok" if not errors else "failed"] += 1
+            now = time.perf_counter()
+            if progress_every and now - last_progress >= progress_every:
+                last_progress = now
+                rate = totals["processed"] / (now - started) * 60
+                print(f"{totals['processed']} ideas ({totals['failed']} failed), {rate:.1f} ideas/min",
+                      file=sys.stderr)
+        finally:
+            slots.release()
+
+    tasks = set()
+    try:
+        with open(output_path, "a", encoding="utf-8") as output:
+            for record in ideas:
+                if record["id"] in done or not record["idea"]:
+                    totals["skipped"] += 1
+                    continue
+                # Reading the input waits for a free slot, so only `concurrency` ideas are held at once
+                await slots.acquire()
+                task = asyncio.ensure_future(analyze(record, output))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        report_pool.shutdown(wait=False)
+
+    elapsed = time.perf_counter() - started
+    totals["seconds"] = round(elapsed, 3)
+    totals["ideas_per_minute"] = round(totals["processed"] / elapsed * 60, 1) if elapsed else 0.0
+    return totals
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the product discovery frameworks over many ideas.")
+    parser.add_argument("input", help="Ideas as .jsonl or .csv, or - for JSONL on stdin")
+    parser.add_argument("--output", required=True, help="Results JSONL; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Ideas analyzed at the same time")
+    parser.add_argument("--timeout", type=float, default=float(os.getenv("LLM_TIMEOUT", "60")),
+                        help="Per-call LLM timeout in seconds")
+    parser.add_argument("--combined", action="store_true",
+                        help="One structured LLM call for all four frameworks per idea")
+    parser.add_argument("--case-study", metavar="COMPANY", help="Also compare every idea with this company")
+    parser.add_argument("--reports-dir", help="Write a report per successful idea into this directory")
+    parser.add_argument("--report-format", nargs="+", choices=("pdf", "txt"), default=["pdf"])
+    args = parser.parse_args(argv)
+
+    # Long runs can be watched on the same Prometheus endpoint as the app
+    metrics.serve_from_env()
+    if args.case_study and args.case_study not in ProductDiscoveryAnalyzer().get_case_study_companies():
+        parser.error("--case-study must be one of: " + ", ".join(ProductDiscoveryAnalyzer().get_case_study_companies()))
+    totals = client.run(run_batch(
+        ProductDiscoveryAnalyzer(), read_ideas(args.input), args.output, concurrency=args.concurrency,
+        timeout=args.timeout, combined=args.combined, case_study_company=args.case_study,
+        reports_dir=args.reports_dir, report_formats=args.report_format
+    ))
+    print(json.dumps(totals))
+    return 0 if totals["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1343 @@
+"""
+Offline benchmarks against the local mock OpenRouter server.
+
+    python benchmark.py frameworks --latency 1.0
+    python benchmark.py combined --latency 0.5
+    python benchmark.py tokens --rounds 12
+    python benchmark.py pool --users 50 --requests 500
+    python benchmark.py stream --latency 0.5 --token-rate 50
+    python benchmark.py faults --latency 0.2 --error-rate 0.1 --slow-rate 0.05 --slow-latency 3
+    python benchmark.py coalesce --users 50 --requests 60
+    python benchmark.py pricing --sizes 10000 100000 1000000
+    python benchmark.py inventory --sizes 100000 1000000
+    python benchmark.py tracker --sizes 10000 100000 1000000
+    python benchmark.py parallel --sizes 4000000 --events 16 --workers 1 2 4 8
+    python benchmark.py seatmap --sizes 1000000
+    python benchmark.py case_studies --latency 0.5
+    python benchmark.py report
+    python benchmark.py report_cache --reruns 20
+    python benchmark.py rerun --reruns 50
+    python benchmark.py batch --ideas 200 --latency 0.2
+    python benchmark.py metrics
+    python benchmark.py prefetch --latency 0.5 --think-time 2
+    python benchmark.py serve --workers 1 2 4 --users 32 --duration 20
+    python benchmark.py semantic --latency 0.2
+
+Several benchmarks (or "suite" for the regression set) run one after another,
+each in its own process. --output saves the results with run metadata as JSON;
+--compare reports metrics that got worse than a saved run by more than
+--threshold and exits with status 1 if there are any:
+
+    python benchmark.py suite --output baseline.json
+    python benchmark.py suite --output current.json --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_openrouter import base_url, start_mock_server
+
+
+def _analyzer_for(server):
+    # logic builds its client at import, so the endpoint has to be set first
+    os.environ["OPENROUTER_BASE_URL"] = base_url(server)
+    os.environ.setdefault("OPENROUTER_API_KEY", "mock-key")
+    from logic import ProductDiscoveryAnalyzer
+    return ProductDiscoveryAnalyzer()
+
+
+def bench_frameworks(args) -> dict:
+    """End-to-end analysis latency, including a case study: serial, concurrent, combined and streaming."""
+    # Every mode must reach the mock server, not the previous mode's cached answers
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    server = start_mock_server(latency=args.latency, token_rate=args.token_rate)
+    try:
+        analyzer = _analyzer_for(server)
+        idea = "A mobile app that helps busy professionals book last-minute fitness classes"
+        answers = {"q0": "Office workers in big cities", "q1": "They use ClassPass today"}
+        results = {}
+        for mode, options in (("serial", {"concurrent": False}), ("concurrent", {"concurrent": True}),
+                              ("combined", {"combined": True})):
+            server.request_count = 0
+            start = time.perf_counter()
+            output = analyzer.analyze_all_frameworks(idea, answers, timeout=args.latency * 10,
+                                                     case_study_company="Uber", **options)
+            elapsed = time.perf_counter() - start
+            errors = [key for key, value in output.items() if value["analysis"].startswith("Error in analysis")]
+            results[mode] = {"seconds": round(elapsed, 3), "requests": server.request_count, "errors": errors}
+
+        server.request_count = 0
+        start = time.perf_counter()
+        first_text = None
+        for event in analyzer.stream_all_frameworks(idea, answers, timeout=args.latency * 10,
+                                                    case_study_company="Uber"):
+            if first_text is None and event.delta:
+                first_text = time.perf_counter() - start
+        results["streaming"] = {"seconds": round(time.perf_counter() - start, 3), "requests": server.request_count,
+                                "first_text_seconds": round(first_text or 0.0, 3)}
+        results["speedup"] = round(results["serial"]["seconds"] / results["concurrent"]["seconds"], 2)
+        return results
+    finally:
+        server.shutdown()
+
+
+def bench_combined(args) -> dict:
+    """Four framework calls vs. one combined structured call: requests, input size and time."""
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    idea = "A mobile app that helps busy professionals book last-minute fitness classes"
+    answers = {f"q{i}": f"Answer {i}: office workers in big cities who already use ClassPass" for i in range(6)}
+    server = start_mock_server(latency=args.latency)
+    try:
+        analyzer = _analyzer_for(server)
+        results = {}
+        for mode, combined, structured in (("separate", False, True), ("combined", True, True),
+                                           ("combined_fallback", True, False)):
+            server.structured_output = structured
+            server.request_count = server.prompt_chars = 0
+            start = time.perf_counter()
+            output = analyzer.analyze_all_frameworks(idea, answers, concurrent=True, combined=combined,
+                                                     timeout=args.latency * 10)
+            elapsed = time.perf_counter() - start
+            results[mode] = {
+                "seconds": round(elapsed, 3),
+                "requests": server.request_count,
+                "input_chars": server.prompt_chars,
+                "input_tokens_est": server.prompt_chars // 4,
+                "errors": [key for key, value in output.items() if value["analysis"].startswith("Error in analysis")]
+            }
+    finally:
+        server.shutdown()
+    separate, combined = results["separate"], results["combined"]
+    results["request_reduction"] = round(separate["requests"] / combined["requests"], 2)
+    results["input_token_reduction"] = round(separate["input_chars"] / combined["input_chars"], 2)
+    return results
+
+
+def bench_tokens(args) -> dict:
+    """Token use per analysis: indented JSON context and fixed max_tokens vs. compact context and budgets."""
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    # Token counts, not generation speed, are measured: at --token-rate a 400-word completion would
+    # outlast the timeout, and timed-out calls are never recorded
+    server = start_mock_server(latency=args.latency, token_rate=0, completion_words=400)
+    try:
+        analyzer = _analyzer_for(server)
+        import logic
+        from logic import FRAMEWORKS, ProductDiscoveryAnalyzer
+
+        class LegacyAnalyzer(ProductDiscoveryAnalyzer):
+            # The previous prompt construction: pretty-printed answers, blanks included, max_tokens=1000
+            def _combined_input(self, product_idea, user_inputs):
+                return f"{product_idea}\n\nAdditional Context:\n{json.dumps(user_inputs, indent=2)}"
+
+            def _max_tokens(self, label):
+                return 1000
+
+        idea = "A mobile app that helps busy professionals book last-minute fitness classes"
+        answers = {
+            "q0": "Office workers in big cities,\n  mostly 25-40, who work long hours  ",
+            "q1": "",
+            "q2": "They use ClassPass or   book directly with studios, but\nclasses fill up days ahead",
+            "q3": "   ",
+            "q4": "Last-minute cancellations by other members are never resold",
+            "q5": "",
+            "q6": "Studios would pay to fill empty spots"
+        }
+        results = {}
+        for mode, mode_analyzer in (("before", LegacyAnalyzer()), ("after", analyzer)):
+            logic.token_ledger.reset()
+            server.request_count = server.prompt_chars = server.completion_tokens = 0
+            start = time.perf_counter()
+            errors = 0
+            for _ in range(args.rounds):
+                output = mode_analyzer.analyze_all_frameworks(idea, answers, concurrent=True,
+                                                              timeout=args.latency * 10)
+                errors += sum(value["analysis"].startswith("Error in analysis") for value in output.values())
+            elapsed = time.perf_counter() - start
+            # Empty when every call failed
+            usage = logic.token_ledger.stats().get("all", {"prompt_tokens": 0, "completion_tokens": 0,
+                                                            "truncated_calls": 0})
+            results[mode] = {
+                "errors": errors,
+                "seconds_per_analysis": round(elapsed / args.rounds, 3),
+                "prompt_tokens_per_analysis": usage["prompt_tokens"] // args.rounds,
+                "completion_tokens_per_analysis": usage["completion_tokens"] // args.rounds,
+                "truncated_calls": usage["truncated_calls"],
+                "max_tokens": {key: mode_analyzer._max_tokens(key) for key in FRAMEWORKS},
+                "context_chars": len(mode_analyzer._combined_input(idea, answers))
+            }
+        before, after = results["before"], results["after"]
+        results["prompt_token_reduction"] = (round(
+            1 - after["prompt_tokens_per_analysis"] / before["prompt_tokens_per_analysis"], 3
+        ) if before["prompt_tokens_per_analysis"] else None)
+        results["max_tokens_reserved_reduction"] = round(
+            1 - sum(after["max_tokens"].values()) / sum(before["max_tokens"].values()), 3
+        )
+        return results
+    finally:
+        server.shutdown()
+
+
+def bench_pool(args) -> dict:
+    """Many concurrent users: blocking per-thread calls vs. the shared async pooled client."""
+    server = start_mock_server(latency=args.latency)
+    try:
+        analyzer = _analyzer_for(server)
+        from openai import OpenAI
+        from logic import client
+
+        messages = [{"role": "user", "content": "ping"}]
+        results = {}
+
+        def sync_call(openai_client):
+            openai_client.chat.completions.create(model="mock", messages=messages, max_tokens=16)
+
+        def fresh_client_call(_):
+            # One client per request: new socket and TLS/TCP setup every time
+            with OpenAI(base_url=base_url(server), api_key="mock-key") as openai_client:
+                sync_call(openai_client)
+
+        shared_sync = OpenAI(base_url=base_url(server), api_key="mock-key")
+        modes = {
+            "sync_client_per_request": fresh_client_call,
+            "sync_shared_client": lambda _: sync_call(shared_sync),
+        }
+        for mode, fn in modes.items():
+            server.connection_count = 0
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.users) as executor:
+                list(executor.map(fn, range(args.requests)))
+            results[mode] = {
+                "seconds": round(time.perf_counter() - start, 3),
+                "connections": server.connection_count,
+                "threads": args.users
+            }
+
+        async def pooled():
+            semaphore = asyncio.Semaphore(args.users)
+
+            async def one():
+                async with semaphore:
+                    await analyzer._call_gpt_async("ping", max_tokens=16)
+
+            await asyncio.gather(*(one() for _ in range(args.requests)))
+
+        server.connection_count = 0
+        start = time.perf_counter()
+        client.run(pooled())
+        results["async_pooled"] = {
+            "seconds": round(time.perf_counter() - start, 3),
+            "connections": server.connection_count,
+            "threads": 1
+        }
+        results["requests"] = args.requests
+        return results
+    finally:
+        server.shutdown()
+
+
+def _percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def bench_faults(args) -> dict:
+    """Latency and success under injected failures and slow requests: no retries, retries, retries + hedging."""
+    from llm_client import LLMClient
+    from resilience import CircuitBreaker, RetryPolicy
+
+    server = start_mock_server(latency=args.latency, error_rate=args.error_rate, slow_rate=args.slow_rate,
+                               slow_latency=args.slow_latency)
+    messages = [{"role": "user", "content": "ping"}]
+    timeout = args.slow_latency * 2
+
+    def measure(llm: LLMClient, requests: int) -> dict:
+        async def load():
+            semaphore = asyncio.Semaphore(args.users)
+
+            async def one():
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        await llm.create_chat_completion(model="mock", messages=messages, max_tokens=16,
+                                                         timeout=timeout, deadline=time.monotonic() + timeout)
+                        ok = True
+                    except Exception:
+                        ok = False
+                    return time.perf_counter() - start, ok
+
+            return await asyncio.gather(*(one() for _ in range(requests)))
+
+        try:
+            outcomes = llm.run(load())
+        finally:
+            llm.close()
+        seconds = [elapsed for elapsed, _ in outcomes]
+        return {
+            "success_rate": round(sum(ok for _, ok in outcomes) / len(outcomes), 4),
+            "p50": round(_percentile(seconds, 0.5), 3),
+            "p95": round(_percentile(seconds, 0.95), 3),
+            "p99": round(_percentile(seconds, 0.99), 3),
+            "client": llm.stats()
+        }
+
+    try:
+        retry = RetryPolicy(max_attempts=4, base_delay=0.1, max_delay=1.0)
+        modes = {
+            "no_retries": {},
+            "retries": {"retry": retry},
+            "retries_hedged": {"retry": retry, "hedge_after": args.latency * 3},
+        }
+        results = {}
+        for mode, options in modes.items():
+            server.random.seed(0)
+            results[mode] = measure(LLMClient(base_url(server), "mock-key", **options), args.requests)
+
+        # Upstream down: every call fails; the breaker turns retried failures into instant rejections
+        server.error_rate = 1.0
+        for mode, breaker in (("down_no_breaker", None), ("down_breaker", CircuitBreaker(5, reset_timeout=60))):
+            server.request_count = 0
+            outcome = measure(LLMClient(base_url(server), "mock-key", retry=retry, breaker=breaker), args.users)
+            results[mode] = {"p50": outcome["p50"], "p99": outcome["p99"], "upstream_requests": server.request_count}
+        results["faults"] = {"error_rate": args.error_rate, "slow_rate": args.slow_rate,
+                             "slow_latency": args.slow_latency, "requests": args.requests}
+        return results
+    finally:
+        server.shutdown()
+
+
+def bench_coalesce(args) -> dict:
+    """Identical concurrent calls with and without coalescing; a burst against a rate-limited upstream."""
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    from llm_client import LLMClient
+    from rate_limit import RateLimiter
+    from resilience import RetryPolicy
+
+    server = start_mock_server(latency=args.latency)
+    try:
+        analyzer = _analyzer_for(server)
+        import logic
+
+        async def identical(prompt_for):
+            await asyncio.gather(*(analyzer._call_gpt_async(prompt_for(i), max_tokens=16) for i in range(args.users)))
+
+        results = {}
+        for mode, prompt_for in (("distinct_prompts", lambda i: f"idea {i}"), ("identical_prompts", lambda i: "idea")):
+            server.request_count = 0
+            start = time.perf_counter()
+            logic.client.run(identical(prompt_for))
+            results[mode] = {"calls": args.users, "upstream_requests": server.request_count,
+                             "seconds": round(time.perf_counter() - start, 3)}
+        results["single_flight"] = logic.in_flight.stats()
+
+        # Upstream allows 10 requests/s; send a burst of `requests` calls
+        server.rate_limit = 10
+        retry = RetryPolicy(max_attempts=6, base_delay=0.5, max_delay=4.0)
+        messages = [{"role": "user", "content": "ping"}]
+        for mode, limiter in (("burst_unlimited", None), ("burst_limited", RateLimiter(requests_per_minute=540,
+                                                                                         burst_seconds=1))):
+            llm = LLMClient(base_url(server), "mock-key", retry=retry, limiter=limiter)
+            server.request_count = server.rate_limited = 0
+            server.recent_requests.clear()
+
+            async def burst():
+                async def one():
+                    try:
+                        await llm.create_chat_completion(model="mock", messages=messages, max_tokens=16)
+                        return True
+                    except Exception:
+                        return False
+                return await asyncio.gather(*(one() for _ in range(args.requests)))
+
+            start = time.perf_counter()
+            try:
+                outcomes = llm.run(burst())
+            finally:
+                llm.close()
+            results[mode] = {
+                "calls": args.requests,
+                "succeeded": sum(outcomes),
+                "seconds": round(time.perf_counter() - start, 3),
+                "upstream_requests": server.request_count,
+                "rejected_429": server.rate_limited,
+                "rate_limiter": {key: round(value, 3) for key, value in llm.limiter.stats().items()}
+            }
+        return results
+    finally:
+        server.shutdown()
+
+
+def bench_stream(args) -> dict:
+    """Time to first visible text: blocking concurrent analysis vs. streaming."""
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    server = start_mock_server(latency=args.latency, token_rate=args.token_rate)
+    try:
+        analyzer = _analyzer_for(server)
+        idea = "A mobile app that helps busy professionals book last-minute fitness classes"
+
+        start = time.perf_counter()
+        analyzer.analyze_all_frameworks(idea, {}, concurrent=True)
+        blocking = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first_text = None
+        timings = {}
+        for event in analyzer.stream_all_frameworks(idea, {}):
+            if first_text is None and event.delta:
+                first_text = time.perf_counter() - start
+            if event.result is not None:
+                timings[event.key] = {name: round(value, 3) for name, value in event.result["timings"].items()}
+        return {
+            "blocking_first_text_seconds": round(blocking, 3),
+            "streaming_first_text_seconds": round(first_text, 3),
+            "streaming_total_seconds": round(time.perf_counter() - start, 3),
+            "per_framework": timings
+        }
+    finally:
+        server.shutdown()
+
+
+def _random_seats(count: int, seed: int = 7) -> list:
+    import random
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "view_quality": rng.choice([0.8, 0.9, 1.0, 1.1, 1.2]),
+            "distance": rng.randint(1, 40),
+            "section_popularity": rng.choice([1.0, 1.15, 1.3]),
+            "demand_factor": round(rng.uniform(0.8, 1.6), 2),
+            "accessibility": rng.choice([0.9, 1.0, 1.1])
+        }
+        for i in range(count)
+    ]
+
+
+def _seat_columns(seats: list) -> dict:
+    import numpy as np
+    from pricing import PRICING_FACTORS
+    return {name: np.array([seat[name] for seat in seats], dtype=np.float64) for name in PRICING_FACTORS}
+
+
+def bench_pricing(args) -> dict:
+    """price_seats (per-seat dicts) vs. the vectorized engine, with a parity check."""
+    from logic import ProductDiscoveryAnalyzer
+    analyzer = ProductDiscoveryAnalyzer()
+    results = {}
+    for size in args.sizes:
+        seats = _random_seats(size)
+        columns = _seat_columns(seats)
+
+        start = time.perf_counter()
+        looped = analyzer.price_seats(seats)
+        loop_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        prices = analyzer.price_seat_columns(columns)
+        vector_seconds = time.perf_counter() - start
+
+        mismatches = sum(1 for seat, price in zip(looped, prices.tolist()) if seat["price"] != price)
+        results[size] = {
+            "price_seats_seconds": round(loop_seconds, 4),
+            "vectorized_seconds": round(vector_seconds, 4),
+            "speedup": round(loop_seconds / vector_seconds, 1),
+            "mismatches": mismatches
+        }
+    return results
+
+
+def bench_inventory(args) -> dict:
+    """Memory and repricing cost: priced list of dicts vs. SeatInventory."""
+    import tracemalloc
+    from logic import ProductDiscoveryAnalyzer
+    from seat_inventory import SeatInventory
+    analyzer = ProductDiscoveryAnalyzer()
+    results = {}
+    for size in args.sizes:
+        seats = _random_seats(size)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        priced = analyzer.price_seats(seats)
+        dict_seconds = time.perf_counter() - start
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del priced
+
+        tracemalloc.start()
+        inventory = SeatInventory.from_dicts(seats)
+        build_bytes = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        inventory.reprice()
+        inventory_seconds = time.perf_counter() - start
+        inventory_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        results[size] = {
+            "dicts_bytes_per_seat": round(dict_bytes / size, 1),
+            "inventory_bytes_per_seat": round(inventory_bytes / size, 1),
+            "inventory_reprice_extra_bytes": inventory_bytes - build_bytes,
+            "dicts_reprice_seconds": round(dict_seconds, 4),
+            "inventory_reprice_seconds": round(inventory_seconds, 4)
+        }
+    return results
+
+
+def bench_tracker(args) -> dict:
+    """Per-tick cost of small price updates: full detect_highest_price_drop vs. PriceDropTracker."""
+    import random
+    from logic import ProductDiscoveryAnalyzer
+    from price_tracker import PriceDropTracker
+    analyzer = ProductDiscoveryAnalyzer()
+    rng = random.Random(11)
+    results = {}
+    for size in args.sizes:
+        priced = analyzer.price_seats(_random_seats(size))
+        prices = {seat["id"]: seat["price"] for seat in priced}
+        ticks = [
+            {rng.randrange(size): round(rng.uniform(50, 400), 2) for _ in range(10)}
+            for _ in range(args.ticks)
+        ]
+
+        start = time.perf_counter()
+        tracker = PriceDropTracker(prices)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        tracked = [tracker.update(changes) for changes in ticks]
+        tracker_seconds = (time.perf_counter() - start) / len(ticks)
+
+        # The full rescan is slow at this size, so only a few ticks are timed
+        full_ticks = ticks[:args.full_ticks]
+        current = dict(prices)
+        seats = [{"id": seat_id, "price": price} for seat_id, price in current.items()]
+        mismatches = 0
+        start = time.perf_counter()
+        for changes, event in zip(full_ticks, tracked):
+            current.update(changes)
+            new_seats = [{"id": seat_id, "price": price} for seat_id, price in current.items()]
+            drop = analyzer.detect_highest_price_drop(seats, new_seats)
+            seats = new_seats
+            mismatches += drop != ((event.seat_id, event.amount) if event else (None, 0))
+        full_seconds = (time.perf_counter() - start) / len(full_ticks)
+
+        results[size] = {
+            "tracker_build_seconds": round(build_seconds, 4),
+            "tracker_tick_microseconds": round(tracker_seconds * 1e6, 1),
+            "full_rescan_tick_microseconds": round(full_seconds * 1e6, 1),
+            "drops_detected": sum(event is not None for event in tracked),
+            "mismatches": mismatches
+        }
+    return results
+
+
+def bench_parallel(args) -> dict:
+    """Process-pool repricing of many events: scaling across worker counts."""
+    from parallel_pricing import ParallelPricer
+    from seat_inventory import SeatInventory
+    seats_per_event = max(args.sizes) // args.events
+    base = SeatInventory.from_dicts(_random_seats(seats_per_event))
+    shards = {}
+    for event in range(args.events):
+        shards[f"event-{event}"] = SeatInventory(base.ids, {name: column.copy() for name, column in base.columns.items()})
+
+    start = time.perf_counter()
+    for inventory in shards.values():
+        inventory.reprice()
+    results = {"seats": seats_per_event * args.events, "events": args.events, "cpus": os.cpu_count(),
+               "in_process_seconds": round(time.perf_counter() - start, 4)}
+    for workers in args.workers:
+        with ParallelPricer(workers=workers) as pricer:
+            pricer.price(shards)  # warm up the worker processes
+            start = time.perf_counter()
+            pricer.price(shards)
+            results[f"workers_{workers}_seconds"] = round(time.perf_counter() - start, 4)
+    return results
+
+
+_COLD_START = """
+import json, resource, sys, time
+start = time.perf_counter()
+if sys.argv[1] == "json":
+    from logic import ProductDiscoveryAnalyzer
+    with open(sys.argv[2]) as f:
+        seats = json.load(f)
+    prices = [seat["price"] for seat in ProductDiscoveryAnalyzer().price_seats(seats)]
+else:
+    from seatmap import load_seat_map
+    prices = load_seat_map(sys.argv[2], verify=sys.argv[1] == "seatmap").price()
+elapsed = time.perf_counter() - start
+try:
+    # ru_maxrss survives exec and would include the parent's peak; VmHWM does not
+    with open("/proc/self/status") as f:
+        peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": elapsed, "max_rss_kb": peak_kb}))
+"""
+
+
+def bench_seatmap(args) -> dict:
+    """Cold start (load + price) of a venue: JSON list of dicts vs. memory-mapped seat map."""
+    import subprocess
+    import sys
+    import tempfile
+    from seatmap import write_seat_map
+    size = max(args.sizes)
+    seats = _random_seats(size)
+    results = {"seats": size}
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "venue.json")
+        map_path = os.path.join(directory, "venue.seatmap")
+        with open(json_path, "w") as f:
+            json.dump(seats, f)
+        write_seat_map(map_path, seats)
+        results["json_file_bytes"] = os.path.getsize(json_path)
+        results["seatmap_file_bytes"] = os.path.getsize(map_path)
+        del seats
+        for variant, path in (("json", json_path), ("seatmap", map_path), ("seatmap_unverified", map_path)):
+            output = subprocess.run(
+                [sys.executable, "-c", _COLD_START, variant, path],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout
+            measured = json.loads(output.strip().splitlines()[-1])
+            results[variant] = {"seconds": round(measured["seconds"], 3), "max_rss_mb": round(measured["max_rss_kb"] / 1024, 1)}
+    return results
+
+
+def bench_case_studies(args) -> dict:
+    """All ten case studies: serial calls vs. the concurrent batch, then adding one company."""
+    os.environ["LLM_CACHE_PATH"] = ""
+    server = start_mock_server(latency=args.latency)
+    try:
+        analyzer = _analyzer_for(server)
+        from logic import response_cache
+        idea = "A mobile app that helps busy professionals book last-minute fitness classes"
+        companies = analyzer.get_case_study_companies()
+
+        response_cache.clear()
+        start = time.perf_counter()
+        for company in companies:
+            analyzer.analyze_case_study(idea, company, {})
+        serial = time.perf_counter() - start
+
+        response_cache.clear()
+        start = time.perf_counter()
+        list(analyzer.analyze_case_studies(idea, companies[:-1], {}))
+        batch = time.perf_counter() - start
+
+        requests_before = server.request_count
+        start = time.perf_counter()
+        list(analyzer.analyze_case_studies(idea, companies, {}))
+        return {
+            "companies": len(companies),
+            "serial_seconds": round(serial, 3),
+            "batch_seconds": round(batch, 3),
+            "add_one_company_seconds": round(time.perf_counter() - start, 3),
+            "add_one_company_requests": server.request_count - requests_before
+        }
+    finally:
+        server.shutdown()
+
+
+def _sample_analysis(scale: int) -> str:
+    """Framework-style markdown; scale=1 is roughly one typical LLM analysis (~2.5k characters)."""
+    block = [
+        "## Customer Profile",
+        "- **Customer Jobs**: book a class that fits a gap in a busy day",
+        "  - Find a slot within 30 minutes of the office",
+        "  - Pay without creating another account",
+        "- **Pains**: classes are full days ahead; cancellations are never resold",
+        "- **Gains**: a reliable way to exercise despite an unpredictable calendar",
+        "",
+        "## Value Map",
+        "1. Real-time availability aggregated across studios near the user",
+        "2. Instant booking of spots released by late cancellations",
+        "3. Studio dashboard showing revenue recovered from empty spots",
+        "",
+        "Studios & members both benefit: fewer empty spots, more flexible workouts <for now>.",
+        ""
+    ]
+    return "\n".join(block * (4 * scale))
+
+
+def bench_report(args) -> dict:
+    """Report build time and peak memory at 1x and 10x size: TXT, and PDF as one paragraph per analysis
+    (previous layout) vs. per-line flowables."""
+    import tracemalloc
+    from xml.sax.saxutils import escape
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+    from report_generator import ReportGenerator
+
+    class LegacyReportGenerator(ReportGenerator):
+        # The previous layout: each analysis is a single Paragraph, built into a BytesIO
+        def _format_pdf_report(self, product_idea, analysis_results):
+            import io
+            buffer = io.BytesIO()
+            doc = SimpleDocTemplate(buffer)
+            story = [Paragraph("Product Discovery Strategy Report", self.styles['Title']), Spacer(1, 24),
+                     Paragraph(escape(product_idea), self.styles['Normal'])]
+            for key in ("jtbd", "value_proposition", "opportunity_solution", "four_fit"):
+                # escape() only so the sample's "&" and "<" do not break the old markup
+                story.append(Paragraph(escape(analysis_results[key]['analysis']), self.styles['Normal']))
+            doc.build(story)
+            return buffer.getvalue()
+
+    idea = "A mobile app that helps busy professionals book last-minute fitness classes"
+    results = {}
+    for scale in (1, 10):
+        analyses = {key: {"analysis": _sample_analysis(scale)}
+                    for key in ("jtbd", "value_proposition", "opportunity_solution", "four_fit")}
+        modes = {
+            "single_paragraph": lambda: LegacyReportGenerator().generate_report(idea, analyses, "pdf")[0],
+            "flowables": lambda: ReportGenerator().generate_report(idea, analyses, "pdf")[0],
+            "flowables_chunked": lambda: sum(
+                len(chunk) for chunk in ReportGenerator().generate_report(idea, analyses, "pdf", chunked=True)[0]
+            ),
+            "txt": lambda: ReportGenerator().generate_report(idea, analyses, "txt")[0],
+        }
+        scale_results = {"analysis_chars": len(analyses["jtbd"]["analysis"]) * 4}
+        for mode, build in modes.items():
+            start = time.perf_counter()
+            output = build()
+            elapsed = time.perf_counter() - start
+            # Separate pass: tracemalloc slows reportlab down several times over
+            tracemalloc.start()
+            build()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            scale_results[mode] = {
+                "seconds": round(elapsed, 3),
+                "peak_mb": round(peak / 2 ** 20, 2),
+                "output_kb": round((output if isinstance(output, int) else len(output)) / 1024, 1)
+            }
+        results[f"{scale}x"] = scale_results
+    return results
+
+
+def bench_report_cache(args) -> dict:
+    """Repeat report downloads: uncached generation vs. memory and disk cache hits."""
+    import tempfile
+    from report_cache import ReportCache
+    from report_generator import ReportGenerator
+
+    idea = "A mobile app that helps busy professionals book last-minute fitness classes"
+    analyses = {key: {"analysis": _sample_analysis(1), "timings": {"total": 1.0}}
+                for key in ("jtbd", "value_proposition", "opportunity_solution", "four_fit")}
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        cached = ReportGenerator(ReportCache(directory=directory))
+        for fmt in ("txt", "pdf"):
+            timings = {}
+            for mode, generator in (("uncached", ReportGenerator()), ("first_cached", cached),
+                                    ("memory_hit", cached),
+                                    ("disk_hit", ReportGenerator(ReportCache(directory=directory)))):
+                start = time.perf_counter()
+                for _ in range(args.reruns if mode in ("uncached", "memory_hit") else 1):
+                    generator.generate_report(idea, analyses, fmt)
+                elapsed = time.perf_counter() - start
+                timings[mode + "_ms"] = round(elapsed * 1000 / (args.reruns if mode in ("uncached", "memory_hit")
+                                                                 else 1), 3)
+            # A rerun with new timings (e.g. re-streamed results) still hits the cache
+            analyses["jtbd"]["timings"] = {"total": 2.0}
+            before = cached.cache.stats()["builds"]
+            cached.generate_report(idea, analyses, fmt)
+            timings["rebuilt_after_timing_change"] = cached.cache.stats()["builds"] > before
+            results[fmt] = timings
+        results["cache"] = cached.cache.stats()
+    return results
+
+
+def bench_rerun(args) -> dict:
+    """Streamlit rerun cost: per-rerun setup without caching vs. full cached reruns of app.py."""
+    os.environ.setdefault("OPENROUTER_API_KEY", "mock-key")
+    from logic import ProductDiscoveryAnalyzer
+    from report_generator import ReportGenerator
+    from streamlit.testing.v1 import AppTest
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    start = time.perf_counter()
+    for _ in range(args.reruns):
+        ProductDiscoveryAnalyzer()
+        ReportGenerator()
+        with open(os.path.join(root, "styles.css")) as f:
+            f.read()
+    uncached_setup = (time.perf_counter() - start) / args.reruns
+
+    app = AppTest.from_file(os.path.join(root, "app.py"), default_timeout=30)
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        app.run()
+        start = time.perf_counter()
+        for _ in range(args.reruns):
+            app.run()
+        app_rerun = (time.perf_counter() - start) / args.reruns
+    finally:
+        os.chdir(cwd)
+    return {
+        "reruns": args.reruns,
+        "uncached_setup_ms": round(uncached_setup * 1000, 3),
+        "cached_app_rerun_ms": round(app_rerun * 1000, 3)
+    }
+
+
+def bench_batch(args) -> dict:
+    """batch.py throughput (ideas/minute) at concurrency 1 and 8, and a resumed run after a crash."""
+    import tempfile
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    server = start_mock_server(latency=args.latency)
+    try:
+        analyzer = _analyzer_for(server)
+        import logic
+        from batch import load_checkpoint, run_batch
+        ideas = [{"id": f"idea-{i}", "idea": f"Product idea number {i}", "answers": {"q0": f"Customer segment {i}"}}
+                 for i in range(args.ideas)]
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for concurrency in (1, 8):
+                # The serial run only needs enough ideas for a stable rate
+                count = min(len(ideas), 10) if concurrency == 1 else len(ideas)
+                output = os.path.join(directory, f"concurrency-{concurrency}.jsonl")
+                server.request_count = 0
+                totals = logic.client.run(run_batch(analyzer, iter(ideas[:count]), output, concurrency=concurrency,
+                                                    timeout=args.latency * 10, progress_every=0))
+                results[f"concurrency_{concurrency}"] = dict(totals, upstream_requests=server.request_count)
+            results["speedup"] = round(results["concurrency_8"]["ideas_per_minute"]
+                                       / results["concurrency_1"]["ideas_per_minute"], 2)
+
+            # Simulate a crash: keep half the records and cut the next one off mid-line
+            output = os.path.join(directory, "concurrency-8.jsonl")
+            with open(output, "rb") as f:
+                lines = f.readlines()
+            with open(output, "wb") as f:
+                f.writelines(lines[:len(lines) // 2])
+                f.write(lines[len(lines) // 2][:40])
+            done_before = len(load_checkpoint(output))
+            server.request_count = 0
+            totals = logic.client.run(run_batch(analyzer, iter(ideas), output, concurrency=8,
+                                                timeout=args.latency * 10, progress_every=0))
+            results["resume"] = dict(totals, checkpointed=done_before, upstream_requests=server.request_count,
+                                     complete=len(load_checkpoint(output)) == len(ideas))
+        return results
+    finally:
+        server.shutdown()
+
+
+def bench_metrics(args) -> dict:
+    """Instrumentation overhead: cost per recorded value, and instrumented vs. bare small pricing calls."""
+    from metrics import Counter, Histogram, registry, span
+    from logic import ProductDiscoveryAnalyzer
+    counter = Counter("bench_total", "benchmark", ("label",))
+    histogram = Histogram("bench_seconds", "benchmark", ("label",))
+    iterations = 200_000
+
+    def per_call_ns(fn) -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return round((time.perf_counter() - start) / iterations * 1e9, 1)
+
+    def timed():
+        with span("bench"):
+            pass
+
+    results = {
+        "counter_inc_ns": per_call_ns(lambda: counter.inc("jtbd")),
+        "histogram_observe_ns": per_call_ns(lambda: histogram.observe(0.012, "jtbd")),
+        "span_ns": per_call_ns(timed),
+    }
+    analyzer = ProductDiscoveryAnalyzer()
+    for size, rounds in ((10, 20_000), (1000, 200)):
+        seats = _random_seats(size)
+        timings = {}
+        for mode, fn in (("bare", lambda seats: analyzer._price_seats(seats, 100.0)),
+                         ("instrumented", analyzer.price_seats)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                fn(seats)
+            timings[mode] = (time.perf_counter() - start) / rounds
+        results[f"price_seats_{size}"] = {
+            "bare_us": round(timings["bare"] * 1e6, 2),
+            "instrumented_us": round(timings["instrumented"] * 1e6, 2),
+            "overhead_share": round(timings["instrumented"] / timings["bare"] - 1, 3)
+        }
+    start = time.perf_counter()
+    body = registry.render()
+    results["scrape_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    results["scrape_bytes"] = len(body)
+    return results
+
+
+def bench_prefetch(args) -> dict:
+    """
+    Submit-to-results latency with and without a prefetch started while the user types, per kind of answer.
+    Answers that add context refine the prefetch; the mock's 600-word completions are cut at the refine
+    call's 400-token cap, standing in for the shorter output it asks for.
+    """
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    server = start_mock_server(latency=args.latency, token_rate=args.token_rate, completion_words=600)
+    try:
+        analyzer = _analyzer_for(server)
+        import logic
+        from logic import FRAMEWORKS
+        from prefetch import PrefetchPolicy
+        policy = PrefetchPolicy.from_env()
+        idea = "A mobile app that helps busy professionals book last-minute fitness classes"
+        cases = {
+            "blank_answers": {"q0": "", "q1": "", "q2": ""},
+            "answers_repeat_idea": {"q0": "busy professionals", "q1": "last-minute classes", "q2": ""},
+            "answers_add_context": {"q0": "Nurses and doctors on rotating hospital shifts",
+                                    "q1": "They currently skip workouts because studios close before shifts end",
+                                    "q2": "Studios would pay a commission for filling empty evening spots"},
+        }
+        timeout = args.latency * 10
+        results = {}
+        for case, answers in cases.items():
+            server.request_count = server.completion_tokens = 0
+            start = time.perf_counter()
+            analyzer.analyze_all_frameworks(idea, answers, concurrent=True, timeout=timeout)
+            without = time.perf_counter() - start
+            baseline_requests, baseline_tokens = server.request_count, server.completion_tokens
+
+            server.request_count = server.completion_tokens = 0
+            prefetched = logic.client.submit(analyzer.analyze_all_frameworks_async(idea, {}, timeout=timeout))
+            time.sleep(args.think_time)
+            start = time.perf_counter()
+            decision = policy.decide(idea, answers)
+            if decision == "hit":
+                prefetched.result()
+            elif decision == "refined":
+                analyzer.refine_analyses(idea, answers, prefetched.result(), timeout=timeout)
+            else:
+                analyzer.analyze_all_frameworks(idea, answers, concurrent=True, timeout=timeout)
+            results[case] = {
+                "similarity": round(policy.similarity(idea, answers), 3),
+                "decision": decision,
+                "without_prefetch_seconds": round(without, 3),
+                "with_prefetch_seconds": round(time.perf_counter() - start, 3),
+                "requests_without_prefetch": baseline_requests,
+                "requests_with_prefetch": server.request_count,
+                "completion_tokens_without_prefetch": baseline_tokens,
+                "completion_tokens_with_prefetch": server.completion_tokens,
+                "wasted_calls": len(FRAMEWORKS) if decision == "miss" else 0
+            }
+        return results
+    finally:
+        server.shutdown()
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _serve_sessions(port: int, users: int, duration: float) -> dict:
+    """
+    Browser-like sessions against serve.py: load the page (which pins the session to a worker), open
+    the app websocket with the cookie, then rerun the script back to back until duration is up.
+    """
+    from collections import Counter
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ClientState_pb2 import ClientState
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+    from tornado.websocket import websocket_connect
+    rerun = BackMsg()
+    rerun.rerun_script.CopyFrom(ClientState())
+    rerun = rerun.SerializeToString()
+    latencies = []
+    pinned = Counter()
+    AsyncHTTPClient.configure(None, max_clients=users)
+
+    async def session(deadline: float):
+        response = await AsyncHTTPClient().fetch(f"http://127.0.0.1:{port}/")
+        cookie = response.headers["Set-Cookie"].split(";", 1)[0]
+        pinned[cookie.split("=", 1)[1]] += 1
+        connection = await websocket_connect(HTTPRequest(f"ws://127.0.0.1:{port}/_stcore/stream",
+                                                         headers={"Cookie": cookie}))
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await connection.write_message(rerun, binary=True)
+                while True:
+                    data = await connection.read_message()
+                    if data is None:
+                        raise ConnectionError("worker closed the session")
+                    message = ForwardMsg()
+                    message.ParseFromString(data)
+                    if message.WhichOneof("type") == "script_finished":
+                        break
+                latencies.append(time.perf_counter() - start)
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(start + duration) for _ in range(users)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "reruns": len(latencies),
+        "reruns_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "sessions_per_worker": dict(sorted(pinned.items()))
+    }
+
+
+def _rate_limited_process(path, per_minute: float, duration: float) -> int:
+    """Requests one process gets through a rate limiter in duration seconds (shared when path is set)."""
+    from rate_limit import RateLimiter
+    from shared_store import SharedStore
+    limiter = RateLimiter(requests_per_minute=per_minute, burst_seconds=1,
+                          store=SharedStore(path) if path else None)
+
+    async def run() -> int:
+        count = 0
+        deadline = time.time() + duration
+        while True:
+            await limiter.acquire()
+            if time.time() > deadline:
+                return count
+            count += 1
+
+    return asyncio.run(run())
+
+
+def bench_serve(args) -> dict:
+    """
+    serve.py throughput per worker count (script reruns/second over websocket sessions), and whether
+    one rate limit budget holds across worker processes.
+    """
+    import signal
+    import tempfile
+    import urllib.request
+    from concurrent.futures import ProcessPoolExecutor
+    root = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, OPENROUTER_API_KEY=os.getenv("OPENROUTER_API_KEY", "mock-key"),
+                   SHARED_STATE_PATH=os.path.join(directory, "shared_state.sqlite"),
+                   LLM_CACHE_PATH=os.path.join(directory, "llm_responses.sqlite"),
+                   REPORT_CACHE_DIR=os.path.join(directory, "reports"))
+        for workers in args.workers:
+            port = _free_port()
+            server = subprocess.Popen([sys.executable, os.path.join(root, "serve.py"), "--workers", str(workers),
+                                       "--port", str(port), "--worker-port", str(_free_port())],
+                                      env=env, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                deadline = time.monotonic() + 60 + 15 * workers
+                while True:
+                    try:
+                        urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2)
+                        break
+                    except OSError:
+                        if server.poll() is not None or time.monotonic() > deadline:
+                            raise RuntimeError(f"serve.py with {workers} workers did not come up")
+                        time.sleep(0.5)
+                results[f"workers_{workers}"] = asyncio.run(_serve_sessions(port, args.users, args.duration))
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait(30)
+        single = results.get("workers_1", {}).get("reruns_per_second")
+        if single:
+            for workers in args.workers:
+                run = results[f"workers_{workers}"]
+                run["speedup"] = round(run["reruns_per_second"] / single, 2)
+                run["scaling_efficiency"] = round(run["speedup"] / workers, 2)
+
+        # Every process draws on the one budget; without the shared store each would get its own
+        processes = max(args.workers)
+        per_minute = 600
+        allowed = per_minute / 60 * (1 + args.duration)
+        for mode, path in (("per_process", None), ("shared", os.path.join(directory, "rate_budget.sqlite"))):
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                counts = list(pool.map(_rate_limited_process, [path] * processes, [per_minute] * processes,
+                                       [args.duration] * processes))
+            results[f"rate_limit_{mode}"] = {
+                "processes": processes,
+                "requests": sum(counts),
+                "allowed": round(allowed),
+                "within_budget": sum(counts) <= allowed
+            }
+    results["cpus"] = os.cpu_count()
+    return results
+
+
+# Rewordings that should share a response, and ideas that look alike but should not
+_DUPLICATE_IDEAS = [
+    ("An app to book last-minute gym classes", "app for booking last-minute gym classes"),
+    ("A mobile app that helps busy professionals book last-minute fitness classes",
+     "Mobile app helping busy professionals book fitness classes at the last minute"),
+    ("Meal kits for night shift nurses", "Meal kits for night-shift nurses."),
+    ("Subscription service for refurbished kids' bikes", "A subscription service for refurbished bikes for kids"),
+    ("Marketplace connecting freelance translators with small law firms",
+     "marketplace that connects small law firms with freelance translators"),
+    ("AI tool that summarizes long email threads for managers", "AI tool summarizing long email threads for managers"),
+    ("Peer-to-peer rental of camping gear", "peer to peer camping gear rentals"),
+    ("Budgeting app for college students with part-time jobs",
+     "A budgeting app for college students who have part-time jobs"),
+]
+_DISTINCT_IDEAS = [
+    ("An app to book last-minute gym classes", "An app to book last-minute yoga classes"),
+    ("An app to book last-minute gym classes", "An app to book last-minute restaurant tables"),
+    ("Meal kits for night shift nurses", "Meal kits for vegan college students"),
+    ("A mobile app that helps busy professionals book last-minute fitness classes",
+     "A mobile app that helps busy parents find last-minute babysitters"),
+    ("Subscription service for refurbished kids' bikes", "Subscription service for refurbished laptops"),
+    ("Peer-to-peer rental of camping gear", "Peer-to-peer rental of power tools"),
+    ("Budgeting app for college students with part-time jobs", "Budgeting app for retirees on fixed incomes"),
+    ("AI tool that summarizes long email threads for managers", "AI tool that drafts replies to customer emails"),
+    # One word apart in a long idea: the similarity alone is above every threshold
+    ("A mobile app that helps busy professionals in large cities book last-minute fitness classes at nearby "
+     "studios, with instant confirmation and flexible cancellation",
+     "A mobile app that helps busy professionals in large cities book last-minute yoga classes at nearby "
+     "studios, with instant confirmation and flexible cancellation"),
+    ("Marketplace connecting freelance translators with small law firms that need contracts translated "
+     "overnight, priced per page with a guaranteed turnaround",
+     "Marketplace connecting freelance illustrators with small law firms that need contracts translated "
+     "overnight, priced per page with a guaranteed turnaround"),
+]
+
+
+def bench_semantic(args) -> dict:
+    """
+    Semantic cache: hit and false-hit rates on labelled idea pairs per threshold, lookup cost and
+    memory at full size, and upstream calls saved on a stream of analyses where half are rewordings.
+    """
+    from semantic_cache import SemanticCache, same_terms, vectorize
+    results = {"thresholds": {}}
+    duplicate = [(float(vectorize(a) @ vectorize(b)), same_terms(a, b)) for a, b in _DUPLICATE_IDEAS]
+    distinct = [(float(vectorize(a) @ vectorize(b)), same_terms(a, b)) for a, b in _DISTINCT_IDEAS]
+    for threshold in (0.8, 0.85, 0.88, 0.9, 0.95):
+        results["thresholds"][str(threshold)] = {
+            "duplicate_hit_rate": round(sum(score >= threshold and same for score, same in duplicate)
+                                        / len(duplicate), 3),
+            # Without the word check, for comparison
+            "similarity_only_false_hit_rate": round(sum(score >= threshold for score, _ in distinct)
+                                                    / len(distinct), 3),
+            "false_hit_rate": round(sum(score >= threshold and same for score, same in distinct) / len(distinct), 3)
+        }
+
+    for entries in (200, 2000):
+        cache = SemanticCache(enabled=True, max_entries=entries)
+        for i in range(entries):
+            cache.add("jtbd", f"Product idea number {i} for segment {i * 7 % 101}", "x" * 2000)
+        start = time.perf_counter()
+        for i in range(500):
+            cache.lookup("jtbd", f"product idea {i} for segment {i * 7 % 101}")
+        stats = cache.stats()
+        results[f"index_{entries}"] = {
+            "lookup_us": round((time.perf_counter() - start) / 500 * 1e6, 1),
+            "index_kb": round(stats["index_bytes"] / 1024, 1),
+            "payload_kb": round(stats["payload_bytes"] / 1024, 1)
+        }
+
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    server = start_mock_server(latency=args.latency)
+    try:
+        analyzer = _analyzer_for(server)
+        import logic
+        # Every original idea, then every rewording
+        ideas = [a for a, _ in _DUPLICATE_IDEAS] + [b for _, b in _DUPLICATE_IDEAS]
+        for mode, enabled in (("exact_only", False), ("semantic", True)):
+            logic.semantic_cache = SemanticCache(enabled=enabled)
+            server.request_count = 0
+            start = time.perf_counter()
+            for idea in ideas:
+                analyzer.get_follow_up_questions(idea)
+                analyzer.analyze_all_frameworks(idea, {}, concurrent=True, timeout=args.latency * 10)
+            results[mode] = {"ideas": len(ideas), "upstream_requests": server.request_count,
+                             "seconds": round(time.perf_counter() - start, 3)}
+            if enabled:
+                results[mode]["hit_rate"] = round(logic.semantic_cache.stats()["hit_rate"], 3)
+        results["request_reduction"] = round(
+            1 - results["semantic"]["upstream_requests"] / results["exact_only"]["upstream_requests"], 3)
+    finally:
+        server.shutdown()
+    return results
+
+
+BENCHMARKS = {
+    "frameworks": bench_frameworks,
+    "combined": bench_combined,
+    "tokens": bench_tokens,
+    "pool": bench_pool,
+    "stream": bench_stream,
+    "faults": bench_faults,
+    "coalesce": bench_coalesce,
+    "pricing": bench_pricing,
+    "inventory": bench_inventory,
+    "tracker": bench_tracker,
+    "parallel": bench_parallel,
+    "seatmap": bench_seatmap,
+    "case_studies": bench_case_studies,
+    "report": bench_report,
+    "report_cache": bench_report_cache,
+    "rerun": bench_rerun,
+    "batch": bench_batch,
+    "metrics": bench_metrics,
+    "prefetch": bench_prefetch,
+    "serve": bench_serve,
+    "semantic": bench_semantic,
+}
+
+
+# Offline, deterministic enough to compare between runs, and covering orchestration, pricing and reports
+SUITE = ("frameworks", "combined", "pricing", "tracker", "report", "report_cache")
+
+# Leaf names of metrics where a larger value is better; other timing and size metrics are better smaller
+_HIGHER_IS_BETTER = ("speedup", "per_minute", "per_second", "reduction")
+_LOWER_IS_BETTER = ("seconds", "_ms", "_us", "_ns", "_mb", "_kb", "bytes")
+
+
+def _flatten(results, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Metrics that moved the wrong way by more than threshold (a fraction) between two results dicts,
+    as (metric, baseline value, current value, relative change).
+    """
+    regressions = []
+    old_metrics, new_metrics = _flatten(baseline), _flatten(current)
+    for path, new in new_metrics.items():
+        old = old_metrics.get(path)
+        if not old:
+            continue
+        leaf = path.rsplit(".", 1)[-1]
+        change = (new - old) / abs(old)
+        if any(marker in leaf for marker in _HIGHER_IS_BETTER):
+            worse = change < -threshold
+        elif any(marker in leaf for marker in _LOWER_IS_BETTER):
+            worse = change > threshold
+        else:
+            continue
+        if worse:
+            regressions.append((path, old, new, round(change, 3)))
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _run_isolated(name: str, args) -> dict:
+    """
+    Run one benchmark in a fresh interpreter: logic binds its client (and the mock server's port)
+    at import, and peak-memory figures should not include earlier benchmarks.
+    """
+    argv = [sys.executable, os.path.abspath(__file__), name]
+    for dest, value in vars(args).items():
+        if dest in ("benchmarks", "output", "compare", "threshold"):
+            continue
+        argv.append("--" + dest.replace("_", "-"))
+        argv.extend(str(item) for item in (value if isinstance(value, list) else [value]))
+    process = subprocess.run(argv, capture_output=True, text=True)
+    # Progress notes, warnings and, on failure, the traceback
+    sys.stderr.write(process.stderr)
+    if process.returncode != 0:
+        last_line = process.stderr.strip().splitlines()[-1:] or [""]
+        return {"error": f"exited with status {process.returncode}: {last_line[0]}"}
+    try:
+        return json.loads(process.stdout)[name]
+    except (ValueError, KeyError) as e:
+        return {"error": f"unreadable output: {e}"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run offline performance benchmarks.")
+    parser.add_argument("benchmarks", nargs="+", choices=sorted(BENCHMARKS) + ["suite"], metavar="benchmark",
+                        help=f"One or more of: {', '.join(sorted(BENCHMARKS))}; or suite ({', '.join(SUITE)})")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock LLM latency in seconds")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Mock words per second (stream benchmark)")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent users for the pool and serve benchmarks")
+    parser.add_argument("--requests", type=int, default=500, help="Total requests for the pool benchmark")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="Injected failure share (faults benchmark)")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Injected slow-request share (faults benchmark)")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="Seconds for a slow request (faults benchmark)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Venue sizes for the pricing benchmarks")
+    parser.add_argument("--ticks", type=int, default=10_000, help="Price update ticks for the tracker benchmark")
+    parser.add_argument("--full-ticks", type=int, default=5, help="Ticks timed for the full-rescan baseline")
+    parser.add_argument("--events", type=int, default=16, help="Events to shard across for the parallel benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Worker counts for the parallel and serve benchmarks")
+    parser.add_argument("--rounds", type=int, default=12, help="Analyses per mode for the tokens benchmark")
+    parser.add_argument("--ideas", type=int, default=200, help="Ideas to analyze for the batch benchmark")
+    parser.add_argument("--think-time", type=float, default=2.0,
+                        help="Seconds the user spends answering before submitting (prefetch benchmark)")
+    parser.add_argument("--reruns", type=int, default=50, help="Script reruns for the rerun benchmark")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per run (serve benchmark)")
+    parser.add_argument("--output", help="Also write the results and run metadata to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON file from an earlier --output to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative change that counts as a regression in --compare (default 0.2)")
+    args = parser.parse_args()
+
+    names = []
+    for name in args.benchmarks:
+        for expanded in (SUITE if name == "suite" else (name,)):
+            if expanded not in names:
+                names.append(expanded)
+    if len(names) == 1:
+        results = {names[0]: BENCHMARKS[names[0]](args)}
+    else:
+        results = {}
+        for name in names:
+            print(f"running {name}...", file=sys.stderr)
+            results[name] = _run_isolated(name, args)
+            if "error" in results[name]:
+                # Recorded in the results; the remaining benchmarks still run
+                print(f"FAILED {name}: {results[name]['error']}", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+    failed = [name for name, result in results.items() if "error" in result]
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+            },
+            "results": results
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        baseline_args = baseline.get("meta", {}).get("args", {})
+        changed = sorted(key for key, value in baseline_args.items()
+                         if key not in ("benchmarks", "threshold") and vars(args).get(key) != value)
+        if changed:
+            print(f"note: options differ from the baseline run: {', '.join(changed)}", file=sys.stderr)
+        regressions = compare(baseline.get("results", baseline), results, args.threshold)
+        for path, old, new, change in regressions:
+            print(f"REGRESSION {path}: {old} -> {new} ({change:+.0%})", file=sys.stderr)
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} vs. {args.compare}", file=sys.stderr)
+        sys.exit(1 if regressions or failed else 0)
+    if failed:
+        print(f"{len(failed)} benchmark(s) failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
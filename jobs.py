@@ -0,0 +1,349 @@
+"""
+Background job queue for long-running analyses.
+
+Jobs run on a process-wide worker pool, so they outlive the Streamlit script
+run that submitted them: a session stores the job id and polls for progress
+or the result on later reruns. Identical submissions share one job, which is
+only cancelled once every subscriber (e.g. session) that submitted it has
+cancelled it, and finished jobs are kept for a retention period.
+
+With a SharedStore (several app worker processes, see serve.py), job records
+and results are also written to the shared file: an identical submission in
+another worker joins the running job or reuses its result, and any worker can
+poll a job's status and result. Partial progress and cancellation stay with
+the process that runs the job.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set
+
+from metrics import registry
+from shared_store import SharedStore
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when it notices its job was cancelled."""
+
+
+class Job:
+    def __init__(self, job_id: str, key: Optional[str]):
+        self.id = job_id
+        self.key = key
+        self.status = PENDING
+        self.result: Any = None
+        self.error: Optional[str] = None
+        # Free-form progress the job function publishes for pollers (e.g. partial text)
+        self.progress: Dict[str, Any] = {}
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.future: Optional[Future] = None
+        # Ids of the submitters waiting for this job in this process
+        self.subscribers: Set[str] = set()
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Call from long-running job code to stop early once the job is cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    def __init__(self, workers: int = 8, retention: float = 3600, max_jobs: int = 1000,
+                 store: Optional[SharedStore] = None):
+        """
+        workers: jobs that run at the same time; later ones wait in the queue
+        retention: seconds a finished job (and its result) is kept for polling
+        max_jobs: finished jobs beyond this count are dropped oldest-first
+        store: share job records and results with other processes through this store
+        """
+        self.retention = retention
+        self.max_jobs = max_jobs
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        # Finished jobs whose final state could not be written to the store yet
+        self._unsaved: Dict[str, Job] = {}
+        if store is not None:
+            store.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                          "id TEXT PRIMARY KEY, key TEXT, status TEXT NOT NULL, owner INTEGER NOT NULL, "
+                          "created REAL NOT NULL, finished REAL, result TEXT, error TEXT)")
+            store.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created)")
+            store.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished)")
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(
+            workers=int(os.getenv("JOB_WORKERS", "8")),
+            retention=float(os.getenv("JOB_RETENTION", "3600")),
+            max_jobs=int(os.getenv("JOB_MAX_RETAINED", "1000")),
+            store=SharedStore.from_env()
+        )
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Stable key for deduplicating jobs with identical inputs."""
+        payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def submit(self, fn: Callable[..., Any], *args, key: Optional[str] = None, subscriber: Optional[str] = None,
+               **kwargs) -> str:
+        """
+        Run fn(job, *args, **kwargs) in the background and return the job id.
+        key: jobs with the same key share one run while it is pending, running or done;
+            failed and cancelled jobs are replaced by a fresh run
+        subscriber: id of who waits for the result (e.g. a session), to pass to cancel(); a fresh id by default
+        """
+        subscriber = subscriber or uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            existing = self._live_job(key)
+            if existing is not None:
+                existing.subscribers.add(subscriber)
+                return existing.id
+        job = Job(uuid.uuid4().hex, key)
+        job.subscribers.add(subscriber)
+        if self.store is not None:
+            # Outside the lock: a busy store must not hold up get() and status polls in other sessions
+            try:
+                self._prune_shared()
+                shared_id = self._claim_shared(job)
+            except sqlite3.Error:
+                # Run it here without sharing rather than not at all
+                shared_id = None
+            if shared_id is not None:
+                with self._lock:
+                    # Only jobs this process runs can be cancelled, so only their subscribers count
+                    joined = self._jobs.get(shared_id)
+                    if joined is not None:
+                        joined.subscribers.add(subscriber)
+                return shared_id
+        with self._lock:
+            # Another session in this process may have submitted the same key meanwhile
+            existing = self._live_job(key)
+            if existing is None:
+                self._jobs[job.id] = job
+                if key is not None:
+                    self._by_key[key] = job.id
+                job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+                return job.id
+        if self.store is not None:
+            try:
+                self.store.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+            except sqlite3.Error:
+                pass
+        return existing.id
+
+    def _live_job(self, key: Optional[str]) -> Optional[Job]:
+        """This process's pending, running or done job for key (call with the lock held)."""
+        if key is None or key not in self._by_key:
+            return None
+        existing = self._jobs.get(self._by_key[key])
+        # A running job whose last subscriber cancelled it is stopping; it is not joined
+        if existing is None or existing.status in (FAILED, CANCELLED) or existing.cancelled:
+            return None
+        return existing
+
+    def _claim_shared(self, job: Job) -> Optional[str]:
+        """
+        Record job in the shared store, unless another process has a live or finished job with the
+        same key; that job's id is returned instead. Check and insert are one transaction.
+        """
+        now = time.time()
+        with self.store.transaction() as db:
+            if job.key is not None:
+                row = db.execute("SELECT id, status, owner, finished FROM jobs WHERE key = ? "
+                                 "ORDER BY created DESC LIMIT 1", (job.key,)).fetchone()
+                if row is not None:
+                    job_id, status, owner, finished = row
+                    if status == DONE and now - finished <= self.retention:
+                        return job_id
+                    # A row of this process is only live if the job is in memory (the pid may be reused)
+                    if status in (PENDING, RUNNING) and _process_alive(owner):
+                        if owner != os.getpid():
+                            return job_id
+                        with self._lock:
+                            live = self._live_job(job.key)
+                        if live is not None and live.id == job_id:
+                            return job_id
+            db.execute("INSERT INTO jobs (id, key, status, owner, created) VALUES (?, ?, ?, ?, ?)",
+                       (job.id, job.key, PENDING, os.getpid(), job.created))
+        return None
+
+    def _save_shared(self, job: Job):
+        if self.store is None:
+            return
+        result = json.dumps(job.result, default=str, ensure_ascii=False) if job.status == DONE else None
+        self.store.execute("UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE id = ?",
+                           (job.status, job.finished, result, job.error, job.id))
+
+    def _load_shared(self, job_id: str) -> Optional[Job]:
+        """Snapshot of a job another process runs (or ran), without its progress."""
+        row = self.store.execute("SELECT key, status, owner, created, finished, result, error FROM jobs "
+                                 "WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        key, status, owner, created, finished, result, error = row
+        job = Job(job_id, key)
+        job.status, job.created, job.finished, job.error = status, created, finished, error
+        job.result = json.loads(result) if result is not None else None
+        if not job.done and not _process_alive(owner):
+            job.status, job.error = FAILED, "the worker process running this job exited"
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], args, kwargs):
+        if job.cancelled:
+            return
+        try:
+            job.status = RUNNING
+            # Inside the try: a store error fails the job instead of leaving it running forever
+            self._save_shared(job)
+            result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        else:
+            if job.cancelled:
+                job.status = CANCELLED
+            else:
+                job.result = result
+                job.status = DONE
+        finally:
+            job.finished = time.time()
+            try:
+                self._save_shared(job)
+            except Exception:
+                # The local job is still complete; other processes see it once a later submit saves it
+                with self._lock:
+                    self._unsaved[job.id] = job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job, from this process or (with a shared store) from the process that runs it."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self._load_shared(job_id)
+        return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """Block until the job finishes (or timeout) and return it."""
+        job = self.get(job_id)
+        if job is not None and job.future is not None:
+            try:
+                job.future.result(timeout)
+            except Exception:
+                pass
+            return job
+        # Run by another process: poll the shared store
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while job is not None and not job.done and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.1)
+            job = self.get(job_id)
+        return job
+
+    def cancel(self, job_id: str, subscriber: Optional[str] = None, pending_only: bool = False) -> bool:
+        """
+        Withdraw a subscriber from a job and cancel the job once none is left. Pending jobs never
+        start; running jobs stop at their next check_cancelled() and their result is discarded.
+        subscriber: the id the job was submitted with; None cancels it for every subscriber
+        pending_only: leave the job to finish if it has already started
+        Returns whether the job was cancelled.
+        """
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        if job.future is None:
+            # Runs in another process
+            return False
+        with self._lock:
+            if subscriber is None:
+                job.subscribers.clear()
+            else:
+                job.subscribers.discard(subscriber)
+            if job.subscribers or (pending_only and job.status != PENDING):
+                return False
+            job._cancel.set()
+        if job.future.cancel():
+            job.status = CANCELLED
+            job.finished = time.time()
+            self._save_shared(job)
+        return True
+
+    def _prune(self):
+        now = time.time()
+        finished = sorted(
+            (job for job in self._jobs.values() if job.done and job.finished is not None),
+            key=lambda job: job.finished
+        )
+        expired = [job for job in finished if now - job.finished > self.retention]
+        overflow = len(finished) - len(expired) - self.max_jobs
+        if overflow > 0:
+            expired += [job for job in finished if now - job.finished <= self.retention][:overflow]
+        for job in expired:
+            del self._jobs[job.id]
+            if job.key is not None and self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+
+    def _prune_shared(self):
+        self.store.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?",
+                           (time.time() - self.retention,))
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, {}
+        for job in unsaved.values():
+            try:
+                self._save_shared(job)
+            except Exception:
+                with self._lock:
+                    self._unsaved[job.id] = job
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {status: 0 for status in (PENDING, RUNNING, DONE, FAILED, CANCELLED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+
+# Process-wide queue shared by every Streamlit session
+job_queue = JobQueue.from_env()
+
+
+def _collect_job_metrics():
+    return [("analysis_jobs", "Analysis jobs held by the job queue, by status", "gauge",
+             [({"status": status}, count) for status, count in job_queue.stats().items()])]
+
+
+registry.register_collector("jobs", _collect_job_metrics)
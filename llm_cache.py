@@ -0,0 +1,199 @@
+"""
+Content-addressed cache for LLM responses.
+
+Entries are keyed on a hash of everything that determines the completion
+(model, system prompt, user prompt, max_tokens). A bounded in-memory LRU sits
+in front of an optional SQLite file that survives restarts; both tiers expire
+entries after a TTL and the file tier is trimmed to a maximum entry count.
+
+SQLite reads and writes run on one I/O thread owned by the cache, so the LLM
+client's event loop only waits for a disk read (get_async) and never for a
+write; the file is trimmed every trim_every stores rather than on each one.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from shared_store import configure_shared_connection
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 512, path: Optional[str] = None, ttl: float = 7 * 24 * 3600,
+                 max_disk_entries: int = 10000, trim_every: int = 100):
+        """
+        max_entries: LRU capacity of the in-memory tier (0 disables it)
+        path: SQLite file for the persistent tier (None disables it)
+        ttl: seconds an entry stays valid in either tier
+        max_disk_entries: least recently used rows beyond this count are evicted from the file
+        trim_every: stores between two trims of the file, which may exceed max_disk_entries by this many rows
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.trim_every = max(1, trim_every)
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                       "disk_errors": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        # The only thread that touches the connection, so file operations stay in order
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache-io")
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            # Several app worker processes may share the file (see serve.py)
+            configure_shared_connection(self._db)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        if os.getenv("LLM_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+            return cls(max_entries=0, path=None)
+        return cls(
+            max_entries=int(os.getenv("LLM_CACHE_SIZE", "512")),
+            path=os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite") or None,
+            ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+            max_disk_entries=int(os.getenv("LLM_CACHE_MAX_DISK_ENTRIES", "10000")),
+            trim_every=int(os.getenv("LLM_CACHE_TRIM_EVERY", "100"))
+        )
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt: str, max_tokens: int, *extra) -> str:
+        """extra: further request options that change the response (e.g. response_format)."""
+        payload = json.dumps([model, system_prompt, prompt, max_tokens, *extra], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    def get(self, key: str) -> Optional[str]:
+        found, value = self._get_memory(key)
+        if found or self._db is None:
+            return self._missed(found, value)
+        # Behind any queued write of the same key
+        return self._io.submit(self._get_disk, key).result()
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """get() for the LLM client loop: the SQLite read runs on the cache's I/O thread."""
+        found, value = self._get_memory(key)
+        if found or self._db is None:
+            return self._missed(found, value)
+        return await asyncio.wrap_future(self._io.submit(self._get_disk, key))
+
+    def _get_memory(self, key: str) -> Tuple[bool, Optional[str]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if now - created < self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return True, value
+                del self._memory[key]
+        return False, None
+
+    def _missed(self, found: bool, value: Optional[str]) -> Optional[str]:
+        if not found:
+            with self._lock:
+                self._stats["misses"] += 1
+        return value
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        now = time.time()
+        try:
+            row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                value, created = row
+                if now - created < self.ttl:
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    with self._lock:
+                        self._remember(key, value, created)
+                        self._stats["disk_hits"] += 1
+                    return value
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+        except sqlite3.Error:
+            # A busy or broken file is a miss, never a failed call
+            with self._lock:
+                self._stats["disk_errors"] += 1
+        return self._missed(False, None)
+
+    def set(self, key: str, value: str):
+        """Store value; the memory tier is updated now and the file write is queued on the I/O thread."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._stats["stores"] += 1
+            self._unsaved += 1
+            trim = self._unsaved >= self.trim_every
+            if trim:
+                self._unsaved = 0
+        if self._db is not None:
+            self._io.submit(self._set_disk, key, value, now, trim)
+
+    def _set_disk(self, key: str, value: str, now: float, trim: bool):
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            if trim:
+                self._trim_disk(now)
+        except sqlite3.Error:
+            with self._lock:
+                self._stats["disk_errors"] += 1
+
+    def _remember(self, key: str, value: str, created: float):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _trim_disk(self, now: float):
+        expired = self._db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,)).rowcount
+        overflow = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)", (overflow,)
+            )
+        with self._lock:
+            self._stats["evictions"] += max(0, expired) + max(0, overflow)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            self._io.submit(self._db.execute, "DELETE FROM responses").result()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters plus the current size of each tier."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        stats["disk_entries"] = (
+            self._io.submit(lambda: self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]).result()
+            if self._db is not None else 0
+        )
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
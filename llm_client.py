@@ -0,0 +1,231 @@
+"""
+Shared async LLM client for OpenRouter.
+
+AsyncOpenAI clients with pooled httpx transports run on a dedicated event loop
+thread, so every Streamlit session (and every thread) reuses the same keep-alive
+connections instead of opening its own sockets. Requests are retried, hedged and
+guarded by a circuit breaker as configured (see resilience.py).
+"""
+import asyncio
+import itertools
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Awaitable, Dict, List, Optional, TypeVar
+
+import httpx
+from openai import AsyncOpenAI
+
+from rate_limit import RateLimiter
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, RetryPolicy, is_retryable, retry_after
+from token_usage import estimate_tokens
+
+T = TypeVar("T")
+
+# Duplicate requests a single hedged attempt may send
+_MAX_HEDGES = 2
+
+
+class LLMClient:
+    def __init__(self, base_url: str, api_key: Optional[str], max_connections: int = 100,
+                 max_keepalive_connections: int = 100, keepalive_expiry: float = 30.0,
+                 http2: bool = False, timeout: float = 60.0, pool_shards: int = 4,
+                 retry: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None,
+                 hedge_after: Optional[float] = None, limiter: Optional[RateLimiter] = None):
+        """
+        base_url/api_key: OpenRouter-compatible endpoint and key
+        max_connections: hard cap on open sockets across all callers
+        max_keepalive_connections: idle sockets kept warm for reuse
+        keepalive_expiry: seconds an idle socket stays in the pool
+        http2: multiplex requests over HTTP/2 (needs `pip install httpx[http2]`)
+        timeout: default request timeout in seconds
+        pool_shards: split the connection budget over this many independent pools;
+            httpcore's pool bookkeeping grows quadratically with its size, so several
+            small pools schedule hundreds of concurrent requests far faster than one big one
+        retry: retry policy for retryable failures (default: no retries)
+        breaker: circuit breaker shared by all calls (default: none)
+        hedge_after: send a duplicate of a non-streaming request that has not answered after
+            this many seconds and use whichever finishes first (None disables hedging)
+        limiter: requests/tokens per minute budget every upstream request (retries and hedges
+            included) waits for (default: unlimited)
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.pool_shards = max(1, pool_shards)
+        self.limits = httpx.Limits(
+            max_connections=math.ceil(max_connections / self.pool_shards),
+            max_keepalive_connections=math.ceil(max_keepalive_connections / self.pool_shards),
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy(max_attempts=1)
+        self.breaker = breaker or CircuitBreaker(failure_threshold=0)
+        self.hedge_after = hedge_after or None
+        self.limiter = limiter or RateLimiter()
+        self._stats = {"requests": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "rejected": 0}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients: List[AsyncOpenAI] = []
+        self._next_shard = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "LLMClient":
+        return cls(
+            base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "100")),
+            keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+            http2=os.getenv("LLM_HTTP2", "").lower() in ("1", "true", "yes"),
+            timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+            pool_shards=int(os.getenv("LLM_POOL_SHARDS", "4")),
+            retry=RetryPolicy.from_env(),
+            breaker=CircuitBreaker.from_env(),
+            hedge_after=float(os.getenv("LLM_HEDGE_AFTER", "0")),
+            limiter=RateLimiter.from_env()
+        )
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+                self._clients = [
+                    AsyncOpenAI(
+                        base_url=self.base_url,
+                        api_key=self.api_key,
+                        timeout=self.timeout,
+                        # Retries are handled here, with deadlines and the circuit breaker
+                        max_retries=0,
+                        http_client=httpx.AsyncClient(limits=self.limits, http2=self.http2, timeout=self.timeout)
+                    )
+                    for _ in range(self.pool_shards)
+                ]
+                self._loop = loop
+            return self._loop
+
+    async def create_chat_completion(self, deadline: Optional[float] = None, **kwargs):
+        """
+        Await a chat completion from any event loop; the request itself runs on the pooled client.
+        deadline: time.monotonic() by which the call must finish, retries included; each attempt's
+            timeout is cut to the time left and no retry is started that could not finish in time
+        Raises CircuitOpenError while the circuit breaker is open, DeadlineExceeded when the
+        deadline runs out, or the last attempt's error.
+        """
+        loop = self._start()
+        request = self._call_with_retries(deadline, kwargs)
+        if _running_loop() is loop:
+            return await request
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(request, loop))
+
+    async def _call_with_retries(self, deadline: Optional[float], kwargs: Dict):
+        self._stats["requests"] += 1
+        timeout = kwargs.pop("timeout", None) or self.timeout
+        attempt = 0
+        while True:
+            attempt_timeout = timeout
+            if deadline is not None:
+                attempt_timeout = min(timeout, deadline - time.monotonic())
+                if attempt_timeout <= 0:
+                    raise DeadlineExceeded("LLM call deadline exceeded")
+            if not self.breaker.allow():
+                self._stats["rejected"] += 1
+                raise CircuitOpenError("LLM upstream is failing; circuit breaker is open")
+            attempt += 1
+            try:
+                response = await self._attempt(dict(kwargs, timeout=attempt_timeout))
+            except Exception as e:
+                if not is_retryable(e):
+                    # The upstream answered; the request itself is at fault
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.retry.max_attempts:
+                    raise
+                delay = self.retry.delay(attempt, retry_after(e))
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                self._stats["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (or interrupted) before the upstream answered: a half-open probe must not stay taken
+                self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            return response
+
+    async def _attempt(self, kwargs: Dict):
+        """One logical attempt, hedged with a duplicate request when the first is slow."""
+        first = asyncio.ensure_future(self._send(kwargs))
+        tasks = [first]
+        try:
+            if self.hedge_after is None or kwargs.get("stream"):
+                return await first
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                self._stats["hedges"] += 1
+                tasks.append(asyncio.ensure_future(self._send(kwargs)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self._stats["hedge_wins"] += 1
+                        return task.result()
+                    if pending and len(tasks) < 1 + _MAX_HEDGES and is_retryable(task.exception()):
+                        # A copy failed fast while another is still slow: replace it
+                        self._stats["hedges"] += 1
+                        tasks.append(asyncio.ensure_future(self._send(kwargs)))
+                        pending.add(tasks[-1])
+            # Every copy failed: report the original request's error
+            return first.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _send(self, kwargs: Dict):
+        if self.limiter.enabled:
+            # Providers count the completion allowance (max_tokens) against the token limit up front
+            tokens = sum(estimate_tokens(message.get("content") or "") for message in kwargs.get("messages", ()))
+            await self.limiter.acquire(tokens + (kwargs.get("max_tokens") or 0))
+        self._stats["attempts"] += 1
+        shard = self._clients[next(self._next_shard) % len(self._clients)]
+        return await shard.chat.completions.create(**kwargs)
+
+    def stats(self) -> Dict[str, object]:
+        """Request, retry and hedge counters, the circuit breaker state and rate limiter queue metrics."""
+        return dict(self._stats, breaker=self.breaker.state, breaker_opens=self.breaker.opens,
+                    rate_limiter=self.limiter.stats())
+
+    def submit(self, coro: Awaitable[T]) -> "Future[T]":
+        """Schedule a coroutine on the client loop and return a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._start())
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run a coroutine on the client loop and block until it finishes."""
+        loop = self._start()
+        if _running_loop() is loop:
+            raise RuntimeError("LLMClient.run() cannot block inside the client loop; await the coroutine instead")
+        return self.submit(coro).result()
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            for shard in self._clients:
+                asyncio.run_coroutine_threadsafe(shard.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop, self._clients = None, []
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
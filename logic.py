@@ -1,13 +1,125 @@
-import os
-from openai import OpenAI
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import asyncio
+import hashlib
 import json
+import queue
+import time
+from llm_client import LLMClient
+from llm_cache import ResponseCache
+from semantic_cache import SemanticCache
+from single_flight import SingleFlight
+from token_usage import TokenLedger, estimate_tokens
+from metrics import (LLM_FIRST_TOKEN_SECONDS, LLM_REQUESTS, LLM_SECONDS, LLM_TOKENS, LLM_TRUNCATED, SEATS_PRICED,
+                     registry, span)
+import pricing
+
+MODEL = "openai/gpt-3.5-turbo"
+
+# Shared pooled client, configured from environment variables (see llm_client.py)
+client = LLMClient.from_env()
+
+# Process-wide response cache, configured from environment variables (see llm_cache.py)
+response_cache = ResponseCache.from_env()
+
+# Serves responses for near-duplicate ideas when SEMANTIC_CACHE is set (see semantic_cache.py)
+semantic_cache = SemanticCache.from_env()
+
+# Coalesces identical concurrent LLM calls (see single_flight.py)
+in_flight = SingleFlight()
+
+# Process-wide token accounting and max_tokens budgets (see token_usage.py)
+token_ledger = TokenLedger.from_env()
+
+
+
+def _collect_llm_metrics():
+    """Scrape-time metrics from the shared client, response cache and call coalescing."""
+    stats = client.stats()
+    limiter = stats["rate_limiter"]
+    cache = response_cache.stats()
+    flights = in_flight.stats()
+    semantic = semantic_cache.stats()
+    return [
+        ("llm_client_events_total", "Upstream requests, attempts, retries, hedges and breaker rejections",
+         "counter", [({"event": event}, stats[event])
+                     for event in ("requests", "attempts", "retries", "hedges", "hedge_wins", "rejected")]),
+        ("llm_circuit_breaker_open", "1 while the circuit breaker rejects calls", "gauge",
+         [({}, 1 if stats["breaker"] == "open" else 0)]),
+        ("llm_circuit_breaker_opens_total", "Times the circuit breaker opened", "counter",
+         [({}, stats["breaker_opens"])]),
+        ("llm_rate_limit_queue_depth", "Requests waiting for the client-side rate limiter", "gauge",
+         [({}, limiter["queue_depth"])]),
+        ("llm_rate_limit_wait_seconds_total", "Time requests spent waiting for the rate limiter", "counter",
+         [({}, limiter["wait_seconds_total"])]),
+        ("llm_cache_lookups_total", "Response cache lookups by result", "counter",
+         [({"result": result}, cache[result]) for result in ("memory_hits", "disk_hits", "misses")]),
+        ("llm_cache_entries", "Response cache entries by tier", "gauge",
+         [({"tier": "memory"}, cache["memory_entries"]), ({"tier": "disk"}, cache["disk_entries"])]),
+        ("llm_coalesced_calls_total", "LLM calls that joined an identical call in flight", "counter",
+         [({}, flights["coalesced"])]),
+        ("llm_calls_in_flight", "Distinct LLM calls in flight", "gauge", [({}, flights["in_flight"])]),
+        ("llm_semantic_cache_lookups_total", "Semantic cache lookups by result", "counter",
+         [({"result": "hit"}, semantic["hits"]), ({"result": "miss"}, semantic["lookups"] - semantic["hits"])]),
+        ("llm_semantic_cache_near_threshold_hits_total",
+         "Semantic cache hits within 0.05 of the threshold (the likeliest false hits)", "counter",
+         [({}, semantic["near_threshold_hits"])]),
+        ("llm_semantic_cache_word_mismatches_total",
+         "Semantic cache candidates above the threshold rejected because a content word differs", "counter",
+         [({}, semantic["word_mismatches"])]),
+        ("llm_semantic_cache_entries", "Responses in the semantic cache index", "gauge",
+         [({}, semantic["entries"])]),
+        ("llm_semantic_cache_bytes", "Semantic cache memory by part", "gauge",
+         [({"part": "index"}, semantic["index_bytes"]), ({"part": "payload"}, semantic["payload_bytes"])]),
+    ]
+
+
+registry.register_collector("llm", _collect_llm_metrics)
+
+# Framework result key -> (prompt builder, display name)
+FRAMEWORKS = {
+    "jtbd": ("prompt_jtbd", "Jobs to Be Done"),
+    "value_proposition": ("prompt_value_prop_canvas", "Value Proposition Canvas"),
+    "opportunity_solution": ("prompt_opp_tree", "Opportunity Solution Tree"),
+    "four_fit": ("prompt_4_fit_model", "4-Fit Model"),
+}
+
+# Response schema for combined mode: one markdown analysis per framework key
+COMBINED_SCHEMA = {
+    "type": "object",
+    "properties": {key: {"type": "string"} for key in FRAMEWORKS},
+    "required": list(FRAMEWORKS),
+    "additionalProperties": False,
+}
+
+# Upper max_tokens per call label; token_ledger lowers each to fit observed completions
+MAX_TOKENS = {
+    "jtbd": 1000,
+    "value_proposition": 1000,
+    "opportunity_solution": 1000,
+    "four_fit": 1000,
+    "case_study": 1000,
+    "combined": 4000,
+    "follow_up": 400,
+    # Only what follow-up answers change in a prefetched analysis (see refine_analyses)
+    "refine": 400,
+}
+DEFAULT_MAX_TOKENS = 1000
+
+# End-of-stream marker for _iterate_on_client
+_DONE = object()
+
+
+class StreamEvent(NamedTuple):
+    """
+    One step of stream_all_frameworks.
+    key: framework key (or "case_study")
+    delta: newly generated text, empty on the final event
+    result: None while streaming; the finished result dict (with "timings") on the final event
+    """
+    key: str
+    delta: str
+    result: Optional[Dict] = None
 
-# Initialize OpenAI client with API key from environment variable
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY")
-)
 
 class ProductDiscoveryAnalyzer:
     def __init__(self):
@@ -28,20 +140,221 @@ class ProductDiscoveryAnalyzer:
             "Zoom"
         ]
 
-    def _call_gpt(self, prompt: str, max_tokens: int = 1000) -> str:
+    def _call_gpt(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None,
+                  label: str = "other", similar: Optional[Tuple[str, str]] = None) -> str:
+        return client.run(self._call_gpt_async(prompt, max_tokens, timeout, label=label, similar=similar))
+
+    def _max_tokens(self, label: str) -> int:
+        return token_ledger.budget(label, MAX_TOKENS.get(label, DEFAULT_MAX_TOKENS))
+
+    def _token_limits(self, label: str, max_tokens: Optional[int]) -> Tuple[int, int]:
+        """
+        (cap, budget) for a call: the label's static MAX_TOKENS cap and the learned budget to request,
+        or the caller's max_tokens for both. The cache is keyed on the cap, so the budget adapting
+        does not invalidate it; a completion the budget truncates is requested again up to the cap.
+        """
+        if max_tokens is not None:
+            return max_tokens, max_tokens
+        return MAX_TOKENS.get(label, DEFAULT_MAX_TOKENS), self._max_tokens(label)
+
+    def _record_usage(self, label: str, prompt: str, content: str, usage=None, truncated: bool = False):
+        if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+            prompt_tokens, completion_tokens, estimated = usage.prompt_tokens, usage.completion_tokens or 0, False
+        else:
+            prompt_tokens = estimate_tokens(self.system_prompt) + estimate_tokens(prompt)
+            completion_tokens, estimated = estimate_tokens(content), True
+        token_ledger.record(label, prompt_tokens, completion_tokens, estimated=estimated, truncated=truncated)
+        LLM_TOKENS.inc(label, "prompt", amount=prompt_tokens)
+        LLM_TOKENS.inc(label, "completion", amount=completion_tokens)
+        if truncated:
+            LLM_TRUNCATED.inc(label)
+
+    async def _call_gpt_async(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None,
+                              response_format: Optional[Dict] = None,
+                              validate: Optional[Callable[[str], Any]] = None, label: str = "other",
+                              similar: Optional[Tuple[str, str]] = None) -> str:
+        """
+        max_tokens: completion cap; None uses the label's budget, raised to its MAX_TOKENS cap
+            for a completion that the budget truncates
+        response_format: passed through to the API (e.g. {"type": "json_object"})
+        validate: content is only cached when validate(content) is truthy
+        label: token accounting bucket (framework key, "case_study", ...)
+        similar: (namespace, text) for the semantic cache: the response to a close enough earlier
+            text in the namespace is served instead of calling upstream
+        """
+        cap, max_tokens = self._token_limits(label, max_tokens)
+        extra = {"response_format": response_format} if response_format is not None else {}
+        cache_key = response_cache.make_key(MODEL, self.system_prompt, prompt, cap, *extra.values())
+        cached = await response_cache.get_async(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(label, "cache_hit")
+            return cached
+        cached = semantic_cache.lookup(*similar) if similar is not None else None
+        if cached is not None:
+            LLM_REQUESTS.inc(label, "semantic_hit")
+            return cached
+
+        async def request() -> str:
+            start = time.perf_counter()
+            deadline = time.monotonic() + timeout if timeout else None
+            try:
+                budget = max_tokens
+                while True:
+                    response = await client.create_chat_completion(
+                        model=MODEL,
+                        messages=[
+                            {"role": "system", "content": self.system_prompt},
+                            {"role": "user", "content": prompt}
+                        ],
+                        max_tokens=budget,
+                        timeout=timeout,
+                        deadline=deadline,
+                        **extra
+                    )
+                    content = response.choices[0].message.content
+                    truncated = response.choices[0].finish_reason == "length"
+                    if not truncated or budget >= cap:
+                        break
+                    # Cut short by the learned budget: recorded (so the budget grows) and asked again at the cap
+                    self._record_usage(label, prompt, content or "", getattr(response, "usage", None), True)
+                    budget = cap
+            except Exception as e:
+                LLM_SECONDS.observe(time.perf_counter() - start, label)
+                LLM_REQUESTS.inc(label, "error")
+                # Failures are returned but never cached, so a retry can still succeed
+                return f"Error in analysis: {str(e)}"
+            LLM_SECONDS.observe(time.perf_counter() - start, label)
+            self._record_usage(label, prompt, content or "", getattr(response, "usage", None), truncated)
+            if not content:
+                # An empty completion is a failure too: reported as one and never cached
+                LLM_REQUESTS.inc(label, "error")
+                return "Error in analysis: the model returned an empty response"
+            LLM_REQUESTS.inc(label, "ok")
+            if validate is None or validate(content):
+                response_cache.set(cache_key, content)
+                if similar is not None:
+                    semantic_cache.add(*similar, content)
+            return content
+
+        # Identical calls already in flight (double submits, several sessions) share one request
+        return await in_flight.run(cache_key, request)
+
+    async def _call_gpt_with_deadline(self, prompt: str, timeout: Optional[float], label: str = "other",
+                                      similar: Optional[Tuple[str, str]] = None) -> str:
+        """_call_gpt_async bounded by an overall deadline (None waits indefinitely)."""
         try:
-            response = client.chat.completions.create(
-                model="openai/gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens
-            )
-            return response.choices[0].message.content
+            return await asyncio.wait_for(self._call_gpt_async(prompt, timeout=timeout, label=label, similar=similar),
+                                          timeout)
+        except asyncio.TimeoutError:
+            LLM_REQUESTS.inc(label, "timeout")
+            return f"Error in analysis: timed out after {timeout}s"
         except Exception as e:
             return f"Error in analysis: {str(e)}"
 
+    def _iterate_on_client(self, produce: Callable[[Callable], Awaitable[None]]) -> Iterator:
+        """
+        Start produce(emit) on the client loop right away and return an iterator
+        over everything it emits, in arrival order. Closing the iterator cancels produce.
+        """
+        items: "queue.Queue" = queue.Queue()
+
+        async def run():
+            try:
+                await produce(items.put)
+            finally:
+                items.put(_DONE)
+
+        future = client.submit(run())
+
+        def iterate():
+            try:
+                yield
+                while True:
+                    item = items.get()
+                    if item is _DONE:
+                        break
+                    yield item
+                future.result()
+            finally:
+                future.cancel()
+
+        # Advanced into the try, so closing (or dropping) it before reading anything still cancels the calls
+        iterator = iterate()
+        next(iterator)
+        return iterator
+
+    async def _stream_gpt_async(self, prompt: str, max_tokens: Optional[int] = None,
+                                timeout: Optional[float] = None, label: str = "other",
+                                similar: Optional[Tuple[str, str]] = None) -> AsyncIterator[str]:
+        """
+        Yield the completion piece by piece. Must be iterated on the client loop.
+        A completion truncated by the label's learned budget is continued up to its MAX_TOKENS cap
+        with a second request that has the text so far as an assistant prefix.
+        """
+        cap, max_tokens = self._token_limits(label, max_tokens)
+        cache_key = response_cache.make_key(MODEL, self.system_prompt, prompt, cap)
+        cached = await response_cache.get_async(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(label, "cache_hit")
+            yield cached
+            return
+        cached = semantic_cache.lookup(*similar) if similar is not None else None
+        if cached is not None:
+            LLM_REQUESTS.inc(label, "semantic_hit")
+            yield cached
+            return
+        parts = []
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        budget = max_tokens
+        start = time.perf_counter()
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            while True:
+                stream = await client.create_chat_completion(
+                    model=MODEL,
+                    messages=messages,
+                    max_tokens=budget,
+                    timeout=timeout,
+                    deadline=deadline,
+                    stream=True
+                )
+                usage = None
+                finish_reason = None
+                first_part = len(parts)
+                async for chunk in stream:
+                    # Providers that report usage on streams send it on the last chunk
+                    usage = getattr(chunk, "usage", None) or usage
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if chunk.choices and chunk.choices[0].finish_reason:
+                        finish_reason = chunk.choices[0].finish_reason
+                    if delta:
+                        if not parts:
+                            LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start, label)
+                        parts.append(delta)
+                        yield delta
+                truncated = finish_reason == "length"
+                self._record_usage(label, prompt, "".join(parts[first_part:]), usage, truncated)
+                if not truncated or max_tokens >= cap or len(messages) > 2 or len(parts) == first_part:
+                    break
+                # Cut short by the learned budget: continue the same answer with the rest of the cap
+                messages = messages[:2] + [{"role": "assistant", "content": "".join(parts)}]
+                budget = cap - budget
+        except Exception as e:
+            LLM_SECONDS.observe(time.perf_counter() - start, label)
+            LLM_REQUESTS.inc(label, "error")
+            separator = "\n\n" if parts else ""
+            yield f"{separator}Error in analysis: {str(e)}"
+            return
+        LLM_SECONDS.observe(time.perf_counter() - start, label)
+        LLM_REQUESTS.inc(label, "ok")
+        if parts:
+            response_cache.set(cache_key, "".join(parts))
+            if similar is not None:
+                semantic_cache.add(*similar, "".join(parts))
+
     def prompt_jtbd(self, user_input: str) -> str:
         return f"""
 You are a product strategist trained in the Jobs to Be Done (JTBD) framework.
@@ -128,43 +441,167 @@ For each one:
 Use bullet points and clear section headings.
 """
 
-    def analyze_jtbd(self, product_idea: str, user_inputs: Dict) -> Dict:
-        combined_input = f"{product_idea}\n\nAdditional Context:\n{json.dumps(user_inputs, indent=2)}"
+    def prompt_all_frameworks(self, user_input: str) -> str:
+        """One prompt asking for all four framework analyses as a single JSON object."""
+        return f"""
+You are a product strategist. Analyze this product idea or customer problem with four frameworks:
+\"\"\"
+{user_input}
+\"\"\"
+
+jtbd (Jobs to Be Done):
+- Functional, emotional and social jobs, broken down into Main Job, Related Jobs and Emotional Jobs
+- Struggling moments (where the user fails)
+
+value_proposition (Value Proposition Canvas):
+- Customer Profile: Customer Jobs, Pains, Gains
+- Value Map: Products and Services, Pain Relievers, Gain Creators
+
+opportunity_solution (Opportunity Solution Tree, Teresa Torres):
+- Outcome, Opportunities, Solutions (ideas, not full features), Tests (1–2 experiments for the biggest assumptions)
+
+four_fit (4-Fit Model):
+- Problem-Solution, Product-Market, Channel and Revenue Model Fit
+- For each: status (Validated / Unclear / Risky), why, and next steps or validation methods
+
+Respond with only a JSON object matching this JSON schema:
+{json.dumps(COMBINED_SCHEMA)}
+Each value is that framework's full analysis as markdown, with clear section headings and bullet points.
+"""
+
+    @staticmethod
+    def parse_combined_response(content: str) -> Optional[Dict[str, str]]:
+        """
+        Validate a combined-mode response against COMBINED_SCHEMA.
+        Returns framework key -> analysis text, or None if the response is not usable.
+        """
+        text = (content or "").strip()
+        if text.startswith("```"):
+            # Tolerate a fenced ```json block
+            text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        analyses = {}
+        for key in FRAMEWORKS:
+            value = data.get(key)
+            if not isinstance(value, str) or not value.strip():
+                return None
+            analyses[key] = value.strip()
+        return analyses
+
+    @staticmethod
+    def encode_context(user_inputs: Dict) -> str:
+        """
+        Follow-up answers as compact JSON: blank answers are dropped, runs of
+        whitespace collapsed and no indentation added.
+        """
+        answers = {}
+        for key, value in user_inputs.items():
+            if isinstance(value, str):
+                value = " ".join(value.split())
+            if value not in (None, ""):
+                answers[key] = value
+        return json.dumps(answers, ensure_ascii=False, separators=(",", ":")) if answers else ""
+
+    def _combined_input(self, product_idea: str, user_inputs: Dict) -> str:
+        context = self.encode_context(user_inputs)
+        if not context:
+            return product_idea.strip()
+        return f"{product_idea.strip()}\n\nAdditional Context:\n{context}"
+
+    def analyze_jtbd(self, product_idea: str, user_inputs: Dict, timeout: Optional[float] = None) -> Dict:
+        combined_input = self._combined_input(product_idea, user_inputs)
         return {
-            "analysis": self._call_gpt(self.prompt_jtbd(combined_input)),
+            "analysis": self._call_gpt(self.prompt_jtbd(combined_input), timeout=timeout, label="jtbd",
+                                       similar=self._similar("jtbd", product_idea, user_inputs)),
             "framework": "Jobs to Be Done"
         }
 
-    def analyze_value_proposition(self, product_idea: str, user_inputs: Dict) -> Dict:
-        combined_input = f"{product_idea}\n\nAdditional Context:\n{json.dumps(user_inputs, indent=2)}"
+    def analyze_value_proposition(self, product_idea: str, user_inputs: Dict, timeout: Optional[float] = None) -> Dict:
+        combined_input = self._combined_input(product_idea, user_inputs)
         return {
-            "analysis": self._call_gpt(self.prompt_value_prop_canvas(combined_input)),
+            "analysis": self._call_gpt(self.prompt_value_prop_canvas(combined_input), timeout=timeout, label="value_proposition",
+                                       similar=self._similar("value_proposition", product_idea, user_inputs)),
             "framework": "Value Proposition Canvas"
         }
 
-    def analyze_opportunity_solution(self, product_idea: str, user_inputs: Dict) -> Dict:
-        combined_input = f"{product_idea}\n\nAdditional Context:\n{json.dumps(user_inputs, indent=2)}"
+    def analyze_opportunity_solution(self, product_idea: str, user_inputs: Dict, timeout: Optional[float] = None) -> Dict:
+        combined_input = self._combined_input(product_idea, user_inputs)
         return {
-            "analysis": self._call_gpt(self.prompt_opp_tree(combined_input)),
+            "analysis": self._call_gpt(self.prompt_opp_tree(combined_input), timeout=timeout, label="opportunity_solution",
+                                       similar=self._similar("opportunity_solution", product_idea, user_inputs)),
             "framework": "Opportunity Solution Tree"
         }
 
-    def analyze_four_fit(self, product_idea: str, user_inputs: Dict) -> Dict:
-        combined_input = f"{product_idea}\n\nAdditional Context:\n{json.dumps(user_inputs, indent=2)}"
+    def analyze_four_fit(self, product_idea: str, user_inputs: Dict, timeout: Optional[float] = None) -> Dict:
+        combined_input = self._combined_input(product_idea, user_inputs)
         return {
-            "analysis": self._call_gpt(self.prompt_4_fit_model(combined_input)),
+            "analysis": self._call_gpt(self.prompt_4_fit_model(combined_input), timeout=timeout, label="four_fit",
+                                       similar=self._similar("four_fit", product_idea, user_inputs)),
             "framework": "4-Fit Model"
         }
 
-    def analyze_case_study(self, product_idea: str, selected_company: str, user_inputs: Dict) -> Dict:
+    def analyze_case_study(self, product_idea: str, selected_company: str, user_inputs: Dict,
+                           timeout: Optional[float] = None) -> Dict:
         """Generate a case study comparison between the user's idea and a selected company."""
-        prompt = f"""Compare the following product idea to {selected_company}:
+        return {
+            "analysis": self._call_gpt(self._case_study_prompt(product_idea, selected_company, user_inputs),
+                                       timeout=timeout, label="case_study",
+                                       similar=self._similar_case_study(product_idea, selected_company, user_inputs)),
+            "company": selected_company
+        }
+
+    def analyze_case_studies(self, product_idea: str, companies: List[str], user_inputs: Dict,
+                             max_concurrency: int = 4, timeout: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Compare the idea against several companies concurrently.
+        The calls start immediately; iterate the result to receive each
+        {"analysis", "company"} dict as soon as that comparison finishes.
+        Comparisons are cached per (idea, context, company) by the response cache,
+        so adding a company to an earlier batch only costs that one call.
+        """
+        async def produce(emit):
+            semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+            async def run(company: str):
+                async with semaphore:
+                    prompt = self._case_study_prompt(product_idea, company, user_inputs)
+                    analysis = await self._call_gpt_with_deadline(
+                        prompt, timeout, "case_study", self._similar_case_study(product_idea, company, user_inputs)
+                    )
+                emit({"analysis": analysis, "company": company})
+
+            await asyncio.gather(*(run(company) for company in companies))
+
+        return self._iterate_on_client(produce)
+
+    def _similar_case_study(self, product_idea: str, company: str, user_inputs: Dict) -> Tuple[str, str]:
+        """Semantic cache namespace and text of a comparison: one namespace per company."""
+        return self._similar(f"case_study:{company}", product_idea, user_inputs)
+
+    def _similar(self, label: str, product_idea: str, user_inputs: Dict) -> Tuple[str, str]:
+        """
+        Semantic cache namespace and text of a call: only the idea is matched by similarity. The
+        follow-up answers must match exactly (a hash of them is part of the namespace), since a short
+        answer would barely move a vector that also holds a long idea.
+        """
+        context = self.encode_context(user_inputs)
+        if not context:
+            return label, product_idea.strip()
+        return f"{label}:{hashlib.sha256(context.encode('utf-8')).hexdigest()[:16]}", product_idea.strip()
+
+    def _case_study_prompt(self, product_idea: str, selected_company: str, user_inputs: Dict) -> str:
+        return f"""Compare the following product idea to {selected_company}:
 
 Product Idea:
-{product_idea}
+{product_idea.strip()}
 
 Additional Context:
-{json.dumps(user_inputs, indent=2)}
+{self.encode_context(user_inputs) or "None provided"}
 
 Please provide a detailed analysis in the following structure:
 
@@ -185,10 +622,20 @@ Please provide a detailed analysis in the following structure:
 
 Format the response with clear section headers and bullet points for easy reading."""
 
-        return {
-            "analysis": self._call_gpt(prompt),
-            "company": selected_company
-        }
+    def _refine_prompt(self, product_idea: str, framework: str, analysis: str, context: str) -> str:
+        return f"""Below is a {framework} analysis of a product idea, written before the founder answered some follow-up questions.
+
+Product Idea:
+{product_idea.strip()}
+
+{framework} Analysis:
+{analysis.strip()}
+
+Follow-up Answers:
+{context}
+
+In at most 5 bullet points, state only what these answers change or add to the analysis: new or narrower
+customer segments, jobs, pains, gains, risks or priorities. Do not repeat what the analysis already says."""
 
     def get_follow_up_questions(self, product_idea: str) -> List[str]:
         prompt = f"""Based on this product idea: {product_idea}
@@ -199,15 +646,202 @@ Format the response with clear section headers and bullet points for easy readin
         4. Unmet needs
         Format as a numbered list."""
         
-        return self._call_gpt(prompt).split('\n')
+        with span("follow_up_questions"):
+            return self._call_gpt(prompt, label="follow_up", similar=("follow_up", product_idea)).split('\n')
 
-    def analyze_all_frameworks(self, product_idea: str, user_inputs: Dict) -> Dict:
-        return {
-            "jtbd": self.analyze_jtbd(product_idea, user_inputs),
-            "value_proposition": self.analyze_value_proposition(product_idea, user_inputs),
-            "opportunity_solution": self.analyze_opportunity_solution(product_idea, user_inputs),
-            "four_fit": self.analyze_four_fit(product_idea, user_inputs)
+    def analyze_all_frameworks(self, product_idea: str, user_inputs: Dict, concurrent: bool = False,
+                               max_workers: int = 5, timeout: Optional[float] = None,
+                               case_study_company: Optional[str] = None, combined: bool = False) -> Dict:
+        """
+        Run every framework analysis (and optionally a case study comparison).
+        concurrent: fan all calls out at once instead of running them one after another
+        max_workers: cap on simultaneous LLM calls in concurrent mode
+        timeout: per-call request timeout in seconds
+        case_study_company: if given, the comparison is returned under the "case_study" key
+        combined: request all four frameworks in one structured JSON call (sending the idea and
+            context once instead of four times); falls back to separate calls if the response
+            does not parse. Implies concurrent.
+        A call that fails only affects its own entry, which carries an "Error in analysis: ..." message.
+        """
+        if concurrent or combined:
+            # analyze_all_frameworks_async records the operation span itself
+            return client.run(self.analyze_all_frameworks_async(
+                product_idea, user_inputs, max_workers, timeout, case_study_company, combined
+            ))
+
+        with span("analyze_frameworks"):
+            results = {
+                "jtbd": self.analyze_jtbd(product_idea, user_inputs, timeout),
+                "value_proposition": self.analyze_value_proposition(product_idea, user_inputs, timeout),
+                "opportunity_solution": self.analyze_opportunity_solution(product_idea, user_inputs, timeout),
+                "four_fit": self.analyze_four_fit(product_idea, user_inputs, timeout)
+            }
+            if case_study_company:
+                results["case_study"] = self.analyze_case_study(product_idea, case_study_company, user_inputs,
+                                                                timeout)
+        return results
+
+    def refine_analyses(self, product_idea: str, user_inputs: Dict, analysis_results: Dict,
+                        timeout: Optional[float] = None) -> Dict:
+        """
+        Bring framework analyses of the bare idea (a prefetch) up to date with the follow-up answers.
+        Each framework gets one short call that returns only what the answers change, appended to its
+        analysis; one whose refinement fails is analyzed again in full with the answers.
+        analysis_results: framework key -> {"analysis", "framework"}; other keys are returned unchanged
+        """
+        with span("refine_analyses"):
+            return client.run(self.refine_analyses_async(product_idea, user_inputs, analysis_results, timeout))
+
+    async def refine_analyses_async(self, product_idea: str, user_inputs: Dict, analysis_results: Dict,
+                                    timeout: Optional[float] = None) -> Dict:
+        """Async counterpart of refine_analyses."""
+        context = self.encode_context(user_inputs)
+        combined_input = self._combined_input(product_idea, user_inputs)
+
+        async def refine(key: str) -> Dict:
+            result = analysis_results[key]
+            if not context:
+                return result
+            addendum = await self._call_gpt_with_deadline(
+                self._refine_prompt(product_idea, result["framework"], result["analysis"], context), timeout, "refine"
+            )
+            if addendum.startswith("Error in analysis"):
+                analysis = await self._call_gpt_with_deadline(
+                    getattr(self, FRAMEWORKS[key][0])(combined_input), timeout, key,
+                    self._similar(key, product_idea, user_inputs)
+                )
+            else:
+                analysis = f"{result['analysis'].rstrip()}\n\n#### What your answers change\n{addendum.strip()}"
+            return dict(result, analysis=analysis)
+
+        keys = [key for key in analysis_results if key in FRAMEWORKS]
+        refined = dict(zip(keys, await asyncio.gather(*(refine(key) for key in keys))))
+        return {key: refined.get(key, result) for key, result in analysis_results.items()}
+
+    async def analyze_all_frameworks_async(self, product_idea: str, user_inputs: Dict, max_concurrency: int = 5,
+                                           timeout: Optional[float] = None,
+                                           case_study_company: Optional[str] = None,
+                                           combined: bool = False) -> Dict:
+        """Async counterpart of analyze_all_frameworks(concurrent=True)."""
+        with span("analyze_frameworks"):
+            return await self._analyze_all_frameworks_async(product_idea, user_inputs, max_concurrency, timeout,
+                                                            case_study_company, combined)
+
+    async def _analyze_all_frameworks_async(self, product_idea: str, user_inputs: Dict, max_concurrency: int,
+                                            timeout: Optional[float], case_study_company: Optional[str],
+                                            combined: bool) -> Dict:
+        combined_input = self._combined_input(product_idea, user_inputs)
+        prompts = {
+            key: getattr(self, prompt_method)(combined_input)
+            for key, (prompt_method, _) in FRAMEWORKS.items()
         }
+        similar = {key: self._similar(key, product_idea, user_inputs) for key in FRAMEWORKS}
+        if case_study_company:
+            prompts["case_study"] = self._case_study_prompt(product_idea, case_study_company, user_inputs)
+            similar["case_study"] = self._similar_case_study(product_idea, case_study_company, user_inputs)
+
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run(key: str) -> str:
+            async with semaphore:
+                return await self._call_gpt_with_deadline(prompts[key], timeout, key, similar[key])
+
+        if combined:
+            case_study_keys = [key for key in prompts if key not in FRAMEWORKS]
+            by_key, case_study_analyses = await asyncio.gather(
+                self._analyze_combined_async(combined_input, timeout,
+                                             self._similar("combined", product_idea, user_inputs)),
+                asyncio.gather(*(run(key) for key in case_study_keys))
+            )
+            if by_key is None:
+                # Unusable structured response: fall back to one call per framework
+                fallback = await asyncio.gather(*(run(key) for key in FRAMEWORKS))
+                by_key = dict(zip(FRAMEWORKS, fallback))
+            if case_study_company:
+                by_key["case_study"] = case_study_analyses[0]
+        else:
+            by_key = dict(zip(prompts, await asyncio.gather(*(run(key) for key in prompts))))
+        results = {}
+        for key, analysis in by_key.items():
+            if key == "case_study":
+                results[key] = {"analysis": analysis, "company": case_study_company}
+            else:
+                results[key] = {"analysis": analysis, "framework": FRAMEWORKS[key][1]}
+        return results
+
+    async def _analyze_combined_async(self, combined_input: str, timeout: Optional[float],
+                                      similar: Optional[Tuple[str, str]] = None) -> Optional[Dict[str, str]]:
+        """All four frameworks in one structured call; None if the call fails or does not validate."""
+        prompt = self.prompt_all_frameworks(combined_input)
+        try:
+            content = await asyncio.wait_for(self._call_gpt_async(
+                prompt, timeout=timeout, response_format={"type": "json_object"},
+                validate=self.parse_combined_response, label="combined", similar=similar
+            ), timeout)
+        except Exception:
+            return None
+        return self.parse_combined_response(content)
+
+    def stream_all_frameworks(self, product_idea: str, user_inputs: Dict, max_concurrency: int = 5,
+                              timeout: Optional[float] = None,
+                              case_study_company: Optional[str] = None) -> Iterator[StreamEvent]:
+        """
+        Stream every framework analysis concurrently, yielding StreamEvents as text arrives.
+        The calls start immediately. Each framework ends with an event whose result matches analyze_all_frameworks output,
+        plus "timings": {"first_token": seconds, "total": seconds}.
+        """
+        return self._iterate_on_client(lambda emit: self._stream_frameworks(
+            emit, product_idea, user_inputs, max_concurrency, timeout, case_study_company
+        ))
+
+    async def _stream_frameworks(self, emit: Callable[[StreamEvent], None], product_idea: str, user_inputs: Dict,
+                                 max_concurrency: int, timeout: Optional[float],
+                                 case_study_company: Optional[str]):
+        combined_input = self._combined_input(product_idea, user_inputs)
+        prompts = {
+            key: getattr(self, prompt_method)(combined_input)
+            for key, (prompt_method, _) in FRAMEWORKS.items()
+        }
+        similar = {key: self._similar(key, product_idea, user_inputs) for key in FRAMEWORKS}
+        if case_study_company:
+            prompts["case_study"] = self._case_study_prompt(product_idea, case_study_company, user_inputs)
+            similar["case_study"] = self._similar_case_study(product_idea, case_study_company, user_inputs)
+
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run(key: str, prompt: str):
+            async with semaphore:
+                start = time.perf_counter()
+                first_token = None
+                parts = []
+
+                async def consume():
+                    nonlocal first_token
+                    async for delta in self._stream_gpt_async(prompt, timeout=timeout, label=key,
+                                                              similar=similar[key]):
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        parts.append(delta)
+                        emit(StreamEvent(key, delta))
+
+                try:
+                    await asyncio.wait_for(consume(), timeout)
+                except asyncio.TimeoutError:
+                    LLM_REQUESTS.inc(key, "timeout")
+                    separator = "\n\n" if parts else ""
+                    delta = f"{separator}Error in analysis: timed out after {timeout}s"
+                    parts.append(delta)
+                    emit(StreamEvent(key, delta))
+
+            result = {"analysis": "".join(parts)}
+            if key == "case_study":
+                result["company"] = case_study_company
+            else:
+                result["framework"] = FRAMEWORKS[key][1]
+            result["timings"] = {"first_token": first_token, "total": time.perf_counter() - start}
+            emit(StreamEvent(key, "", result))
+
+        await asyncio.gather(*(run(key, prompt) for key, prompt in prompts.items()))
 
     def get_case_study_companies(self) -> List[str]:
         """Return the list of available case study companies."""
@@ -232,6 +866,11 @@ Format the response with clear section headers and bullet points for easy readin
         seats: list of dicts, each with keys: view_quality, distance, section_popularity, demand_factor, accessibility
         Returns a list of dicts with seat info and calculated price.
         """
+        SEATS_PRICED.inc("price_seats", amount=len(seats))
+        with span("price_seats"):
+            return self._price_seats(seats, base_price)
+
+    def _price_seats(self, seats: list, base_price: float) -> list:
         priced_seats = []
         for seat in seats:
             price = self.calculate_seat_price(
@@ -247,11 +886,27 @@ Format the response with clear section headers and bullet points for easy readin
             priced_seats.append(seat_with_price)
         return priced_seats
 
+    def price_seat_columns(self, columns, base_price: float = 100.0):
+        """
+        Vectorized price_seats for whole venues.
+        columns: mapping of pricing factor -> NumPy array (or a structured array with those fields)
+        Returns a NumPy array of prices in seat order; the input columns are not copied.
+        """
+        with span("price_seat_columns"):
+            prices = pricing.price_columns(columns, base_price)
+        SEATS_PRICED.inc("price_seat_columns", amount=len(prices))
+        return prices
+
     def detect_highest_price_drop(self, old_seats, new_seats):
         """
         Returns the seat (or seats) where the highest price dropped, and the amount.
         old_seats/new_seats: list of dicts with 'id' and 'price'
         """
+        SEATS_PRICED.inc("detect_highest_price_drop", amount=len(new_seats))
+        with span("detect_highest_price_drop"):
+            return self._detect_highest_price_drop(old_seats, new_seats)
+
+    def _detect_highest_price_drop(self, old_seats, new_seats):
         old_prices = {seat['id']: seat['price'] for seat in old_seats}
         new_prices = {seat['id']: seat['price'] for seat in new_seats}
         if not old_prices or not new_prices:
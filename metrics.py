@@ -0,0 +1,274 @@
+"""
+In-process metrics: counters and histograms for the hot paths, exported in
+the Prometheus text format.
+
+Metrics live in a process-wide registry. Recording is a dict lookup and a few
+additions under a per-metric lock (about a microsecond), so instrumentation
+stays on in production. Values that other components already track (client,
+cache and rate limiter stats) are read at scrape time by collectors instead
+of being updated on every call.
+
+    METRICS_PORT=9464 streamlit run app.py
+    curl localhost:9464/metrics
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; covers pricing calls (sub-millisecond) up to slow LLM completions
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (metric name, help, type, [(labels, value), ...]) as returned by collectors
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        """Add amount to the series for the given label values (in labelnames order)."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class _Timer:
+    """Context manager returned by Histogram.time(); also counts failures when given an error counter."""
+    __slots__ = ("histogram", "labels", "errors", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Tuple[str, ...], errors: Optional[Counter]):
+        self.histogram = histogram
+        self.labels = labels
+        self.errors = errors
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(*self.labels)
+        return False
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels: str, errors: Optional[Counter] = None) -> _Timer:
+        """Time a block: `with histogram.time("jtbd"):`. errors is incremented if the block raises."""
+        return _Timer(self, labels, errors)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        """labels -> (per-bucket counts, sum, count)"""
+        with self._lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+
+    def quantile(self, share: float, *labels: str) -> Optional[float]:
+        """Estimated quantile (e.g. 0.95) for one series, interpolated within its bucket; None if empty."""
+        series = self.snapshot().get(labels)
+        if series is None or series[2] == 0:
+            return None
+        counts, _, count = series
+        rank = share * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    # Beyond the last bound: the best available answer is that bound
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Family]]] = {}
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def _get_or_create(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"metric {name} is already registered as a {type(metric).__name__}")
+            return metric
+
+    def register_collector(self, name: str, collect: Callable[[], Iterable[Family]]):
+        """
+        Add (or replace) a function that returns metric families at scrape time, for values
+        that are already tracked elsewhere. A collector that raises is skipped.
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collect in collectors:
+            try:
+                families = list(collect())
+            except Exception:
+                continue
+            for name, help, kind, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} "
+                                 f"{_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by every module and session
+registry = Registry()
+
+LLM_REQUESTS = registry.counter(
+    "llm_requests_total", "LLM calls by label (framework key, case_study, follow_up, ...) and outcome "
+    "(ok, error, timeout, cache_hit, semantic_hit)", ("label", "outcome"))
+LLM_SECONDS = registry.histogram(
+    "llm_request_seconds", "Latency of LLM calls that reached the client, by label", ("label",))
+LLM_FIRST_TOKEN_SECONDS = registry.histogram(
+    "llm_first_token_seconds", "Time to the first streamed text, by label", ("label",))
+LLM_TOKENS = registry.counter(
+    "llm_tokens_total", "Prompt and completion tokens, by label", ("label", "type"))
+LLM_TRUNCATED = registry.counter(
+    "llm_truncated_total", "Completions cut off at max_tokens, by label", ("label",))
+OPERATION_SECONDS = registry.histogram(
+    "operation_seconds", "Latency of instrumented operations (follow-up questions, pricing, reports)",
+    ("operation",))
+OPERATION_ERRORS = registry.counter(
+    "operation_errors_total", "Instrumented operations that raised", ("operation",))
+SEATS_PRICED = registry.counter(
+    "seats_priced_total", "Seats processed by pricing operations", ("operation",))
+
+
+def span(operation: str) -> _Timer:
+    """Time an operation into operation_seconds and count it in operation_errors_total if it raises."""
+    return OPERATION_SECONDS.time(operation, errors=OPERATION_ERRORS)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: Registry = registry) -> ThreadingHTTPServer:
+    """Serve registry at http://host:port/metrics from a daemon thread (port 0 picks a free port)."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def serve_from_env() -> Optional[ThreadingHTTPServer]:
+    """Start the endpoint once per process if METRICS_PORT is set (METRICS_HOST defaults to 127.0.0.1)."""
+    global _server
+    port = os.getenv("METRICS_PORT", "")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = start_metrics_server(int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
+        return _server
@@ -0,0 +1,235 @@
+"""
+Local stand-in for the OpenRouter chat completions endpoint.
+
+Point the app at it with OPENROUTER_BASE_URL=http://127.0.0.1:<port>/api/v1
+to exercise the LLM call paths offline.
+
+    python mock_openrouter.py --port 8089 --latency 1.5 --token-rate 50
+
+Each word of a completion counts as one token; completions are cut at max_tokens.
+Requests with "stream": true are answered as server-sent events, one word per chunk.
+Faults can be injected: a share of requests fails with an error status and a
+share answers only after a much longer delay.
+
+    python mock_openrouter.py --error-rate 0.2 --error-status 503 --slow-rate 0.05 --slow-latency 5
+
+--rate-limit N answers requests beyond N per second with 429 and Retry-After.
+
+Requests with a JSON response_format get a JSON object with one string per key
+listed under "required" in the JSON schema found in the prompt.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class MockOpenRouterHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connection_count += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        prompt_chars = sum(len(message.get("content") or "") for message in body.get("messages", []))
+        with server.lock:
+            server.request_count += 1
+            server.prompt_chars += prompt_chars
+            request_id = server.request_count
+
+        if server.rate_limit and not self._admit():
+            self._send_json(429, {"error": {"message": "Rate limit exceeded", "code": 429}},
+                            {"Retry-After": "1"})
+            return
+        if server.random.random() < server.error_rate:
+            self._send_json(server.error_status, {"error": {"message": "Injected fault", "code": server.error_status}})
+            return
+        time.sleep(server.slow_latency if server.random.random() < server.slow_rate else server.latency)
+
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        words = [f"Mock analysis #{request_id} for a {len(prompt)}-character prompt."]
+        words += [f"insight-{i}" for i in range(server.completion_words)]
+        finish_reason = "stop"
+        if body.get("max_tokens") and len(words) > body["max_tokens"]:
+            words = words[:body["max_tokens"]]
+            finish_reason = "length"
+        with server.lock:
+            server.completion_tokens += len(words)
+        if body.get("stream"):
+            self._send_stream(request_id, body, words, finish_reason)
+            return
+
+        if server.token_rate:
+            time.sleep(len(words) / server.token_rate)
+        content = " ".join(words)
+        if server.structured_output and body.get("response_format", {}).get("type", "text") != "text":
+            content = self._structured_content(prompt, content)
+        self._send_json(200, {
+            "id": f"mock-{request_id}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(words),
+                "total_tokens": prompt_chars // 4 + len(words)
+            }
+        })
+
+    @staticmethod
+    def _structured_content(prompt: str, text: str) -> str:
+        match = re.search(r'"required": (\[[^\]]*\])', prompt)
+        keys = json.loads(match.group(1)) if match else ["result"]
+        return json.dumps({key: f"## {key}\n{text}" for key in keys})
+
+    def _send_stream(self, request_id: int, body: dict, words: list, finish_reason: str = "stop"):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, word in enumerate(words):
+            if i and self.server.token_rate:
+                time.sleep(1 / self.server.token_rate)
+            self._write_chunk("data: " + json.dumps({
+                "id": f"mock-{request_id}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": None
+                }]
+            }) + "\n\n")
+        self._write_chunk("data: " + json.dumps({
+            "id": f"mock-{request_id}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]
+        }) + "\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _admit(self) -> bool:
+        server = self.server
+        now = time.monotonic()
+        with server.lock:
+            recent = server.recent_requests
+            while recent and now - recent[0] >= 1.0:
+                recent.popleft()
+            if len(recent) >= server.rate_limit:
+                server.rate_limited += 1
+                return False
+            recent.append(now)
+            return True
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockOpenRouterServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_mock_server(port: int = 0, latency: float = 0.5, token_rate: float = 0.0,
+                      completion_words: int = 50, structured_output: bool = True, error_rate: float = 0.0,
+                      error_status: int = 503, slow_rate: float = 0.0, slow_latency: float = 5.0,
+                      seed: int = 0, rate_limit: int = 0) -> MockOpenRouterServer:
+    """
+    Start the mock server on a background thread and return it.
+    port: 0 picks a free port; read it back from server.server_address[1]
+    latency: seconds before the first token
+    token_rate: generated words per second after the first (0 = instant)
+    completion_words: length of each completion
+    structured_output: honour JSON response_format requests; False answers them with
+        plain text, like a model that ignores the format
+    error_rate: share of requests answered with error_status right away
+    slow_rate: share of requests that wait slow_latency instead of latency
+    seed: seeds the fault injection
+    rate_limit: requests accepted per rolling second, the rest get 429 (0 = unlimited)
+    Call server.shutdown() to stop it.
+    """
+    server = MockOpenRouterServer(("127.0.0.1", port), MockOpenRouterHandler)
+    server.latency = latency
+    server.token_rate = token_rate
+    server.completion_words = completion_words
+    server.structured_output = structured_output
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.slow_rate = slow_rate
+    server.slow_latency = slow_latency
+    server.random = random.Random(seed)
+    server.rate_limit = rate_limit
+    server.recent_requests = deque()
+    server.rate_limited = 0
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.prompt_chars = 0
+    server.completion_tokens = 0
+    server.connection_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server: MockOpenRouterServer) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock OpenRouter chat completions server.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="Words per second, 0 for instant")
+    parser.add_argument("--completion-words", type=int, default=50, help="Words per completion")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests that are slow")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="Seconds before a slow request answers")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per second before 429s, 0 for none")
+    args = parser.parse_args()
+
+    server = start_mock_server(args.port, args.latency, args.token_rate, args.completion_words,
+                               error_rate=args.error_rate, error_status=args.error_status,
+                               slow_rate=args.slow_rate, slow_latency=args.slow_latency, rate_limit=args.rate_limit)
+    print(f"Mock OpenRouter listening on {base_url(server)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
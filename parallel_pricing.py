@@ -0,0 +1,130 @@
+"""
+Multi-core repricing for many events or venue sections at once.
+
+Seat shards are packed into one shared memory block; worker processes attach
+to it by name and write prices straight into its output region, so no seat data
+is pickled between processes.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Hashable, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from pricing import PRICING_FACTORS, price_columns
+from seat_inventory import SeatInventory
+
+# Columns per shard in the shared block: the pricing factors followed by the output prices
+_FIELDS = list(PRICING_FACTORS) + ["price"]
+
+
+class ShardDrop(NamedTuple):
+    shard: Hashable
+    seat_id: Hashable
+    amount: float
+
+
+def _price_chunk(shm_name: str, total_rows: int, start: int, stop: int, base_price: float):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray((len(_FIELDS), total_rows), dtype=np.float64, buffer=shm.buf)
+        columns = {name: block[i, start:stop] for i, name in enumerate(_FIELDS[:-1])}
+        price_columns(columns, base_price, out=block[-1, start:stop])
+        del block, columns
+    finally:
+        shm.close()
+
+
+class ParallelPricer:
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 250_000):
+        """
+        workers: worker processes (default: CPU count)
+        chunk_size: shards larger than this are split so workers stay evenly loaded
+        Use as a context manager, or call close(), to shut the pool down.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def __enter__(self) -> "ParallelPricer":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown()
+
+    def price(self, shards: Mapping[Hashable, SeatInventory], base_price: float = 100.0) -> Optional[ShardDrop]:
+        """
+        Reprice every shard in place (the old prices move to previous_prices).
+        Returns the global highest-price drop across all shards, or None.
+        """
+        keys = list(shards)
+        sizes = [len(shards[key]) for key in keys]
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        total_rows = int(offsets[-1])
+        if total_rows == 0:
+            return None
+
+        shm = shared_memory.SharedMemory(create=True, size=len(_FIELDS) * total_rows * 8)
+        try:
+            block = np.ndarray((len(_FIELDS), total_rows), dtype=np.float64, buffer=shm.buf)
+            for key, start, stop in zip(keys, offsets[:-1], offsets[1:]):
+                for i, name in enumerate(_FIELDS[:-1]):
+                    block[i, start:stop] = shards[key].columns[name]
+
+            futures = [
+                self._executor.submit(_price_chunk, shm.name, total_rows, start, min(start + self.chunk_size, stop),
+                                      base_price)
+                for start_row, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+                for start in range(start_row, stop, self.chunk_size)
+            ]
+            for future in futures:
+                future.result()
+
+            for key, start, stop in zip(keys, offsets[:-1], offsets[1:]):
+                inventory = shards[key]
+                inventory.previous_prices[...] = inventory.prices
+                inventory.prices[...] = block[-1, start:stop]
+            del block
+        finally:
+            shm.close()
+            shm.unlink()
+
+        return highest_drop_across(shards)
+
+    def price_dicts(self, shards: Mapping[Hashable, List[Dict]],
+                    base_price: float = 100.0) -> Tuple[Dict[Hashable, List[Dict]], Optional[ShardDrop]]:
+        """price_seats for many seat lists at once; returns priced lists and the global drop."""
+        inventories = {key: SeatInventory.from_dicts(seats) for key, seats in shards.items()}
+        drop = self.price(inventories, base_price)
+        return {key: inventory.to_dicts() for key, inventory in inventories.items()}, drop
+
+
+def highest_drop_across(shards: Mapping[Hashable, SeatInventory]) -> Optional[ShardDrop]:
+    """detect_highest_price_drop over the union of all shards (previous_prices vs. prices)."""
+    leader = None
+    for key, inventory in shards.items():
+        previous = np.nan_to_num(inventory.previous_prices, nan=-np.inf)
+        if len(previous) == 0:
+            continue
+        row = int(np.argmax(previous))
+        # Strict > keeps the first shard on ties, like max() over the merged seat list
+        if leader is None or previous[row] > leader[2]:
+            leader = (key, row, float(previous[row]))
+    if leader is None or leader[2] == -np.inf:
+        return None
+    key, row, old_price = leader
+    new_price = float(shards[key].prices[row])
+    if new_price < old_price:
+        return ShardDrop(key, shards[key].ids[row:row + 1].tolist()[0], old_price - new_price)
+    return None
+
+
+def price_shards(shards: Mapping[Hashable, SeatInventory], base_price: float = 100.0,
+                 workers: Optional[int] = None) -> Optional[ShardDrop]:
+    """One-off convenience wrapper around ParallelPricer.price."""
+    with ParallelPricer(workers) as pricer:
+        return pricer.price(shards, base_price)
@@ -0,0 +1,96 @@
+"""
+Speculative prefetch of framework analyses.
+
+While users type their follow-up answers, the frameworks can already be
+analyzed on the bare product idea. At submit time a cheap word-overlap check
+decides how to use them: answers that add next to nothing (blank, or repeating
+the idea) are served the prefetched analyses as they are. Answers that add
+context, which is most real answers, get them refined: one short call per
+framework with the prefetched analysis and the answers, asking only for what
+the answers change (ProductDiscoveryAnalyzer.refine_analyses). That is cheaper
+and quicker than analyzing again from scratch.
+"""
+import os
+import re
+from typing import Dict
+
+from metrics import registry
+
+PREFETCHES = registry.counter(
+    "prefetch_total", "Speculative framework analyses by outcome (started, hit, refined, miss, abandoned)", ("outcome",))
+PREFETCH_WASTED_CALLS = registry.counter(
+    "prefetch_wasted_calls_total", "LLM calls made by prefetches whose results were not served")
+
+_WORD = re.compile(r"\w+")
+
+
+def _words(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+
+class PrefetchPolicy:
+    def __init__(self, enabled: bool = False, threshold: float = 0.85, refine: bool = True):
+        """
+        enabled: start analyses on the bare idea as soon as the follow-up questions are shown
+        threshold: serve the prefetched analyses unchanged when the similarity of the idea alone to the
+            idea plus answers is at least this (1.0 only when the answers add no new words)
+        refine: below the threshold, refine the prefetched analyses with the answers instead of
+            discarding them and analyzing again
+        """
+        self.enabled = enabled
+        self.threshold = threshold
+        self.refine = refine
+
+    @classmethod
+    def from_env(cls) -> "PrefetchPolicy":
+        return cls(
+            enabled=os.getenv("SPECULATIVE_PREFETCH", "").lower() in ("1", "true", "yes"),
+            threshold=float(os.getenv("PREFETCH_SIMILARITY", "0.85")),
+            refine=os.getenv("PREFETCH_REFINE", "1").lower() not in ("0", "false", "no")
+        )
+
+    @staticmethod
+    def similarity(product_idea: str, user_inputs: Dict) -> float:
+        """
+        Jaccard similarity of the words in the idea and in the idea plus every answer. Blank answers
+        and answers that only repeat the idea score 1.0; each new word lowers the score.
+        """
+        idea_words = _words(product_idea)
+        context_words = idea_words.union(*(_words(str(answer)) for answer in user_inputs.values() if answer))
+        return len(idea_words) / len(context_words) if context_words else 1.0
+
+    def should_serve(self, product_idea: str, user_inputs: Dict) -> bool:
+        return self.similarity(product_idea, user_inputs) >= self.threshold
+
+    def decide(self, product_idea: str, user_inputs: Dict) -> str:
+        """"hit" (serve as they are), "refined" (refine with the answers) or "miss" (analyze again)."""
+        if self.should_serve(product_idea, user_inputs):
+            return "hit"
+        return "refined" if self.refine else "miss"
+
+    @staticmethod
+    def record_started():
+        PREFETCHES.inc("started")
+
+    @staticmethod
+    def record_outcome(outcome: str, calls: int = 0):
+        """
+        outcome: "hit" (served), "refined" (served after refine_analyses), "miss" (rerun with the
+            answers) or "abandoned" (never submitted)
+        """
+        PREFETCHES.inc(outcome)
+        if outcome not in ("hit", "refined"):
+            PREFETCH_WASTED_CALLS.inc(amount=calls)
+
+    @staticmethod
+    def stats() -> Dict[str, float]:
+        """
+        Prefetch counts by outcome, wasted calls and the share of decided prefetches that were served
+        (as they were or refined).
+        """
+        counts = {outcome: int(PREFETCHES.value(outcome))
+                  for outcome in ("started", "hit", "refined", "miss", "abandoned")}
+        decided = counts["hit"] + counts["refined"] + counts["miss"] + counts["abandoned"]
+        counts["wasted_calls"] = int(PREFETCH_WASTED_CALLS.value())
+        counts["hit_rate"] = (counts["hit"] + counts["refined"]) / decided if decided else 0.0
+        return counts
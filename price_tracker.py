@@ -0,0 +1,103 @@
+"""
+Incremental highest-price-drop detection.
+
+Keeps the highest-priced seat in a max-heap so each price update costs
+O(k log n) for k changed seats instead of rescanning the whole venue the way
+ProductDiscoveryAnalyzer.detect_highest_price_drop does.
+"""
+import heapq
+import itertools
+from typing import Callable, Dict, Hashable, List, Mapping, NamedTuple, Optional, Tuple
+
+
+class PriceDrop(NamedTuple):
+    seat_id: Hashable
+    amount: float
+
+
+class PriceDropTracker:
+    def __init__(self, prices: Optional[Mapping[Hashable, float]] = None):
+        """
+        prices: initial seat id -> price; iteration order breaks ties between equal
+            prices the same way max() does in detect_highest_price_drop
+        """
+        self._prices: Dict[Hashable, float] = {}
+        self._order: Dict[Hashable, int] = {}
+        self._sequence = itertools.count()
+        # Entries are (-price, order, seat_id); stale ones are skipped lazily
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._listeners: List[Callable[[PriceDrop], None]] = []
+        if prices:
+            for seat_id, price in prices.items():
+                self._set(seat_id, price)
+            heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def price(self, seat_id: Hashable) -> Optional[float]:
+        return self._prices.get(seat_id)
+
+    def subscribe(self, listener: Callable[[PriceDrop], None]):
+        """Call listener(PriceDrop) whenever an update drops the top price."""
+        self._listeners.append(listener)
+
+    def leader(self) -> Tuple[Optional[Hashable], Optional[float]]:
+        """The highest-priced seat and its price, or (None, None) when empty."""
+        heap = self._heap
+        while heap:
+            negative_price, order, seat_id = heap[0]
+            if self._order.get(seat_id) == order and self._prices[seat_id] == -negative_price:
+                return seat_id, -negative_price
+            heapq.heappop(heap)
+        return None, None
+
+    def update(self, changes: Mapping[Hashable, Optional[float]]) -> Optional[PriceDrop]:
+        """
+        Apply a batch of price changes and report a drop of the top price, if any.
+        changes: seat id -> new price, or None to remove the seat
+        Same outcome as detect_highest_price_drop(before, after) for the two full seat lists.
+        """
+        old_id, old_price = self.leader()
+        for seat_id, price in changes.items():
+            if price is None:
+                self._prices.pop(seat_id, None)
+                self._order.pop(seat_id, None)
+            else:
+                self._push(seat_id, price)
+        self._compact()
+
+        new_id, new_price = self.leader()
+        if old_id is None or new_id is None:
+            return None
+        drop = None
+        # If the same seat is still the highest, but price dropped
+        if old_id == new_id and new_price < old_price:
+            drop = PriceDrop(new_id, old_price - new_price)
+        # If a different seat is now highest, check if the old highest dropped
+        elif self._prices.get(old_id, 0) < old_price:
+            drop = PriceDrop(old_id, old_price - self._prices.get(old_id, 0))
+        if drop is not None:
+            for listener in self._listeners:
+                listener(drop)
+        return drop
+
+    def _set(self, seat_id: Hashable, price: float):
+        if seat_id not in self._order:
+            self._order[seat_id] = next(self._sequence)
+        self._prices[seat_id] = price
+        self._heap.append((-price, self._order[seat_id], seat_id))
+
+    def _push(self, seat_id: Hashable, price: float):
+        if seat_id not in self._order:
+            self._order[seat_id] = next(self._sequence)
+        elif self._prices[seat_id] == price:
+            return
+        self._prices[seat_id] = price
+        heapq.heappush(self._heap, (-price, self._order[seat_id], seat_id))
+
+    def _compact(self):
+        # Rebuild once stale entries outnumber live ones, keeping memory at O(n)
+        if len(self._heap) > 2 * len(self._prices) + 64:
+            self._heap = [(-price, self._order[seat_id], seat_id) for seat_id, price in self._prices.items()]
+            heapq.heapify(self._heap)
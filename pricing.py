@@ -0,0 +1,105 @@
+"""
+Vectorized seat pricing.
+
+Prices whole venues in one NumPy pass from columnar pricing factors, using the
+same formula, distance clamp and rounding as ProductDiscoveryAnalyzer.calculate_seat_price.
+"""
+from typing import Mapping, Optional, Union
+
+import numpy as np
+
+# Pricing factor -> value used when a seat does not specify it (matches price_seats)
+PRICING_FACTORS = {
+    "view_quality": 1.0,
+    "distance": 1,
+    "section_popularity": 1.0,
+    "demand_factor": 1.0,
+    "accessibility": 1.0,
+}
+
+Columns = Union[Mapping[str, np.ndarray], np.ndarray]
+
+
+def _column(columns: Columns, name: str, size: Optional[int]) -> Union[np.ndarray, float]:
+    if isinstance(columns, np.ndarray):
+        present = columns.dtype.names is not None and name in columns.dtype.names
+    else:
+        present = name in columns
+    if not present:
+        return float(PRICING_FACTORS[name])
+    values = np.asarray(columns[name], dtype=np.float64)
+    if size is not None and values.shape != (size,):
+        raise ValueError(f"Column '{name}' has shape {values.shape}, expected ({size},)")
+    return values
+
+
+def _row_count(columns: Columns) -> int:
+    if isinstance(columns, np.ndarray):
+        return len(columns)
+    sizes = {len(columns[name]) for name in PRICING_FACTORS if name in columns}
+    if len(sizes) > 1:
+        raise ValueError(f"Pricing columns have different lengths: {sorted(sizes)}")
+    if not sizes:
+        raise ValueError("No pricing columns given")
+    return sizes.pop()
+
+
+def round_prices(prices: np.ndarray) -> np.ndarray:
+    """
+    Round in place to cents exactly like Python's round(price, 2).
+    np.round works on the binary value scaled by 100, which can disagree with round()
+    for values that sit (almost) exactly on a half cent, so those few are redone in Python.
+    """
+    scaled = prices * 100.0
+    halfway = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    exact = [round(float(price), 2) for price in prices[halfway]]
+    np.round(prices, 2, out=prices)
+    prices[halfway] = exact
+    return prices
+
+
+def price_columns(columns: Columns, base_price: float = 100.0, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Price every seat in one vectorized pass.
+    columns: mapping of factor name -> 1-D array, or a structured array with factor fields;
+        missing factors fall back to the price_seats defaults
+    base_price: float, the minimum price for any seat
+    out: optional float64 array to write prices into instead of allocating
+    Returns a float64 array of prices rounded to cents.
+    """
+    size = _row_count(columns)
+    if out is None:
+        out = np.empty(size, dtype=np.float64)
+    elif out.shape != (size,):
+        raise ValueError(f"out has shape {out.shape}, expected ({size},)")
+
+    distance = _column(columns, "distance", size)
+    # Same left-to-right evaluation order as calculate_seat_price, so results match bit for bit
+    out[...] = np.maximum(1.0, 1.5 - (distance * 0.05))
+    np.multiply(base_price * _column(columns, "view_quality", size), out, out=out)
+    for name in ("section_popularity", "demand_factor", "accessibility"):
+        np.multiply(out, _column(columns, name, size), out=out)
+    return round_prices(out)
+
+
+def highest_price_drop(ids: np.ndarray, old_prices: np.ndarray, new_prices: np.ndarray):
+    """
+    Vectorized detect_highest_price_drop for price columns aligned by seat.
+    Returns (seat_id, amount), or (None, 0) when the top-priced seat did not drop.
+    """
+    if len(old_prices) == 0 or len(new_prices) == 0:
+        return None, 0
+    # argmax keeps the first maximum, like max() over an insertion-ordered dict
+    old_highest = int(np.argmax(old_prices))
+    old_highest_price = float(old_prices[old_highest])
+    new_price = float(new_prices[old_highest])
+    # With the same seats on both sides, "leader dropped and is still the leader" and
+    # "leader dropped and lost the lead" both reduce to: the old leader got cheaper
+    if new_price < old_highest_price:
+        return _plain(ids[old_highest]), old_highest_price - new_price
+    return None, 0
+
+
+def _plain(value):
+    """NumPy scalar -> built-in Python value."""
+    return value.item() if isinstance(value, np.generic) else value
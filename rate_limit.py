@@ -0,0 +1,165 @@
+"""
+Client-side rate limiting for the shared API key.
+
+A RateLimiter holds one token bucket for requests and one for tokens per
+minute. Every upstream request waits its turn (first come, first served) until
+both buckets can cover it, so the process as a whole stays under the
+provider's limits instead of collecting 429s. With a SharedStore the bucket
+levels live in the shared SQLite file, so all worker processes draw on one
+budget; its transactions run on a thread of the limiter's own, off the loop.
+While the shared file cannot be used, each process falls back to its own buckets.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from shared_store import SharedStore
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        """
+        per_minute: sustained refill rate
+        burst_seconds: capacity as seconds' worth of the rate; how much can go out at once after idling
+        """
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (amounts above capacity wait for a full bucket)."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, burst_seconds: float = 10.0,
+                 store: Optional[SharedStore] = None):
+        """
+        requests_per_minute / tokens_per_minute: limits to stay under; 0 leaves that dimension unlimited
+        burst_seconds: see TokenBucket
+        store: keep the buckets in this shared store, so the limits apply across processes
+        Must be used from a single event loop (LLMClient's).
+        """
+        self._requests = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute > 0 else None
+        self.store = store if self.enabled else None
+        self._io: Optional[ThreadPoolExecutor] = None
+        if self.store is not None:
+            self.store.execute("CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                               "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            # BEGIN IMMEDIATE can wait on other processes' transactions; the loop must not
+            self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limit-io")
+        self._lock: Optional[asyncio.Lock] = None
+        self._stats = {"acquired": 0, "waited": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+                       "queue_depth": 0, "queue_depth_max": 0, "store_errors": 0}
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        return cls(
+            requests_per_minute=float(os.getenv("LLM_RATE_LIMIT_RPM", "0")),
+            tokens_per_minute=float(os.getenv("LLM_RATE_LIMIT_TPM", "0")),
+            burst_seconds=float(os.getenv("LLM_RATE_LIMIT_BURST", "10")),
+            store=SharedStore.from_env()
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._requests is not None or self._tokens is not None
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Wait until one request using `tokens` tokens may go out; returns the seconds waited."""
+        if not self.enabled:
+            return 0.0
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        stats = self._stats
+        stats["queue_depth"] += 1
+        stats["queue_depth_max"] = max(stats["queue_depth_max"], stats["queue_depth"])
+        start = time.monotonic()
+        try:
+            # asyncio.Lock wakes waiters in arrival order, so the queue is FIFO
+            async with self._lock:
+                while True:
+                    wait = await self._try_take_async(tokens)
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+        finally:
+            stats["queue_depth"] -= 1
+        waited = time.monotonic() - start
+        stats["acquired"] += 1
+        if waited > 0.001:
+            stats["waited"] += 1
+        stats["wait_seconds_total"] += waited
+        stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+        return waited
+
+    def _buckets(self, tokens: int) -> List[Tuple[str, TokenBucket, float]]:
+        buckets = []
+        if self._requests:
+            buckets.append(("requests", self._requests, 1))
+        if self._tokens:
+            buckets.append(("tokens", self._tokens, tokens))
+        return buckets
+
+    async def _try_take_async(self, tokens: int) -> float:
+        if self._io is None:
+            return self._try_take(tokens)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._io, self._try_take_shared, tokens)
+        except sqlite3.Error:
+            # A broken or locked-out shared file must not fail the request; this process's buckets limit it instead
+            self._stats["store_errors"] += 1
+            return self._try_take(tokens)
+
+    def _try_take(self, tokens: int) -> float:
+        """Take from every (local) bucket if all can cover the request now; otherwise the seconds to wait first."""
+        buckets = self._buckets(tokens)
+        wait = max(bucket.wait_time(amount) for _, bucket, amount in buckets)
+        if wait <= 0:
+            for _, bucket, amount in buckets:
+                bucket.take(amount)
+        return wait
+
+    def _try_take_shared(self, tokens: int) -> float:
+        # Same arithmetic as TokenBucket, on levels stored in the shared file. Wall-clock time,
+        # since the monotonic clock is not comparable between processes on every platform.
+        now = time.time()
+        wait = 0.0
+        levels = []
+        with self.store.transaction() as db:
+            for name, bucket, amount in self._buckets(tokens):
+                row = db.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE name = ?", (name,)).fetchone()
+                level = bucket.capacity if row is None else min(bucket.capacity,
+                                                                 row[0] + max(0.0, now - row[1]) * bucket.rate)
+                needed = min(amount, bucket.capacity)
+                wait = max(wait, (needed - level) / bucket.rate)
+                levels.append((name, level - needed))
+            if wait <= 0:
+                db.executemany("INSERT OR REPLACE INTO rate_limit_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                               [(name, level, now) for name, level in levels])
+        return wait
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Requests let through, how many had to wait and for how long, the current/peak queue depth,
+        and how often the shared store failed and the local buckets were used instead.
+        """
+        stats = dict(self._stats)
+        stats["wait_seconds_mean"] = stats["wait_seconds_total"] / stats["acquired"] if stats["acquired"] else 0.0
+        return stats
@@ -0,0 +1,142 @@
+"""
+Content-addressed cache for generated report files.
+
+Reports are keyed on a hash of what they render (see
+ReportGenerator.report_key), so each format of an analysis is generated at
+most once. A memory tier bounded by total bytes sits in front of a directory
+of report files; both evict least recently used reports first.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class ReportCache:
+    def __init__(self, max_memory_bytes: int = 32 * 1024 * 1024, directory: Optional[str] = None,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        """
+        max_memory_bytes: total size of reports kept in memory (0 disables the tier)
+        directory: where report files are kept across restarts (None disables the tier)
+        max_disk_bytes: least recently used files beyond this total size are deleted
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        # One lock per key being generated, so concurrent requests build a report once
+        self._building: Dict[str, threading.Lock] = {}
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "builds": 0, "evictions": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "ReportCache":
+        if os.getenv("REPORT_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+            return cls(max_memory_bytes=0, directory=None)
+        return cls(
+            max_memory_bytes=int(float(os.getenv("REPORT_CACHE_MEMORY_MB", "32")) * 1024 * 1024),
+            directory=os.getenv("REPORT_CACHE_DIR", ".cache/reports") or None,
+            max_disk_bytes=int(float(os.getenv("REPORT_CACHE_DISK_MB", "256")) * 1024 * 1024)
+        )
+
+    def get_or_build(self, key: str, build: Callable[[], bytes]) -> bytes:
+        """Return the cached report for key, calling build() to create it on a miss."""
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        with building:
+            # Another thread may have finished the same report while we waited
+            data = self.get(key)
+            if data is None:
+                data = build()
+                with self._lock:
+                    self._stats["builds"] += 1
+                self.set(key, data)
+        with self._lock:
+            self._building.pop(key, None)
+        return data
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return data
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        with self._lock:
+            self._stats["disk_hits"] += 1
+        self._remember(key, data)
+        return data
+
+    def set(self, key: str, data: bytes):
+        self._remember(key, data)
+        path = self._path(key)
+        if path is None:
+            return
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self._trim_disk()
+
+    def _path(self, key: str) -> Optional[str]:
+        return os.path.join(self.directory, f"{key}.report") if self.directory else None
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self._stats["evictions"] += 1
+
+    def _trim_disk(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".report"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self.directory:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".report"):
+                    os.remove(entry.path)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, memory_entries=len(self._memory), memory_bytes=self._memory_bytes)
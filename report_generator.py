@@ -4,10 +4,54 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.units import inch
 from datetime import datetime
-import io
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Iterable, Iterator, Optional
+from xml.sax.saxutils import escape
+from report_cache import ReportCache
+from metrics import span
+import hashlib
+import json
+import os
+import re
+
+# Reports up to this size stay in memory; larger ones spill to a temporary file
+SPOOL_MAX_BYTES = int(os.getenv("REPORT_SPOOL_MAX_BYTES", str(4 * 1024 * 1024)))
+# Chunk size when a report is returned as an iterable
+CHUNK_SIZE = 64 * 1024
+
+# Bump when the report layout changes so cached reports are rebuilt
+REPORT_LAYOUT_VERSION = 1
+# Analysis results that appear in the report
+FRAMEWORK_KEYS = ('jtbd', 'value_proposition', 'opportunity_solution', 'four_fit')
+
+_HEADING = re.compile(r'^#{1,6}\s+(.*)$')
+_BULLET = re.compile(r'^(\s*)(?:[-*+•]|(\d+[.)]))\s+(.*)$')
+_BOLD = re.compile(r'\*\*(.+?)\*\*')
+
+class _LazyStory(list):
+    """
+    A story list that pulls flowables from an iterator as the layout consumes them.
+    reportlab's build loop calls len() before every step, which tops the list up to a
+    few flowables of lookahead (enough for keepWithNext groups such as heading + first line).
+    """
+
+    def __init__(self, flowables: Iterable, lookahead: int = 8):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def __len__(self) -> int:
+        while list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                break
+        return list.__len__(self)
 
 class ReportGenerator:
-    def __init__(self):
+    def __init__(self, cache: Optional[ReportCache] = None):
+        """cache: reuse generated reports across calls (see report_cache.py)"""
+        self.cache = cache
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
 
@@ -29,6 +73,50 @@ class ReportGenerator:
             textColor=colors.HexColor('#1E1E1E')
         ))
 
+        # Markdown bullets, one level of nesting
+        self.styles.add(ParagraphStyle(
+            name='AnalysisBullet',
+            parent=self.styles['Normal'],
+            leftIndent=18,
+            bulletIndent=6,
+            spaceAfter=2
+        ))
+
+        self.styles.add(ParagraphStyle(
+            name='AnalysisSubBullet',
+            parent=self.styles['AnalysisBullet'],
+            leftIndent=36,
+            bulletIndent=24
+        ))
+
+    def _inline_markup(self, text: str) -> str:
+        """Escape LLM text for reportlab's paragraph markup, keeping **bold**."""
+        return _BOLD.sub(r'<b>\1</b>', escape(text.strip()))
+
+    def _markdown_flowables(self, text: str) -> Iterator:
+        """
+        Yield one flowable per line of analysis markdown (headings, bullets, plain lines),
+        so reportlab lays out many small paragraphs instead of one huge one.
+        """
+        blank = False
+        for line in text.splitlines():
+            if not line.strip():
+                if not blank:
+                    yield Spacer(1, 6)
+                blank = True
+                continue
+            blank = False
+            heading = _HEADING.match(line.strip())
+            bullet = _BULLET.match(line)
+            if heading:
+                yield Paragraph(self._inline_markup(heading.group(1)), self.styles['SubHeader'])
+            elif bullet:
+                indent, number, content = bullet.groups()
+                style = self.styles['AnalysisSubBullet' if len(indent.expandtabs(4)) >= 2 else 'AnalysisBullet']
+                yield Paragraph(self._inline_markup(content), style, bulletText=number or '•')
+            else:
+                yield Paragraph(self._inline_markup(line), self.styles['Normal'])
+
     def _format_text_report(self, product_idea: str, analysis_results: dict) -> str:
         """Generate a formatted text report."""
         report = []
@@ -64,9 +152,23 @@ class ReportGenerator:
 
     def _format_pdf_report(self, product_idea: str, analysis_results: dict) -> bytes:
         """Generate a PDF report."""
-        buffer = io.BytesIO()
+        with self._spooled_pdf_report(product_idea, analysis_results) as report:
+            return report.read()
+
+    def _spooled_pdf_report(self, product_idea: str, analysis_results: dict) -> BinaryIO:
+        """Build the PDF into a spooled temporary file, rewound for reading."""
+        report = SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        try:
+            self._write_pdf_report(product_idea, analysis_results, report)
+        except BaseException:
+            report.close()
+            raise
+        report.seek(0)
+        return report
+
+    def _write_pdf_report(self, product_idea: str, analysis_results: dict, out: BinaryIO):
         doc = SimpleDocTemplate(
-            buffer,
+            out,
             pagesize=letter,
             rightMargin=72,
             leftMargin=72,
@@ -74,20 +176,21 @@ class ReportGenerator:
             bottomMargin=72
         )
         
-        # Build the PDF content
-        story = []
-        
+        # Build the PDF; flowables are created only as layout reaches them
+        doc.build(_LazyStory(self._pdf_story(product_idea, analysis_results)))
+
+    def _pdf_story(self, product_idea: str, analysis_results: dict) -> Iterator:
         # Add title
-        story.append(Paragraph("Product Discovery Strategy Report", self.styles['Title']))
-        story.append(Spacer(1, 12))
-        story.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 
-                             self.styles['Normal']))
-        story.append(Spacer(1, 24))
+        yield Paragraph("Product Discovery Strategy Report", self.styles['Title'])
+        yield Spacer(1, 12)
+        yield Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 
+                        self.styles['Normal'])
+        yield Spacer(1, 24)
         
         # Add product idea
-        story.append(Paragraph("Product Idea", self.styles['SectionHeader']))
-        story.append(Paragraph(product_idea, self.styles['Normal']))
-        story.append(Spacer(1, 24))
+        yield Paragraph("Product Idea", self.styles['SectionHeader'])
+        yield from self._markdown_flowables(product_idea)
+        yield Spacer(1, 24)
         
         # Add each framework analysis
         frameworks = {
@@ -98,29 +201,63 @@ class ReportGenerator:
         }
         
         for key, title in frameworks.items():
-            story.append(Paragraph(title, self.styles['SectionHeader']))
-            story.append(Paragraph(analysis_results[key]['analysis'], self.styles['Normal']))
-            story.append(Spacer(1, 24))
-        
-        # Build the PDF
-        doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
+            yield Paragraph(title, self.styles['SectionHeader'])
+            yield from self._markdown_flowables(analysis_results[key]['analysis'])
+            yield Spacer(1, 24)
 
-    def generate_report(self, product_idea: str, analysis_results: dict, format: str = 'txt') -> tuple:
+    def _iter_chunks(self, report: BinaryIO) -> Iterator[bytes]:
+        with report:
+            while True:
+                chunk = report.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    @staticmethod
+    def report_key(product_idea: str, analysis_results: dict, format: str = 'txt') -> str:
+        """
+        Cache key for a report: a hash of everything it renders. The generation timestamp
+        and extra result fields (such as timings) are left out, so they never cause a miss.
+        """
+        analyses = {key: analysis_results[key]['analysis'] for key in FRAMEWORK_KEYS if key in analysis_results}
+        payload = json.dumps([REPORT_LAYOUT_VERSION, format.lower(), product_idea, analyses],
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def generate_report(self, product_idea: str, analysis_results: dict, format: str = 'txt',
+                        chunked: bool = False) -> tuple:
         """
         Generate a report in the specified format.
         Returns a tuple of (file_data, mime_type, file_extension)
+        chunked: file_data is an iterator of byte chunks instead of one bytes object; uncached PDFs
+            are read back from a spooled temporary file, so they are never held whole in memory
+        With a cache, each format of an analysis is built on first request only.
         """
         if format.lower() == 'pdf':
-            return (
-                self._format_pdf_report(product_idea, analysis_results),
-                'application/pdf',
-                'pdf'
-            )
+            mime_type, file_extension = 'application/pdf', 'pdf'
         else:
-            return (
-                self._format_text_report(product_idea, analysis_results).encode('utf-8'),
-                'text/plain',
-                'txt'
-            ) 
\ No newline at end of file
+            mime_type, file_extension = 'text/plain', 'txt'
+
+        with span(f"report_{file_extension}"):
+            if self.cache is not None:
+                data = self.cache.get_or_build(
+                    self.report_key(product_idea, analysis_results, file_extension),
+                    lambda: self._build_report(product_idea, analysis_results, file_extension)
+                )
+            elif chunked and file_extension == 'pdf':
+                return (self._iter_chunks(self._spooled_pdf_report(product_idea, analysis_results)),
+                        mime_type, file_extension)
+            else:
+                data = self._build_report(product_idea, analysis_results, file_extension)
+
+        if chunked:
+            return ([data[start:start + CHUNK_SIZE] for start in range(0, len(data), CHUNK_SIZE)],
+                    mime_type, file_extension)
+        return data, mime_type, file_extension
+
+    def _build_report(self, product_idea: str, analysis_results: dict, file_extension: str) -> bytes:
+        # Cache misses only; report_<format> also counts cache hits
+        with span(f"report_{file_extension}_build"):
+            if file_extension == 'pdf':
+                return self._format_pdf_report(product_idea, analysis_results)
+            return self._format_text_report(product_idea, analysis_results).encode('utf-8')
@@ -0,0 +1,136 @@
+"""
+Streaming repricing pipeline for live demand updates.
+
+Consumes a feed of demand-factor changes for single seats or whole sections,
+reprices only the affected seats of a SeatInventory (calculate_seat_price
+semantics via pricing.price_columns) and yields the resulting price changes
+together with any drop of the venue's top price.
+"""
+import asyncio
+import time
+from typing import AsyncIterable, AsyncIterator, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from price_tracker import PriceDrop, PriceDropTracker
+from pricing import price_columns
+from seat_inventory import SeatInventory
+
+
+class DemandUpdate(NamedTuple):
+    """New demand_factor for one seat (seat_id) or every seat in a section."""
+    demand_factor: float
+    seat_id: Optional[Hashable] = None
+    section: Optional[str] = None
+
+
+class PriceChange(NamedTuple):
+    seat_id: Hashable
+    old_price: float
+    new_price: float
+
+
+class RepricingBatch(NamedTuple):
+    """Notifications for one processed batch of updates."""
+    changes: List[PriceChange]
+    drop: Optional[PriceDrop]
+    updates: int
+
+
+class RepricingPipeline:
+    def __init__(self, inventory: SeatInventory, base_price: float = 100.0):
+        """
+        inventory: seats to keep priced; any unpriced seats are priced up front
+        base_price: float, the minimum price for any seat
+        """
+        self.inventory = inventory
+        self.base_price = base_price
+        if np.isnan(inventory.prices).any():
+            inventory.reprice(base_price)
+        self.tracker = PriceDropTracker(dict(zip(inventory.ids.tolist(), inventory.prices.tolist())))
+
+    def apply(self, updates: Iterable[DemandUpdate]) -> RepricingBatch:
+        """Apply one batch of updates; later updates to the same seat win."""
+        inventory = self.inventory
+        demand: Dict[int, float] = {}
+        count = 0
+        for update in updates:
+            count += 1
+            if update.section is not None:
+                for row in inventory.section_rows(update.section).tolist():
+                    demand[row] = update.demand_factor
+            else:
+                demand[inventory.row(update.seat_id)] = update.demand_factor
+        if not demand:
+            return RepricingBatch([], None, count)
+
+        rows = np.fromiter(demand.keys(), dtype=np.int64, count=len(demand))
+        inventory.columns["demand_factor"][rows] = np.fromiter(demand.values(), dtype=np.float64, count=len(demand))
+        old_prices = inventory.prices[rows]
+        new_prices = price_columns({name: column[rows] for name, column in inventory.columns.items()},
+                                   self.base_price)
+        inventory.prices[rows] = new_prices
+
+        changed = np.flatnonzero(old_prices != new_prices)
+        seat_ids = inventory.ids[rows[changed]].tolist()
+        changes = [
+            PriceChange(seat_id, old, new)
+            for seat_id, old, new in zip(seat_ids, old_prices[changed].tolist(), new_prices[changed].tolist())
+        ]
+        drop = self.tracker.update({change.seat_id: change.new_price for change in changes}) if changes else None
+        return RepricingBatch(changes, drop, count)
+
+    def run(self, updates: Iterable[DemandUpdate], batch_size: int = 256) -> Iterator[RepricingBatch]:
+        """Synchronous stage: reprice every batch_size updates (and once more for the tail)."""
+        batch: List[DemandUpdate] = []
+        for update in updates:
+            batch.append(update)
+            if len(batch) >= batch_size:
+                yield self.apply(batch)
+                batch = []
+        if batch:
+            yield self.apply(batch)
+
+    async def run_async(self, updates: AsyncIterable[DemandUpdate], batch_size: int = 256,
+                        batch_window: float = 0.05, max_pending: int = 1024) -> AsyncIterator[RepricingBatch]:
+        """
+        Asyncio stage with batching windows and backpressure.
+        batch_size: reprice as soon as this many updates are waiting
+        batch_window: otherwise reprice at most this many seconds after a batch's first update
+        max_pending: bounded buffer between the feed and the pricer; a full buffer stops
+            reading from the feed until the pricer catches up
+        """
+        pending: "asyncio.Queue[Optional[DemandUpdate]]" = asyncio.Queue(maxsize=max(1, max_pending))
+
+        async def read_feed():
+            try:
+                async for update in updates:
+                    await pending.put(update)
+            finally:
+                await pending.put(None)
+
+        reader = asyncio.ensure_future(read_feed())
+        try:
+            finished = False
+            while not finished:
+                update = await pending.get()
+                if update is None:
+                    break
+                batch = [update]
+                deadline = time.monotonic() + batch_window
+                while len(batch) < batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        update = await asyncio.wait_for(pending.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    if update is None:
+                        finished = True
+                        break
+                    batch.append(update)
+                yield self.apply(batch)
+            await reader
+        finally:
+            reader.cancel()
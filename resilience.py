@@ -0,0 +1,154 @@
+"""
+Retry, backoff and circuit-breaker policies for LLM calls.
+
+LLMClient applies these around every chat completion request: retryable
+failures (connection errors, timeouts, 408/409/429 and 5xx responses) are
+retried with exponentially growing, fully jittered delays that never run past
+the caller's deadline, and a circuit breaker fails calls fast while the
+upstream keeps failing.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+import httpx
+import openai
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit breaker is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call's deadline leaves no time for another attempt."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """True for failures that a later attempt may not hit."""
+    if isinstance(exc, openai.APIConnectionError):
+        # Includes openai.APITimeoutError
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in (408, 409, 429) or exc.status_code >= 500
+    return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError))
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After header on an error response, if present."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return max(0.0, float(response.headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 multiplier: float = 2.0):
+        """
+        max_attempts: total attempts per call, including the first
+        base_delay: backoff ceiling in seconds before the first retry
+        max_delay: cap on any single backoff
+        multiplier: growth of the backoff ceiling per retry
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("LLM_RETRIES", "2")) + 1,
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+        )
+
+    def delay(self, retry: int, server_hint: Optional[float] = None) -> float:
+        """
+        Backoff before retry number `retry` (1-based): uniform in [0, ceiling] ("full jitter"),
+        so callers that failed together do not retry together. A Retry-After hint wins, up to max_delay.
+        """
+        if server_hint is not None:
+            return min(server_hint, self.max_delay)
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** (retry - 1))
+        return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        failure_threshold: consecutive retryable failures that open the circuit (0 disables it)
+        reset_timeout: seconds the circuit stays open before one probe call is let through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opens = 0
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30"))
+        )
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to the upstream now; in half-open state only one probe at a time."""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release_probe(self):
+        """Give back the half-open probe of a call that ended without an outcome (e.g. it was cancelled)."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opens += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
@@ -0,0 +1,169 @@
+"""
+Columnar seat inventory.
+
+Holds a venue's seats as typed NumPy columns instead of a list of dicts: one
+array per pricing factor plus current and previous prices. Repricing writes into
+the existing price arrays, so nothing is copied per seat.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from pricing import PRICING_FACTORS, highest_price_drop, price_columns
+
+
+class SeatInventory:
+    def __init__(self, ids: Sequence, factors: Optional[Dict[str, Sequence]] = None,
+                 sections: Optional[Sequence[str]] = None, prices: Optional[Sequence[float]] = None):
+        """
+        ids: unique seat ids (stored as int64 when they are all integers)
+        factors: pricing factor -> values; missing factors use the price_seats defaults
+        sections: optional section label per seat
+        prices: optional current prices; unpriced seats hold NaN
+        """
+        ids = list(ids) if not isinstance(ids, np.ndarray) else ids
+        size = len(ids)
+        if isinstance(ids, np.ndarray) and ids.dtype.kind in "iu":
+            self.ids = ids.astype(np.int64, copy=False)
+        elif all(isinstance(seat_id, (int, np.integer)) and not isinstance(seat_id, bool) for seat_id in ids):
+            self.ids = np.fromiter(ids, dtype=np.int64, count=size)
+        else:
+            self.ids = np.array(ids, dtype=object)
+
+        factors = factors or {}
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, default in PRICING_FACTORS.items():
+            dtype = np.int32 if name == "distance" else np.float64
+            if name in factors:
+                column = np.asarray(factors[name], dtype=dtype)
+                if column.shape != (size,):
+                    raise ValueError(f"Column '{name}' has shape {column.shape}, expected ({size},)")
+            else:
+                column = np.full(size, default, dtype=dtype)
+            self.columns[name] = column
+
+        self.section_names: List[str] = []
+        self.section_codes: Optional[np.ndarray] = None
+        if sections is not None:
+            names, codes = np.unique(np.asarray(sections, dtype=object).astype(str), return_inverse=True)
+            self.section_names = names.tolist()
+            self.section_codes = codes.astype(np.int32 if len(names) > 32767 else np.int16)
+
+        self.prices = np.full(size, np.nan) if prices is None else np.array(prices, dtype=np.float64)
+        self.previous_prices = np.full(size, np.nan)
+        self._build_index()
+
+    def _build_index(self):
+        # Contiguous integer ids need no lookup table at all
+        size = len(self.ids)
+        self._id_offset: Optional[int] = None
+        self._index: Dict = {}
+        if self.ids.dtype == np.int64 and size and int(self.ids[-1]) - int(self.ids[0]) == size - 1 \
+                and np.array_equal(self.ids, np.arange(self.ids[0], self.ids[0] + size)):
+            self._id_offset = int(self.ids[0])
+        else:
+            self._index = {seat_id: row for row, seat_id in enumerate(self.ids.tolist())}
+            if len(self._index) != size:
+                raise ValueError("Seat ids must be unique")
+
+    @classmethod
+    def from_dicts(cls, seats: Iterable[Dict]) -> "SeatInventory":
+        """Build from the list-of-dicts format used by price_seats; seats without an 'id' get their position."""
+        seats = list(seats)
+        ids = [seat.get("id", i) for i, seat in enumerate(seats)]
+        factors = {
+            name: [seat.get(name, default) for seat in seats]
+            for name, default in PRICING_FACTORS.items()
+        }
+        sections = [seat.get("section", "") for seat in seats] if any("section" in seat for seat in seats) else None
+        prices = [seat.get("price", np.nan) for seat in seats]
+        return cls(ids, factors, sections, prices)
+
+    def to_dicts(self) -> List[Dict]:
+        """Convert back to the list-of-dicts format (id, section, pricing factors and price)."""
+        seats = []
+        ids = self.ids.tolist()
+        columns = {name: column.tolist() for name, column in self.columns.items()}
+        prices = self.prices.tolist()
+        for row, seat_id in enumerate(ids):
+            seat = {"id": seat_id}
+            if self.section_codes is not None:
+                seat["section"] = self.section_names[self.section_codes[row]]
+            for name in PRICING_FACTORS:
+                seat[name] = columns[name][row]
+            if prices[row] == prices[row]:  # skip NaN (never priced)
+                seat["price"] = prices[row]
+            seats.append(seat)
+        return seats
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, seat_id) -> int:
+        """O(1) seat id -> row position."""
+        if self._id_offset is not None:
+            row = int(seat_id) - self._id_offset if isinstance(seat_id, (int, np.integer)) else -1
+            if 0 <= row < len(self.ids):
+                return row
+            raise KeyError(seat_id)
+        return self._index[seat_id]
+
+    def rows(self, seat_ids: Iterable) -> np.ndarray:
+        return np.fromiter((self.row(seat_id) for seat_id in seat_ids), dtype=np.int64)
+
+    def section_rows(self, section: str) -> np.ndarray:
+        if self.section_codes is None or section not in self.section_names:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.section_codes == self.section_names.index(section))
+
+    def get(self, seat_id) -> Dict:
+        row = self.row(seat_id)
+        seat = {"id": self.ids[row:row + 1].tolist()[0]}
+        if self.section_codes is not None:
+            seat["section"] = self.section_names[self.section_codes[row]]
+        for name, column in self.columns.items():
+            seat[name] = column[row].item()
+        seat["price"] = float(self.prices[row])
+        return seat
+
+    def set_factor(self, name: str, value, seat_ids: Optional[Iterable] = None):
+        """Update one pricing factor for the given seats (all seats if None)."""
+        if name not in self.columns:
+            raise KeyError(f"Unknown pricing factor '{name}'")
+        if seat_ids is None:
+            self.columns[name][...] = value
+        else:
+            self.columns[name][self.rows(seat_ids)] = value
+
+    def reprice(self, base_price: float = 100.0, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Recompute prices in place, keeping the old ones in previous_prices.
+        rows: only reprice these row positions (all seats if None)
+        Returns the current price column.
+        """
+        self.previous_prices[...] = self.prices
+        if rows is None:
+            price_columns(self.columns, base_price, out=self.prices)
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            subset = {name: column[rows] for name, column in self.columns.items()}
+            self.prices[rows] = price_columns(subset, base_price)
+        return self.prices
+
+    def snapshot(self) -> np.ndarray:
+        """Copy of the current prices: one contiguous memcpy, not a copy per seat."""
+        return self.prices.copy()
+
+    def detect_highest_price_drop(self, old_prices: Optional[np.ndarray] = None):
+        """Highest-price drop between old_prices (default: the prices before the last reprice) and now."""
+        old = self.previous_prices if old_prices is None else old_prices
+        return highest_price_drop(self.ids, np.nan_to_num(old, nan=-np.inf), self.prices)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays (excluding the id index and object ids)."""
+        total = self.ids.nbytes + self.prices.nbytes + self.previous_prices.nbytes
+        total += sum(column.nbytes for column in self.columns.values())
+        if self.section_codes is not None:
+            total += self.section_codes.nbytes
+        return total
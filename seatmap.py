@@ -0,0 +1,144 @@
+"""
+Binary seat map files.
+
+A seat map is a versioned, checksummed file of fixed-size little-endian seat
+records. Loading memory-maps the file, so a venue is usable immediately and its
+pricing-factor columns are handed to the pricing code as zero-copy views.
+
+Layout (version 1):
+    header   64 bytes   magic, version, record size, record count, section table
+                        size, CRC32 of everything after the header, CRC32 of the header
+    sections            UTF-8 JSON list of section names, padded to 8 bytes
+    records             record_count * RECORD_DTYPE
+"""
+import json
+import os
+import struct
+import zlib
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from pricing import price_columns
+from seat_inventory import SeatInventory
+
+MAGIC = b"SEATMAP\0"
+VERSION = 1
+RECORD_DTYPE = np.dtype([
+    ("id", "<i8"),
+    ("view_quality", "<f8"),
+    ("section_popularity", "<f8"),
+    ("demand_factor", "<f8"),
+    ("accessibility", "<f8"),
+    ("distance", "<i4"),
+    ("section", "<i4"),
+])
+# magic, version, record size, record count, section table bytes, payload CRC32
+_HEADER = struct.Struct("<8sHHQQI")
+HEADER_SIZE = 64
+_CHECKSUM_BLOCK = 16 * 1024 * 1024
+
+
+def write_seat_map(path: str, seats: Union[SeatInventory, Iterable[Dict]]):
+    """
+    Write seats (a SeatInventory or the list-of-dicts format) to a seat map file.
+    Seat ids must be integers; seats without a section get section "".
+    """
+    inventory = seats if isinstance(seats, SeatInventory) else SeatInventory.from_dicts(seats)
+    if inventory.ids.dtype != np.int64:
+        raise ValueError("Seat map files require integer seat ids")
+
+    records = np.zeros(len(inventory), dtype=RECORD_DTYPE)
+    records["id"] = inventory.ids
+    for name, column in inventory.columns.items():
+        records[name] = column
+    section_names = inventory.section_names or [""]
+    if inventory.section_codes is not None:
+        records["section"] = inventory.section_codes
+
+    sections = json.dumps(section_names).encode("utf-8")
+    sections += b"\0" * (-len(sections) % 8)
+    payload_crc = zlib.crc32(records.tobytes(), zlib.crc32(sections))
+    fields = _HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, len(records), len(sections), payload_crc)
+    header = fields + struct.pack("<I", zlib.crc32(fields))
+    header += b"\0" * (HEADER_SIZE - len(header))
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        f.write(sections)
+        records.tofile(f)
+    os.replace(temp_path, path)
+
+
+class SeatMap:
+    """A memory-mapped seat map; see load_seat_map."""
+
+    def __init__(self, path: str, records: np.ndarray, section_names: List[str]):
+        self.path = path
+        self.records = records
+        self.section_names = section_names
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.records["id"]
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Pricing factor columns as read-only views into the mapped file."""
+        return {
+            name: self.records[name]
+            for name in ("view_quality", "distance", "section_popularity", "demand_factor", "accessibility")
+        }
+
+    def price(self, base_price: float = 100.0, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Price every seat straight from the mapped columns."""
+        return price_columns(self.columns, base_price, out=out)
+
+    def to_inventory(self) -> SeatInventory:
+        """Copy into a writable SeatInventory for repricing."""
+        sections = None
+        if self.section_names != [""]:
+            sections = np.asarray(self.section_names, dtype=object)[self.records["section"]]
+        return SeatInventory(self.ids.copy(), {name: column.copy() for name, column in self.columns.items()},
+                             sections)
+
+
+def load_seat_map(path: str, verify: bool = True) -> SeatMap:
+    """
+    Memory-map a seat map file.
+    verify: check the payload CRC32; this reads the whole file once, so pass False
+        for instant loads of files that are already trusted (the header is always checked)
+    Raises ValueError for files that are not seat maps, have an unsupported version or are corrupt.
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+        raise ValueError(f"{path} is not a seat map file")
+    fields = header[:_HEADER.size]
+    (header_crc,) = struct.unpack_from("<I", header, _HEADER.size)
+    if zlib.crc32(fields) != header_crc:
+        raise ValueError(f"{path} has a corrupt header")
+    _, version, record_size, count, sections_size, payload_crc = _HEADER.unpack(fields)
+    if version != VERSION:
+        raise ValueError(f"{path} uses seat map version {version}; this reader supports version {VERSION}")
+    if record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} has {record_size}-byte records, expected {RECORD_DTYPE.itemsize}")
+    expected_size = HEADER_SIZE + sections_size + count * record_size
+    if os.path.getsize(path) != expected_size:
+        raise ValueError(f"{path} is truncated or has trailing data")
+
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    if verify:
+        crc = 0
+        for start in range(HEADER_SIZE, len(raw), _CHECKSUM_BLOCK):
+            crc = zlib.crc32(raw[start:start + _CHECKSUM_BLOCK], crc)
+        if crc != payload_crc:
+            raise ValueError(f"{path} failed its checksum")
+
+    sections = bytes(raw[HEADER_SIZE:HEADER_SIZE + sections_size]).rstrip(b"\0")
+    records = raw[HEADER_SIZE + sections_size:].view(RECORD_DTYPE) if count else np.zeros(0, RECORD_DTYPE)
+    return SeatMap(path, records, json.loads(sections.decode("utf-8")))
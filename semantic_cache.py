@@ -0,0 +1,236 @@
+"""
+Semantic cache for LLM responses to near-duplicate inputs.
+
+The response cache (llm_cache.py) only matches prompts that are identical, so
+an idea worded slightly differently ("An app to book last-minute gym classes"
+vs. "app for booking last-minute gym classes") goes upstream again. Here each
+idea becomes a hashed bag of words and character trigrams, and the closest
+earlier idea in the same namespace is found by cosine similarity over an
+in-memory matrix. Callers put everything that must match exactly in the
+namespace (call label, compared company, a hash of the follow-up answers), so
+a short answer is never drowned out by a long idea.
+
+The representation is lexical: filler words, word order, case, punctuation and
+inflections do not matter, and synonyms ("gym" / "fitness") do not match. A
+long idea that differs in one important word still scores high, so a match
+must also pass a word check: every content word of either idea needs a
+counterpart in the other (the same word or an inflection of it). Every hit is
+appended to an audit log with both texts and their similarity, so false hits
+can be reviewed and the threshold tuned.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+# Words that say nothing about the idea itself
+_STOP_WORDS = frozenset(
+    "a an and app apps are as at be by for from has have in into is it its of on or that the their them these "
+    "this to which who with".split()
+)
+
+
+def _content_words(text: str) -> set:
+    return {word for word in _WORD.findall(text.lower()) if word not in _STOP_WORDS}
+
+
+def _same_word(a: str, b: str) -> bool:
+    """Equal, or inflections of one word: a shared stem of 4+ letters ("booking" / "book") or a short suffix."""
+    if a == b:
+        return True
+    prefix = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        prefix += 1
+    return prefix >= 4 or (prefix == min(len(a), len(b)) and abs(len(a) - len(b)) <= 3)
+
+
+def same_terms(a: str, b: str) -> bool:
+    """Whether every content word of a has a counterpart in b and vice versa."""
+    words_a, words_b = _content_words(a), _content_words(b)
+    return (all(any(_same_word(word, other) for other in words_b) for word in words_a - words_b)
+            and all(any(_same_word(word, other) for other in words_a) for word in words_b - words_a))
+
+
+def vectorize(text: str, dimensions: int = 1024) -> np.ndarray:
+    """
+    Unit-length float32 vector of text's words and their character trigrams, hashed into
+    dimensions buckets with a random sign (so collisions cancel out on average). Zeros if
+    text has no words.
+    """
+    words = [word for word in _WORD.findall(text.lower()) if word not in _STOP_WORDS]
+    counts: Dict[str, int] = {}
+    for word in words:
+        counts["w:" + word] = counts.get("w:" + word, 0) + 1
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            counts[padded[i:i + 3]] = counts.get(padded[i:i + 3], 0) + 1
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature, count in counts.items():
+        hashed = zlib.crc32(feature.encode("utf-8"))
+        # Sublinear term frequency, so a repeated word does not dominate
+        vector[hashed % dimensions] += (1.0 if hashed & 0x80000000 else -1.0) * (1.0 + math.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _payload_size(text: str, value: str) -> int:
+    return len(text.encode("utf-8")) + len(value.encode("utf-8"))
+
+
+class SemanticCache:
+    def __init__(self, enabled: bool = False, threshold: float = 0.88, max_entries: int = 2000,
+                 dimensions: int = 1024, audit_path: Optional[str] = None):
+        """
+        enabled: look up and store responses; a disabled cache costs nothing
+        threshold: cosine similarity at or above which a cached response is served
+        max_entries: responses indexed across all namespaces; the oldest is replaced first
+        dimensions: hashed vector size (index memory is max_entries * dimensions * 4 bytes)
+        audit_path: JSONL file that every hit is appended to (None disables the log)
+        """
+        self.enabled = enabled
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.dimensions = dimensions
+        self.audit_path = audit_path
+        self._lock = threading.Lock()
+        self._audit_lock = threading.Lock()
+        # Rows fill up to max_entries, then wrap around and overwrite the oldest
+        self._vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self._namespaces = np.zeros(0, dtype=np.int32)
+        self._entries: list = []
+        self._next = 0
+        self._namespace_ids: Dict[str, int] = {}
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._payload_bytes = 0
+        self._stats = {"lookups": 0, "hits": 0, "near_threshold_hits": 0, "word_mismatches": 0, "stores": 0,
+                       "evictions": 0}
+        if audit_path:
+            directory = os.path.dirname(audit_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "SemanticCache":
+        return cls(
+            enabled=os.getenv("SEMANTIC_CACHE", "").lower() in ("1", "true", "yes"),
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.88")),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "2000")),
+            dimensions=int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "1024")),
+            audit_path=os.getenv("SEMANTIC_CACHE_AUDIT_PATH", ".cache/semantic_cache_audit.jsonl") or None
+        )
+
+    def lookup(self, namespace: str, text: str) -> Optional[str]:
+        """The response cached for the most similar text in namespace, if it is similar enough."""
+        if not self.enabled:
+            return None
+        query = vectorize(text, self.dimensions)
+        with self._lock:
+            self._stats["lookups"] += 1
+            namespace_id = self._namespace_ids.get(namespace)
+            if namespace_id is None or not query.any():
+                return None
+            count = len(self._entries)
+            scores = self._vectors[:count] @ query
+            scores[self._namespaces[:count] != namespace_id] = -1.0
+            candidates = np.flatnonzero(scores >= self.threshold)
+            best = None
+            # Most similar first; a candidate with a word the other idea lacks is a different idea
+            for candidate in candidates[np.argsort(-scores[candidates])]:
+                if same_terms(text, self._entries[candidate][1]):
+                    best = int(candidate)
+                    break
+                self._stats["word_mismatches"] += 1
+            if best is None:
+                return None
+            similarity = float(scores[best])
+            _, matched, value = self._entries[best]
+            self._stats["hits"] += 1
+            if similarity < min(1.0, self.threshold + 0.05):
+                self._stats["near_threshold_hits"] += 1
+        self._audit(namespace, text, matched, similarity)
+        return value
+
+    def add(self, namespace: str, text: str, value: str):
+        """Index value as the response for text; the same text in the same namespace is replaced."""
+        if not self.enabled:
+            return
+        vector = vectorize(text, self.dimensions)
+        if not vector.any():
+            return
+        with self._lock:
+            namespace_id = self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+            slot = self._slots.get((namespace, text))
+            if slot is None:
+                slot = self._next
+                self._next = (self._next + 1) % self.max_entries
+                if slot == len(self._entries):
+                    self._grow()
+                    self._entries.append(None)
+                else:
+                    old_namespace, old_text, old_value = self._entries[slot]
+                    del self._slots[(old_namespace, old_text)]
+                    self._payload_bytes -= _payload_size(old_text, old_value)
+                    self._stats["evictions"] += 1
+                self._slots[(namespace, text)] = slot
+            else:
+                _, old_text, old_value = self._entries[slot]
+                self._payload_bytes -= _payload_size(old_text, old_value)
+            self._vectors[slot] = vector
+            self._namespaces[slot] = namespace_id
+            self._entries[slot] = (namespace, text, value)
+            self._payload_bytes += _payload_size(text, value)
+            self._stats["stores"] += 1
+
+    def _grow(self):
+        """Make room for one more row, doubling the matrix (up to max_entries) when it is full."""
+        capacity = len(self._vectors)
+        if len(self._entries) < capacity:
+            return
+        new_capacity = min(self.max_entries, max(16, capacity * 2))
+        vectors = np.zeros((new_capacity, self.dimensions), dtype=np.float32)
+        vectors[:capacity] = self._vectors
+        namespaces = np.zeros(new_capacity, dtype=np.int32)
+        namespaces[:capacity] = self._namespaces
+        self._vectors, self._namespaces = vectors, namespaces
+
+    def _audit(self, namespace: str, query: str, matched: str, similarity: float):
+        if not self.audit_path:
+            return
+        line = json.dumps({"time": round(time.time(), 3), "namespace": namespace, "similarity": round(similarity, 4),
+                           "query": query, "matched": matched}, ensure_ascii=False)
+        try:
+            with self._audit_lock, open(self.audit_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            # The audit log must never fail a call
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+            self._namespaces = np.zeros(0, dtype=np.int32)
+            self._entries = []
+            self._next = 0
+            self._namespace_ids.clear()
+            self._slots.clear()
+            self._payload_bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Lookup counts and hit rate, entries, and memory of the index and the cached texts (bytes)."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+            stats["entries"] = len(self._entries)
+            stats["index_bytes"] = self._vectors.nbytes + self._namespaces.nbytes
+            stats["payload_bytes"] = self._payload_bytes
+            return stats
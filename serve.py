@@ -0,0 +1,236 @@
+"""
+Multi-process serving: several Streamlit app workers behind a sticky load balancer.
+
+    python serve.py --workers 4 --port 8501
+
+One Streamlit process runs every session's script on one interpreter, so it is
+the scaling ceiling. serve.py starts N `streamlit run app.py` workers on local
+ports and listens on --port itself. A session's state lives in the memory of
+the worker that serves its websocket, so the balancer pins each browser to a
+worker with a cookie set on its first response; new browsers go to the worker
+with the fewest open connections. A worker that exits is restarted and its
+browsers fail over to another worker (they get a fresh session).
+
+Workers share what must agree across processes through SQLite files in WAL
+mode: the LLM response cache (LLM_CACHE_PATH), job records and results and the
+rate limit budget (SHARED_STATE_PATH, defaulted here to
+.cache/shared_state.sqlite), and generated reports (REPORT_CACHE_DIR).
+"""
+import argparse
+import asyncio
+import os
+import re
+import secrets
+import signal
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+COOKIE = "serve_worker"
+
+_COOKIE_PATTERN = re.compile(rb"^cookie:.*?\b" + COOKIE.encode() + rb"=(\d+)", re.IGNORECASE | re.MULTILINE)
+_HEAD_LIMIT = 64 * 1024
+
+
+async def _healthy(host: str, port: int, timeout: float = 2.0) -> bool:
+    """Whether the Streamlit server on port answers its health check."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    try:
+        writer.write(f"GET /_stcore/health HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        status = await asyncio.wait_for(reader.readline(), timeout)
+        return b" 200 " in status
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        writer.close()
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        writer.close()
+
+
+class Worker:
+    """One supervised `streamlit run` process."""
+
+    def __init__(self, index: int, port: int, command: List[str], env: dict):
+        self.index = index
+        self.port = port
+        self.command = command
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.healthy = False
+        self.connections = 0
+        self.restarts = 0
+
+    def start(self):
+        self.healthy = False
+        self.process = subprocess.Popen(self.command, env=self.env, stdin=subprocess.DEVNULL)
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class StickyBalancer:
+    def __init__(self, workers: List[Worker], host: str = "127.0.0.1"):
+        """
+        workers: backends, addressed by their index in the cookie
+        host: address the workers listen on
+        """
+        self.workers = workers
+        self.host = host
+
+    def _pinned(self, head: bytes) -> Optional[int]:
+        match = _COOKIE_PATTERN.search(head)
+        if match is None:
+            return None
+        index = int(match.group(1))
+        return index if index < len(self.workers) else None
+
+    def _candidates(self, pinned: Optional[int]) -> List[Worker]:
+        """Pinned worker first if it is up, then the others by open connections."""
+        healthy = sorted((worker for worker in self.workers if worker.healthy), key=lambda worker: worker.connections)
+        if pinned is not None and self.workers[pinned].healthy:
+            healthy.remove(self.workers[pinned])
+            healthy.insert(0, self.workers[pinned])
+        return healthy
+
+    async def _connect(self, pinned: Optional[int]) -> Optional[Tuple[Worker, asyncio.StreamReader, asyncio.StreamWriter]]:
+        for worker in self._candidates(pinned):
+            # Counted before connecting, so clients arriving together spread over the workers
+            worker.connections += 1
+            try:
+                reader, writer = await asyncio.open_connection(self.host, worker.port)
+            except OSError:
+                # Down between health checks; the supervisor restarts it
+                worker.connections -= 1
+                worker.healthy = False
+                continue
+            return worker, reader, writer
+        return None
+
+    async def handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        """Route one client connection (every request on it, or the websocket it upgrades to)."""
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+        pinned = self._pinned(head)
+        connection = await self._connect(pinned)
+        if connection is None:
+            client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            client_writer.close()
+            return
+        worker, upstream_reader, upstream_writer = connection
+        try:
+            upstream_writer.write(head)
+            if worker.index != pinned:
+                # First request from this browser (or its worker went away): pin it with the response
+                response_head = await upstream_reader.readuntil(b"\r\n\r\n")
+                cookie = f"Set-Cookie: {COOKIE}={worker.index}; Path=/; HttpOnly; SameSite=Lax\r\n".encode()
+                client_writer.write(response_head[:-2] + cookie + b"\r\n")
+            await asyncio.gather(_pipe(client_reader, upstream_writer), _pipe(upstream_reader, client_writer))
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            upstream_writer.close()
+            client_writer.close()
+        finally:
+            worker.connections -= 1
+
+
+async def supervise(workers: List[Worker], host: str, interval: float = 2.0):
+    """Restart workers that exited and track which ones pass their health check."""
+    while True:
+        for worker in workers:
+            if worker.process.poll() is not None:
+                print(f"worker {worker.index} exited with {worker.process.returncode}; restarting", file=sys.stderr)
+                worker.restarts += 1
+                worker.start()
+            worker.healthy = await _healthy(host, worker.port)
+        await asyncio.sleep(interval)
+
+
+def worker_command(app: str, port: int, host: str) -> List[str]:
+    return [sys.executable, "-m", "streamlit", "run", app,
+            "--server.headless", "true", "--server.address", host, "--server.port", str(port),
+            "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"]
+
+
+def worker_env(index: int) -> dict:
+    env = dict(os.environ)
+    env.setdefault("SHARED_STATE_PATH", os.path.join(".cache", "shared_state.sqlite"))
+    if env.get("METRICS_PORT"):
+        # One scrape target per worker
+        env["METRICS_PORT"] = str(int(env["METRICS_PORT"]) + index)
+    return env
+
+
+async def serve(workers: List[Worker], host: str, port: int, worker_host: str, startup_timeout: float = 60.0):
+    for worker in workers:
+        worker.start()
+    deadline = time.monotonic() + startup_timeout
+    while not all(worker.healthy for worker in workers) and time.monotonic() < deadline:
+        for worker in workers:
+            worker.healthy = worker.healthy or await _healthy(worker_host, worker.port)
+        await asyncio.sleep(0.25)
+    up = sum(worker.healthy for worker in workers)
+    if not up:
+        raise RuntimeError("no worker passed its health check")
+    balancer = StickyBalancer(workers, worker_host)
+    server = await asyncio.start_server(balancer.handle, host, port, limit=_HEAD_LIMIT)
+    print(f"serving on http://{host}:{port} with {up} of {len(workers)} workers", file=sys.stderr, flush=True)
+    async with server:
+        await supervise(workers, worker_host)
+
+
+def _interrupt(signum, frame):
+    # SIGTERM takes the same path as Ctrl+C, so the workers are stopped either way
+    raise KeyboardInterrupt()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run several app workers behind a sticky load balancer.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1))),
+                        help="App worker processes (default: one per CPU)")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the balancer listens on")
+    parser.add_argument("--port", type=int, default=8501, help="Port the balancer listens on")
+    parser.add_argument("--worker-port", type=int, default=8601, help="Port of the first worker; the rest follow")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+    args = parser.parse_args(argv)
+
+    # One cookie secret for every worker, so a browser that fails over keeps a valid XSRF cookie
+    os.environ.setdefault("STREAMLIT_SERVER_COOKIE_SECRET", secrets.token_hex(32))
+    worker_host = "127.0.0.1"
+    workers = [Worker(i, args.worker_port + i, worker_command(args.app, args.worker_port + i, worker_host),
+                      worker_env(i)) for i in range(max(1, args.workers))]
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        asyncio.run(serve(workers, args.host, args.port, worker_host))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
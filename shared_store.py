@@ -0,0 +1,68 @@
+"""
+State shared by every app worker process on one host.
+
+A SQLite file in WAL mode: readers never block the single writer, and short
+BEGIN IMMEDIATE transactions serialize read-modify-write updates across
+processes. Job records and rate limit budgets live here when
+SHARED_STATE_PATH is set (serve.py sets it for its workers); LLM responses
+are shared through the response cache's own SQLite file.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class SharedStore:
+    def __init__(self, path: str, busy_timeout: float = 10.0):
+        """
+        path: SQLite file; every process that opens the same path shares the state
+        busy_timeout: seconds to wait for another process's write transaction before failing
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedStore"]:
+        """The store at SHARED_STATE_PATH, or None when state is per process."""
+        path = os.getenv("SHARED_STATE_PATH", "")
+        if not path:
+            return None
+        return cls(path, busy_timeout=float(os.getenv("SHARED_STATE_BUSY_TIMEOUT", "10")))
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (SQLite connections must not be shared between threads)."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            configure_shared_connection(db, self.busy_timeout)
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction that takes the lock up front, so read-modify-write sequences are atomic."""
+        db = self.connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        return self.connection().execute(sql, parameters)
+
+
+def configure_shared_connection(db: sqlite3.Connection, busy_timeout: float = 10.0):
+    """WAL mode and a busy timeout, for SQLite files that several processes write to."""
+    db.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+    db.execute("PRAGMA journal_mode = WAL")
+    # WAL keeps the file consistent on a crash; NORMAL only risks the last commits on power loss
+    db.execute("PRAGMA synchronous = NORMAL")
@@ -0,0 +1,46 @@
+"""
+In-flight request coalescing.
+
+Concurrent calls with the same key share one execution: the first caller
+starts it, later callers wait for the same result. Nothing is kept once the
+call finishes; completed results are the response cache's job.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Tuple[int, Hashable], "asyncio.Future"] = {}
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await call() unless an identical call is already running, in which case await that one.
+        The shared call runs as its own task, so a caller that is cancelled (or times out)
+        does not cancel it for the others.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        self._stats["calls"] += 1
+        task = self._calls.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[flight_key] = task
+            task.add_done_callback(lambda done: self._finish(flight_key, done))
+        else:
+            self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, flight_key: Tuple[int, Hashable], task: "asyncio.Future"):
+        if self._calls.get(flight_key) is task:
+            del self._calls[flight_key]
+        if not task.cancelled():
+            # Mark the error as retrieved even if every caller gave up waiting
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Calls made, calls that joined an in-flight one, and calls in flight right now."""
+        return dict(self._stats, in_flight=len(self._calls))
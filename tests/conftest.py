@@ -0,0 +1,36 @@
+"""
+Shared test setup: every test talks to one local mock OpenRouter server.
+
+logic builds its LLM client from the environment at import, so the endpoint is
+set here, before any test module imports it. Response caching, retries and the
+circuit breaker are off so each call reaches the mock server exactly once.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_openrouter import base_url, start_mock_server  # noqa: E402
+
+_server = start_mock_server(latency=0.2)
+os.environ["OPENROUTER_BASE_URL"] = base_url(_server)
+os.environ["OPENROUTER_API_KEY"] = "mock-key"
+os.environ["LLM_CACHE_ENABLED"] = "0"
+# Failures should surface at once and not trip a breaker shared with later tests
+os.environ["LLM_RETRIES"] = "0"
+os.environ["LLM_BREAKER_THRESHOLD"] = "0"
+os.environ.pop("SEMANTIC_CACHE", None)
+
+
+@pytest.fixture
+def mock_server():
+    """The mock server, with its request count reset and default behaviour restored afterwards."""
+    _server.request_count = 0
+    yield _server
+    _server.latency = 0.2
+    _server.error_rate = 0.0
+    _server.error_status = 503
+    _server.completion_words = 50
+    _server.structured_output = True
@@ -0,0 +1,47 @@
+import json
+from collections import Counter
+
+import pytest
+
+import logic
+from batch import load_checkpoint, run_batch
+from logic import FRAMEWORKS, ProductDiscoveryAnalyzer
+
+IDEAS = [{"id": f"idea-{i}", "idea": f"Product idea number {i}", "answers": {"q0": f"Segment {i}"}}
+         for i in range(10)]
+
+
+def _interrupted(ideas, after):
+    """The input stream, failing (like a lost connection to the export) once `after` ideas have been read."""
+    for number, idea in enumerate(ideas):
+        if number == after:
+            raise OSError("input stream lost")
+        yield idea
+
+
+def _records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_after_interruption_skips_finished_ideas(mock_server, tmp_path):
+    output = str(tmp_path / "results.jsonl")
+    analyzer = ProductDiscoveryAnalyzer()
+    with pytest.raises(OSError):
+        logic.client.run(run_batch(analyzer, _interrupted(IDEAS, 6), output, concurrency=2, timeout=5,
+                                   progress_every=0))
+    # The ideas in flight at the interruption were dropped; a crash then cut the next record off mid-line
+    finished = load_checkpoint(output)
+    assert 0 < len(finished) < 6
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"id": "idea-9", "status": "ok", "idea": "Prod')
+
+    mock_server.request_count = 0
+    totals = logic.client.run(run_batch(analyzer, iter(IDEAS), output, concurrency=2, timeout=5, progress_every=0))
+    assert totals["skipped"] == len(finished)
+    assert totals["processed"] == totals["ok"] == len(IDEAS) - len(finished)
+    # Only the unfinished ideas reached upstream, and every idea has exactly one record
+    assert mock_server.request_count == (len(IDEAS) - len(finished)) * len(FRAMEWORKS)
+    records = _records(output)
+    assert Counter(record["id"] for record in records) == Counter(idea["id"] for idea in IDEAS)
+    assert all(record["status"] == "ok" for record in records)
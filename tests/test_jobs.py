@@ -0,0 +1,151 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from jobs import CANCELLED, DONE, FAILED, PENDING, RUNNING, JobQueue
+from shared_store import SharedStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedStore(str(tmp_path / "shared_state.sqlite"), busy_timeout=2.0)
+
+
+def _finish(queue, job_id, timeout=5.0):
+    job = queue.wait(job_id, timeout)
+    assert job is not None and job.done
+    return job
+
+
+def test_failed_status_save_fails_the_job(store, monkeypatch):
+    queue = JobQueue(workers=1, store=store)
+    execute = store.execute
+
+    def locked_updates(sql, parameters=()):
+        if sql.startswith("UPDATE jobs"):
+            raise sqlite3.OperationalError("database is locked")
+        return execute(sql, parameters)
+
+    monkeypatch.setattr(store, "execute", locked_updates)
+    job = _finish(queue, queue.submit(lambda job: "never runs", key="locked"))
+    assert job.status == FAILED
+    assert "database is locked" in job.error
+    monkeypatch.setattr(store, "execute", execute)
+    # A failed job is not handed to the next identical submission
+    retry = _finish(queue, queue.submit(lambda job: "ran", key="locked"))
+    assert retry.id != job.id
+    assert (retry.status, retry.result) == (DONE, "ran")
+    # The failure was written once the store accepted writes again, so no process waits on it
+    assert store.execute("SELECT status FROM jobs WHERE id = ?", (job.id,)).fetchone() == (FAILED,)
+
+
+def test_finished_job_is_shared_between_queues(store):
+    first, second = JobQueue(workers=1, store=store), JobQueue(workers=1, store=store)
+    job_id = first.submit(lambda job: {"answer": 42}, key="shared")
+    _finish(first, job_id)
+    assert second.submit(lambda job: {"answer": 0}, key="shared") == job_id
+    shared = second.get(job_id)
+    assert (shared.status, shared.result) == (DONE, {"answer": 42})
+
+
+def test_busy_store_does_not_block_polling(store):
+    queue = JobQueue(workers=1, store=store)
+    known = queue.submit(lambda job: "done", key="known")
+    _finish(queue, known)
+    # Another process holds the write lock, so the next submit waits for the busy timeout
+    blocker = sqlite3.connect(store.path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    submitter = threading.Thread(target=lambda: queue.submit(lambda job: None, key="waits"))
+    submitter.start()
+    try:
+        time.sleep(0.2)
+        start = time.perf_counter()
+        assert queue.get(known).status == DONE
+        assert queue.stats()[DONE] == 1
+        assert time.perf_counter() - start < 0.5
+    finally:
+        blocker.execute("ROLLBACK")
+        submitter.join()
+
+
+def _blocking_job(started, release):
+    def run(job):
+        started.set()
+        while not release.wait(0.01):
+            job.check_cancelled()
+        return "finished"
+    return run
+
+
+def test_identical_submissions_share_one_run():
+    queue = JobQueue(workers=2)
+    runs = []
+    release = threading.Event()
+
+    def run(job):
+        runs.append(job.id)
+        release.wait(5)
+        return len(runs)
+
+    first = queue.submit(run, key="same", subscriber="a")
+    assert queue.submit(run, key="same", subscriber="b") == first
+    assert queue.submit(run, key="other", subscriber="a") != first
+    release.set()
+    assert _finish(queue, first).result is not None
+    # A done job is reused as well
+    assert queue.submit(run, key="same", subscriber="c") == first
+    assert len(runs) == 2
+
+
+def test_shared_job_is_cancelled_by_its_last_subscriber():
+    queue = JobQueue(workers=1)
+    started, release = threading.Event(), threading.Event()
+    job_id = queue.submit(_blocking_job(started, release), key="shared", subscriber="a")
+    assert queue.submit(_blocking_job(started, release), key="shared", subscriber="b") == job_id
+    assert started.wait(5)
+    # One session leaving does not stop the job for the other
+    assert not queue.cancel(job_id, subscriber="a")
+    assert queue.get(job_id).status == RUNNING
+    assert queue.cancel(job_id, subscriber="b")
+    assert _finish(queue, job_id).status == CANCELLED
+    # The next identical submission starts a fresh run
+    release.set()
+    retry = queue.submit(lambda job: "again", key="shared", subscriber="a")
+    assert retry != job_id
+    assert _finish(queue, retry).result == "again"
+
+
+def test_pending_only_cancel_leaves_a_running_job():
+    queue = JobQueue(workers=1)
+    started, release = threading.Event(), threading.Event()
+    running = queue.submit(_blocking_job(started, release), key="running", subscriber="a")
+    assert started.wait(5)
+    queued = queue.submit(lambda job: "queued", key="queued", subscriber="a")
+    assert queue.get(queued).status == PENDING
+    assert not queue.cancel(running, subscriber="a", pending_only=True)
+    assert queue.cancel(queued, subscriber="a", pending_only=True)
+    assert queue.get(queued).status == CANCELLED
+    release.set()
+    assert _finish(queue, running).status == DONE
+
+
+def test_finished_jobs_are_dropped_after_retention():
+    queue = JobQueue(workers=1, retention=0.2, max_jobs=2)
+    first = queue.submit(lambda job: 1, key="first")
+    _finish(queue, first)
+    # Still retained: an identical submission reuses the result
+    assert queue.submit(lambda job: 2, key="first") == first
+    time.sleep(0.3)
+    rerun = queue.submit(lambda job: 2, key="first")
+    assert rerun != first
+    assert queue.get(first) is None
+    assert _finish(queue, rerun).result == 2
+    # Beyond max_jobs the oldest finished jobs go first
+    later = [queue.submit(lambda job: n, key=n) for n in range(3)]
+    for job_id in later:
+        _finish(queue, job_id)
+    queue.submit(lambda job: None)
+    assert queue.get(rerun) is None
+    assert [queue.get(job_id) is not None for job_id in later] == [False, True, True]
@@ -0,0 +1,209 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import logic
+from llm_cache import ResponseCache
+from logic import FRAMEWORKS, ProductDiscoveryAnalyzer
+
+IDEA = "A mobile app that helps busy professionals book last-minute fitness classes"
+
+
+def test_concurrent_analysis_returns_every_framework(mock_server):
+    results = ProductDiscoveryAnalyzer().analyze_all_frameworks(IDEA, {"q0": "Office workers"}, concurrent=True,
+                                                                timeout=5)
+    assert set(results) == set(FRAMEWORKS)
+    for key, (_, name) in FRAMEWORKS.items():
+        assert results[key]["framework"] == name
+        assert results[key]["analysis"].startswith("Mock analysis")
+    assert mock_server.request_count == len(FRAMEWORKS)
+
+
+def test_concurrent_calls_overlap(mock_server):
+    mock_server.latency = 0.5
+    start = time.perf_counter()
+    ProductDiscoveryAnalyzer().analyze_all_frameworks(IDEA, {"q0": "Overlap check"}, concurrent=True,
+                                                      case_study_company="Uber", timeout=5)
+    elapsed = time.perf_counter() - start
+    # Five calls one after another would take at least 2.5s
+    assert elapsed < 2 * mock_server.latency
+    assert mock_server.request_count == len(FRAMEWORKS) + 1
+
+
+def test_case_study_result(mock_server):
+    results = ProductDiscoveryAnalyzer().analyze_all_frameworks(IDEA, {"q0": "Case study"}, concurrent=True,
+                                                                case_study_company="Figma", timeout=5)
+    assert results["case_study"]["company"] == "Figma"
+    assert results["case_study"]["analysis"].startswith("Mock analysis")
+
+
+def test_unparseable_combined_response_falls_back_to_separate_calls(mock_server, monkeypatch):
+    monkeypatch.setattr(logic, "response_cache", ResponseCache(max_entries=16))
+    # Plain text for a JSON request, like a model that ignores response_format
+    mock_server.structured_output = False
+    analyzer = ProductDiscoveryAnalyzer()
+    results = analyzer.analyze_all_frameworks(IDEA, {}, combined=True, timeout=5)
+    assert set(results) == set(FRAMEWORKS)
+    assert all(result["analysis"].startswith("Mock analysis") for result in results.values())
+    assert mock_server.request_count == 1 + len(FRAMEWORKS)
+    # Only the per-framework responses were cached, so just the combined call is made again
+    assert analyzer.analyze_all_frameworks(IDEA, {}, combined=True, timeout=5) == results
+    assert mock_server.request_count == 2 + len(FRAMEWORKS)
+
+
+@pytest.mark.parametrize("content", [
+    "Mock analysis: not JSON at all",
+    '```json\n{"jtbd": "a", "value_proposition": "b", "opportunity_solution": "c"}\n```',
+    '{"jtbd": "a", "value_proposition": "b", "opportunity_solution": "c", "four_fit": "d',
+    '{"jtbd": "a", "value_proposition": "b", "opportunity_solution": "c", "four_fit": ""}',
+    '["a", "b", "c", "d"]',
+], ids=["text", "fenced-partial", "truncated", "empty-framework", "not-an-object"])
+def test_unusable_combined_response_is_rejected(content):
+    assert ProductDiscoveryAnalyzer.parse_combined_response(content) is None
+
+
+def test_fenced_combined_response_is_accepted():
+    content = '```json\n{"jtbd": "a", "value_proposition": "b", "opportunity_solution": "c", "four_fit": "d"}\n```'
+    assert ProductDiscoveryAnalyzer.parse_combined_response(content)["four_fit"] == "d"
+
+
+def test_failures_are_not_cached(mock_server, monkeypatch):
+    monkeypatch.setattr(logic, "response_cache", ResponseCache(max_entries=16))
+    analyzer = ProductDiscoveryAnalyzer()
+    mock_server.error_rate, mock_server.error_status = 1.0, 400
+    assert analyzer._call_gpt("Failure caching check", label="jtbd").startswith("Error in analysis")
+    mock_server.error_rate = 0.0
+    success = analyzer._call_gpt("Failure caching check", label="jtbd")
+    assert success.startswith("Mock analysis")
+    # The success was cached; the failure before it was not
+    assert analyzer._call_gpt("Failure caching check", label="jtbd") == success
+    assert mock_server.request_count == 2
+    assert logic.response_cache.stats()["stores"] == 1
+
+
+def test_empty_completion_is_an_error(mock_server, monkeypatch):
+    monkeypatch.setattr(logic, "response_cache", ResponseCache(max_entries=16))
+
+    async def empty_completion(**kwargs):
+        choice = SimpleNamespace(message=SimpleNamespace(content=None), finish_reason="stop")
+        return SimpleNamespace(choices=[choice], usage=None)
+
+    monkeypatch.setattr(logic.client, "create_chat_completion", empty_completion)
+    result = ProductDiscoveryAnalyzer()._call_gpt("Empty completion check", label="jtbd")
+    assert result.startswith("Error in analysis")
+    assert logic.response_cache.stats()["stores"] == 0
+
+
+def test_closing_unread_comparisons_cancels_them(mock_server):
+    mock_server.latency = 0.5
+    comparisons = ProductDiscoveryAnalyzer().analyze_case_studies(IDEA, ["Figma", "Notion"], {}, max_concurrency=1,
+                                                                  timeout=5)
+    time.sleep(0.1)
+    comparisons.close()
+    time.sleep(1.0)
+    # The comparison waiting for a slot never starts
+    assert mock_server.request_count == 1
+
+
+def test_failed_calls_map_to_error_message(mock_server):
+    # 400 is not retried, so every call fails once and at once
+    mock_server.error_rate = 1.0
+    mock_server.error_status = 400
+    results = ProductDiscoveryAnalyzer().analyze_all_frameworks(IDEA, {"q0": "Errors"}, concurrent=True, timeout=5)
+    assert set(results) == set(FRAMEWORKS)
+    for result in results.values():
+        assert result["analysis"].startswith("Error in analysis: ")
+
+
+def test_timeout_maps_to_error_message(mock_server):
+    mock_server.latency = 2.0
+    results = ProductDiscoveryAnalyzer().analyze_all_frameworks(IDEA, {"q0": "Timeouts"}, concurrent=True,
+                                                                timeout=0.3)
+    for result in results.values():
+        assert result["analysis"].startswith("Error in analysis: ")
+
+
+@pytest.fixture
+def small_budget():
+    """A learned jtbd budget of 256 tokens, below the label's 1000-token cap."""
+    logic.token_ledger.reset("jtbd")
+    for _ in range(logic.token_ledger.min_samples):
+        logic.token_ledger.record("jtbd", 100, 100)
+    assert logic.ProductDiscoveryAnalyzer()._max_tokens("jtbd") == 256
+    yield
+    logic.token_ledger.reset("jtbd")
+
+
+def test_completion_truncated_by_budget_is_requested_at_the_cap(mock_server, small_budget):
+    mock_server.completion_words = 400
+    content = ProductDiscoveryAnalyzer()._call_gpt("Budget check", label="jtbd")
+    assert content.endswith("insight-399")
+    assert mock_server.request_count == 2
+
+
+def test_stream_truncated_by_budget_is_continued(mock_server, small_budget):
+    mock_server.completion_words = 400
+    analyzer = ProductDiscoveryAnalyzer()
+
+    async def collect():
+        return "".join([part async for part in analyzer._stream_gpt_async("Stream budget check", label="jtbd")])
+
+    content = logic.client.run(collect())
+    # The first 256 mock words, then the continuation's own header and words
+    _, first, continuation = content.split("Mock analysis")
+    assert first.endswith("insight-254")
+    assert continuation.endswith("insight-399")
+    assert mock_server.request_count == 2
+
+
+def test_cache_key_does_not_depend_on_the_learned_budget(mock_server, monkeypatch):
+    monkeypatch.setattr(logic, "response_cache", ResponseCache(max_entries=16))
+    logic.token_ledger.reset("jtbd")
+    analyzer = ProductDiscoveryAnalyzer()
+    first = analyzer._call_gpt("Cache key check", label="jtbd")
+    for _ in range(logic.token_ledger.min_samples):
+        logic.token_ledger.record("jtbd", 100, 100)
+    try:
+        assert analyzer._call_gpt("Cache key check", label="jtbd") == first
+    finally:
+        logic.token_ledger.reset("jtbd")
+    assert mock_server.request_count == 1
+
+
+def _prefetched(analyzer):
+    return analyzer.analyze_all_frameworks(IDEA, {}, concurrent=True, timeout=5)
+
+
+def test_refine_appends_what_the_answers_change(mock_server):
+    analyzer = ProductDiscoveryAnalyzer()
+    prefetched = _prefetched(analyzer)
+    mock_server.request_count = 0
+    refined = analyzer.refine_analyses(IDEA, {"q0": "Nurses on rotating hospital shifts"}, prefetched, timeout=5)
+    assert set(refined) == set(FRAMEWORKS)
+    for key, result in refined.items():
+        assert result["framework"] == prefetched[key]["framework"]
+        assert result["analysis"].startswith(prefetched[key]["analysis"])
+        assert "#### What your answers change\nMock analysis" in result["analysis"]
+    assert mock_server.request_count == len(FRAMEWORKS)
+
+
+def test_refine_without_answers_keeps_the_prefetch(mock_server):
+    analyzer = ProductDiscoveryAnalyzer()
+    prefetched = _prefetched(analyzer)
+    mock_server.request_count = 0
+    assert analyzer.refine_analyses(IDEA, {"q0": "  ", "q1": ""}, prefetched, timeout=5) == prefetched
+    assert mock_server.request_count == 0
+
+
+def test_failed_refine_falls_back_to_a_full_analysis(mock_server):
+    analyzer = ProductDiscoveryAnalyzer()
+    prefetched = _prefetched(analyzer)
+    mock_server.request_count = 0
+    mock_server.error_rate = 1.0
+    mock_server.error_status = 400
+    refined = analyzer.refine_analyses(IDEA, {"q0": "Nurses on rotating hospital shifts"}, prefetched, timeout=5)
+    # One refine call and one full analysis per framework; the full analysis fails too here
+    assert mock_server.request_count == 2 * len(FRAMEWORKS)
+    for result in refined.values():
+        assert result["analysis"].startswith("Error in analysis: ")
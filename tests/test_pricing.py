@@ -0,0 +1,158 @@
+import itertools
+import random
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+import pricing
+from logic import ProductDiscoveryAnalyzer
+from price_tracker import PriceDropTracker
+from seatmap import HEADER_SIZE, load_seat_map, write_seat_map
+
+FACTORS = list(pricing.PRICING_FACTORS)
+
+
+def _random_seats(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [{
+        "view_quality": rng.choice([0.8, 0.9, 1.0, 1.1, 1.2, rng.uniform(0.5, 1.5)]),
+        "distance": rng.randint(0, 40),
+        "section_popularity": rng.choice([1.0, 1.15, 1.3, rng.uniform(0.8, 1.5)]),
+        "demand_factor": rng.choice([1.0, 1.25, 1.5, rng.uniform(0.5, 2.0)]),
+        "accessibility": rng.choice([0.9, 1.0, 1.1, rng.uniform(0.8, 1.2)]),
+    } for _ in range(count)]
+
+
+def _columns(seats: list, names) -> dict:
+    return {name: np.array([seat[name] for seat in seats]) for name in names}
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return ProductDiscoveryAnalyzer()
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("base_price", [100.0, 37.5, 1.005, 249.99])
+def test_vectorized_prices_match_scalar(analyzer, seed, base_price):
+    seats = _random_seats(500, seed)
+    expected = [analyzer.calculate_seat_price(base_price, **seat) for seat in seats]
+    prices = analyzer.price_seat_columns(_columns(seats, FACTORS), base_price)
+    # Bit for bit, including round(price, 2) on half cents
+    assert prices.tolist() == expected
+
+
+@pytest.mark.parametrize("missing", [combo for size in range(1, len(FACTORS))
+                                     for combo in itertools.combinations(FACTORS, size)])
+def test_missing_factors_use_price_seats_defaults(analyzer, missing):
+    seats = [{name: value for name, value in seat.items() if name not in missing}
+             for seat in _random_seats(200, seed=len(missing))]
+    expected = [seat["price"] for seat in analyzer.price_seats(seats)]
+    present = [name for name in FACTORS if name not in missing]
+    assert analyzer.price_seat_columns(_columns(seats, present)).tolist() == expected
+
+
+def test_distance_multiplier_is_clamped_at_one(analyzer):
+    distances = np.arange(0, 61)
+    prices = analyzer.price_seat_columns({"distance": distances})
+    expected = [analyzer.calculate_seat_price(100.0, 1.0, int(distance), 1.0, 1.0, 1.0) for distance in distances]
+    assert prices.tolist() == expected
+    # From row 10 on, 1.5 - distance * 0.05 is at most 1.0, so every seat costs the base price
+    assert (prices[distances >= 10] == 100.0).all()
+    assert prices[0] == 150.0
+
+
+def test_structured_array_columns(analyzer):
+    seats = _random_seats(100, seed=7)
+    dtype = [(name, np.float64) for name in FACTORS]
+    records = np.array([tuple(seat[name] for name in FACTORS) for seat in seats], dtype=dtype)
+    expected = [seat["price"] for seat in analyzer.price_seats(seats)]
+    assert analyzer.price_seat_columns(records).tolist() == expected
+
+
+def test_mismatched_column_lengths_are_rejected():
+    with pytest.raises(ValueError):
+        pricing.price_columns({"distance": np.arange(3), "view_quality": np.ones(4)})
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_tracker_matches_full_rescan(analyzer, seed):
+    rng = random.Random(seed)
+
+    def price():
+        # Few distinct prices, so ties between seats are common
+        return rng.choice([50.0, 75.0, 100.0, 100.0, 150.0, round(rng.uniform(0, 200), 2)])
+
+    prices = {f"s{i}": price() for i in range(rng.randint(1, 30))}
+    tracker = PriceDropTracker(prices)
+    next_id = len(prices)
+    for _ in range(200):
+        changes = {}
+        for _ in range(rng.randint(1, 5)):
+            action = rng.random()
+            if action < 0.15 and prices:
+                changes[rng.choice(list(prices))] = None
+            elif action < 0.3:
+                changes[f"s{next_id}"] = price()
+                next_id += 1
+            elif prices:
+                changes[rng.choice(list(prices))] = price()
+        before = [{"id": seat_id, "price": value} for seat_id, value in prices.items()]
+        for seat_id, value in changes.items():
+            if value is None:
+                prices.pop(seat_id, None)
+            else:
+                prices[seat_id] = value
+        after = [{"id": seat_id, "price": value} for seat_id, value in prices.items()]
+        drop = tracker.update(changes)
+        expected = analyzer.detect_highest_price_drop(before, after)
+        assert ((drop.seat_id, drop.amount) if drop else (None, 0)) == expected
+        assert len(tracker) == len(prices)
+
+
+@pytest.fixture
+def seat_map_bytes(tmp_path):
+    seats = [dict(seat, id=i, section=f"S{i % 3}") for i, seat in enumerate(_random_seats(50, seed=11))]
+    path = tmp_path / "venue.seatmap"
+    write_seat_map(str(path), seats)
+    assert len(load_seat_map(str(path))) == 50
+    return path, path.read_bytes()
+
+
+def test_seat_map_with_a_corrupt_record_fails_its_checksum(seat_map_bytes):
+    path, data = seat_map_bytes
+    corrupt = bytearray(data)
+    corrupt[-20] ^= 0xFF
+    path.write_bytes(bytes(corrupt))
+    with pytest.raises(ValueError, match="checksum"):
+        load_seat_map(str(path))
+    # Trusted loads skip the payload check
+    assert len(load_seat_map(str(path), verify=False)) == 50
+
+
+def test_seat_map_of_an_unknown_version_is_rejected(seat_map_bytes):
+    path, data = seat_map_bytes
+    # A well-formed header (valid CRC) from a newer writer: 32 bytes of fields, then their CRC32
+    fields = bytearray(data[:32])
+    struct.pack_into("<H", fields, 8, 2)
+    header = bytes(fields) + struct.pack("<I", zlib.crc32(bytes(fields))) + data[36:HEADER_SIZE]
+    path.write_bytes(header + data[HEADER_SIZE:])
+    with pytest.raises(ValueError, match="version 2"):
+        load_seat_map(str(path))
+
+
+def test_seat_map_with_a_corrupt_header_is_rejected(seat_map_bytes):
+    path, data = seat_map_bytes
+    path.write_bytes(data[:8] + b"\x02" + data[9:])
+    with pytest.raises(ValueError, match="corrupt header"):
+        load_seat_map(str(path))
+
+
+@pytest.mark.parametrize("keep", [HEADER_SIZE - 1, HEADER_SIZE + 8, -1])
+def test_truncated_seat_map_is_rejected(seat_map_bytes, keep):
+    path, data = seat_map_bytes
+    path.write_bytes(data[:keep])
+    with pytest.raises(ValueError):
+        load_seat_map(str(path))
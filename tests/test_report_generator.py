@@ -0,0 +1,29 @@
+import pytest
+
+from logic import FRAMEWORKS
+from report_cache import ReportCache
+from report_generator import CHUNK_SIZE, ReportGenerator
+
+IDEA = "A mobile app that helps busy professionals book last-minute fitness classes"
+# Long enough that the text report spans several chunks
+RESULTS = {key: {"framework": name, "analysis": f"## {name}\n" + "- insight\n" * 2000}
+           for key, (_, name) in FRAMEWORKS.items()}
+
+
+@pytest.mark.parametrize("cache", [None, ReportCache()], ids=["uncached", "cached"])
+@pytest.mark.parametrize("format", ["txt", "pdf"])
+def test_chunked_report_matches_whole_report(cache, format):
+    generator = ReportGenerator(cache)
+    whole, mime_type, extension = generator.generate_report(IDEA, RESULTS, format)
+    chunks, chunked_mime_type, chunked_extension = generator.generate_report(IDEA, RESULTS, format, chunked=True)
+    chunks = list(chunks)
+    assert (chunked_mime_type, chunked_extension) == (mime_type, extension)
+    assert all(isinstance(chunk, bytes) and 0 < len(chunk) <= CHUNK_SIZE for chunk in chunks)
+    if format == "txt":
+        assert len(chunks) > 1
+        assert b"".join(chunks) == whole
+    else:
+        # PDFs embed their creation time, so only the structure can be compared when uncached
+        assert b"".join(chunks).startswith(b"%PDF")
+        if cache is not None:
+            assert b"".join(chunks) == whole
@@ -0,0 +1,148 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from llm_client import LLMClient
+from mock_openrouter import base_url
+from rate_limit import RateLimiter, TokenBucket
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, RetryPolicy
+from shared_store import SharedStore
+from single_flight import SingleFlight
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+@pytest.fixture
+def llm(mock_server):
+    client = LLMClient(base_url(mock_server), "mock-key", retry=RetryPolicy(max_attempts=1),
+                       breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.2))
+    yield client
+    client.close()
+
+
+def _open_circuit(llm, mock_server):
+    mock_server.error_rate = 1.0
+    with pytest.raises(Exception):
+        llm.run(llm.create_chat_completion(model="mock", messages=MESSAGES, max_tokens=16))
+    assert llm.breaker.state == OPEN
+    mock_server.error_rate = 0.0
+    time.sleep(0.25)
+    assert llm.breaker.state == HALF_OPEN
+
+
+def test_cancelled_probe_releases_the_half_open_circuit(llm, mock_server):
+    _open_circuit(llm, mock_server)
+    mock_server.latency = 1.0
+
+    async def cancelled_probe():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(llm.create_chat_completion(model="mock", messages=MESSAGES, max_tokens=16), 0.2)
+
+    llm.run(cancelled_probe())
+    # The next call becomes the probe instead of being rejected forever
+    mock_server.latency = 0.05
+    llm.run(llm.create_chat_completion(model="mock", messages=MESSAGES, max_tokens=16))
+    assert llm.breaker.state == CLOSED
+
+
+def test_half_open_admits_one_probe_at_a_time():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit(llm, mock_server):
+    _open_circuit(llm, mock_server)
+    mock_server.error_rate = 1.0
+    with pytest.raises(Exception):
+        llm.run(llm.create_chat_completion(model="mock", messages=MESSAGES, max_tokens=16))
+    assert llm.breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        llm.run(llm.create_chat_completion(model="mock", messages=MESSAGES, max_tokens=16))
+
+
+def test_single_flight_coalesces_identical_calls():
+    flights = SingleFlight()
+    calls = []
+
+    async def call(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return f"result {key}"
+
+    async def main():
+        return await asyncio.gather(*(flights.run(key, lambda key=key: call(key)) for key in ("a", "a", "a", "b")))
+
+    assert asyncio.run(main()) == ["result a", "result a", "result a", "result b"]
+    assert sorted(calls) == ["a", "b"]
+    assert flights.stats() == {"calls": 4, "coalesced": 2, "in_flight": 0}
+
+
+def test_single_flight_survives_a_cancelled_caller():
+    flights = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def main():
+        impatient = asyncio.ensure_future(flights.run("key", call))
+        patient = asyncio.ensure_future(flights.run("key", call))
+        await asyncio.sleep(0.02)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_bucket_refills_at_its_rate():
+    bucket = TokenBucket(per_minute=600, burst_seconds=0.5)
+    assert bucket.capacity == 5
+    bucket.take(5)
+    assert bucket.wait_time(1) == pytest.approx(0.1, abs=0.02)
+    time.sleep(0.1)
+    assert bucket.wait_time(1) == pytest.approx(0.0, abs=0.02)
+    # More than the capacity waits for a full bucket, not forever
+    assert bucket.wait_time(50) <= 0.5
+
+
+def test_limiter_spaces_requests_beyond_the_burst():
+    limiter = RateLimiter(requests_per_minute=600, burst_seconds=0.1)
+
+    async def main():
+        start = time.monotonic()
+        for _ in range(4):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    # One request goes out at once, each later one waits a tenth of a second
+    assert asyncio.run(main()) == pytest.approx(0.3, abs=0.08)
+    stats = limiter.stats()
+    assert (stats["acquired"], stats["waited"]) == (4, 3)
+
+
+def test_shared_limiter_falls_back_to_local_buckets(mock_server, tmp_path, monkeypatch):
+    store = SharedStore(str(tmp_path / "shared_state.sqlite"))
+    limiter = RateLimiter(requests_per_minute=600, burst_seconds=0.1, store=store)
+
+    def broken_transaction():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "transaction", broken_transaction)
+    llm = LLMClient(base_url(mock_server), "mock-key", retry=RetryPolicy(max_attempts=1),
+                    breaker=CircuitBreaker(failure_threshold=1), limiter=limiter)
+    try:
+        start = time.monotonic()
+        for _ in range(2):
+            llm.run(llm.create_chat_completion(model="mock", messages=MESSAGES, max_tokens=16))
+        # The calls succeed, still rate limited by this process's buckets
+        assert time.monotonic() - start >= 0.1
+        assert limiter.stats()["store_errors"] >= 2
+        assert llm.breaker.state == CLOSED
+    finally:
+        llm.close()
@@ -0,0 +1,32 @@
+import logic
+from logic import FRAMEWORKS, ProductDiscoveryAnalyzer
+from semantic_cache import SemanticCache
+
+IDEA = ("A mobile app that helps busy professionals in large cities book last-minute fitness classes at nearby "
+        "studios, with instant confirmation and flexible cancellation")
+
+
+def test_reworded_idea_is_served():
+    cache = SemanticCache(enabled=True)
+    cache.add("jtbd", "A mobile app that helps busy professionals book last-minute fitness classes", "cached")
+    assert cache.lookup("jtbd", "Mobile app helping busy professionals book fitness classes at the last minute") == \
+        "cached"
+
+
+def test_long_idea_one_word_apart_is_not_served():
+    cache = SemanticCache(enabled=True)
+    cache.add("jtbd", IDEA, "fitness analysis")
+    assert cache.lookup("jtbd", IDEA.replace("fitness", "yoga")) is None
+    assert cache.stats()["word_mismatches"] == 1
+
+
+def test_answers_are_not_drowned_out_by_the_idea(mock_server, monkeypatch):
+    monkeypatch.setattr(logic, "semantic_cache", SemanticCache(enabled=True))
+    analyzer = ProductDiscoveryAnalyzer()
+    analyzer.analyze_all_frameworks(IDEA, {}, concurrent=True, timeout=5)
+    analyzer.analyze_all_frameworks(IDEA, {"q0": "Nurses"}, concurrent=True, timeout=5)
+    # The short answer changes the input, so nothing is served from the bare idea's analyses
+    assert mock_server.request_count == 2 * len(FRAMEWORKS)
+    # The same answers again, reworded idea: served
+    analyzer.analyze_all_frameworks(IDEA.replace("helps", "helping"), {"q0": "Nurses"}, concurrent=True, timeout=5)
+    assert mock_server.request_count == 2 * len(FRAMEWORKS)
@@ -0,0 +1,106 @@
+"""
+Token accounting and adaptive max_tokens budgets for LLM calls.
+
+Every call is recorded under a label (a framework key, "case_study", ...) with
+its prompt and completion tokens, taken from the API's usage block or estimated
+locally when a response has none (streamed replies, some proxies). The
+completion sizes seen per label drive that label's max_tokens budget.
+"""
+import math
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # Optional dependency; fall back to the ~4 characters per token rule of thumb
+    _ENCODING = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Local token count for text (exact with tiktoken installed, otherwise approximate)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+class TokenLedger:
+    def __init__(self, window: int = 200, min_samples: int = 10, headroom: float = 1.25, step: int = 64):
+        """
+        window: recent completions per label used to size its budget
+        min_samples: completions needed before a label's budget adapts
+        headroom: budget = p95 completion tokens * headroom, rounded up to step
+        step: budget granularity; coarse steps keep response cache keys stable
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.headroom = headroom
+        self.step = step
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._completions: Dict[str, Deque[int]] = {}
+
+    @classmethod
+    def from_env(cls) -> "TokenLedger":
+        return cls(
+            window=int(os.getenv("LLM_BUDGET_WINDOW", "200")),
+            min_samples=int(os.getenv("LLM_BUDGET_MIN_SAMPLES", "10")),
+            headroom=float(os.getenv("LLM_BUDGET_HEADROOM", "1.25"))
+        )
+
+    def record(self, label: str, prompt_tokens: int, completion_tokens: int, estimated: bool = False,
+               truncated: bool = False):
+        """
+        estimated: the counts are local estimates rather than reported usage
+        truncated: the completion stopped at max_tokens
+        """
+        with self._lock:
+            totals = self._totals.setdefault(label, {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "estimated_calls": 0, "truncated_calls": 0
+            })
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["estimated_calls"] += int(estimated)
+            totals["truncated_calls"] += int(truncated)
+            self._completions.setdefault(label, deque(maxlen=self.window)).append(completion_tokens)
+
+    def budget(self, label: str, default: int, floor: int = 256) -> int:
+        """
+        max_tokens for the next call under label: default until enough completions
+        have been seen, then p95 * headroom, kept between floor and default.
+        Truncated completions sit at the old budget, so the p95 rises and the budget grows back.
+        """
+        with self._lock:
+            samples = sorted(self._completions.get(label, ()))
+        if len(samples) < self.min_samples:
+            return default
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        budget = math.ceil(p95 * self.headroom / self.step) * self.step
+        return max(floor, min(default, budget))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-label totals plus an "all" entry."""
+        with self._lock:
+            stats = {label: dict(totals) for label, totals in self._totals.items()}
+        overall: Dict[str, int] = {}
+        for totals in stats.values():
+            for name, value in totals.items():
+                overall[name] = overall.get(name, 0) + value
+        if stats:
+            stats["all"] = overall
+        return stats
+
+    def reset(self, label: Optional[str] = None):
+        with self._lock:
+            if label is None:
+                self._totals.clear()
+                self._completions.clear()
+            else:
+                self._totals.pop(label, None)
+                self._completions.pop(label, None)